@@ -415,7 +415,8 @@ class CgfFormat(pyffi.object_models.xml.FileFormat, metaclass=_MetaCgfFormat):
             :type block_dct: dict
             """
             logger = logging.getLogger("pyffi.cgf.data")
-            block_index = data._link_stack.pop(0)
+            block_index = data._link_stack[data._link_index]
+            data._link_index += 1
             # case when there's no link
             if block_index == -1:
                 self._value = None
@@ -426,7 +427,10 @@ class CgfFormat(pyffi.object_models.xml.FileFormat, metaclass=_MetaCgfFormat):
             except KeyError:
                 # make this raise an exception when all reference errors
                 # are sorted out
-                logger.warn("invalid chunk reference (%i)" % block_index)
+                logger.warn("invalid chunk reference (%i) in %s chunk %i"
+                            % (block_index,
+                               data._link_chunk.__class__.__name__,
+                               data._link_chunk_num))
                 self._value = None
                 return
             if not isinstance(block, self._template):
@@ -542,6 +546,10 @@ but got instance of %s""" % (self._template, block.__class__))
         :type versions: ``list`` of L{int}
         """
         _link_stack = None
+        _link_index = 0
+        """Index in the link stack of the next link to be fixed."""
+        _link_chunk = None
+        _link_chunk_num = None
         _block_index_dct = None
         _block_dct = None
 
@@ -743,6 +751,7 @@ but got instance of %s""" % (self._template, block.__class__))
             self._block_dct = {} # maps chunk index to actual chunk
             self.chunks = [] # records all chunks as read from cgf file in proper order
             self.versions = [] # records all chunk versions as read from cgf file
+            link_starts = [] # index of the first link of each chunk
             for chunknum, chunkhdr in enumerate(self.chunk_table.chunk_headers):
                 # check that id is unique
                 if chunkhdr.id in self._block_dct:
@@ -814,6 +823,7 @@ expected\n%sbut got\n%s'%(chunkhdr, chunkhdr_copy))
 
                 # quick hackish trick with version... not beautiful but it works
                 self.version = chunkhdr.version
+                link_starts.append(len(self._link_stack))
                 try:
                     chunk.read(stream, self)
                 finally:
@@ -858,17 +868,24 @@ chunk size mismatch when reading %s at 0x%08X
                                        chunk_sizes[chunknum], size))
 
             # fix links
-            for chunk, chunkversion in zip(self.chunks, self.versions):
+            link_starts.append(len(self._link_stack))
+            for chunknum, (chunk, chunkversion) in enumerate(
+                    zip(self.chunks, self.versions)):
                 # (quick hackish trick with version)
                 self.version = chunkversion
+                self._link_index = link_starts[chunknum]
+                self._link_chunk = chunk
+                self._link_chunk_num = chunknum
                 try:
                     #print(chunk.__class__)
                     chunk.fix_links(self)
                 finally:
                     self.version = self.header.version
-            if self._link_stack != []:
-                raise CgfFormat.CgfError(
-                    'not all links have been popped from the stack (bug?)')
+                if self._link_index != link_starts[chunknum + 1]:
+                    raise CgfFormat.CgfError(
+                        'not all links of %s chunk %i have been fixed (bug?)'
+                        % (chunk.__class__.__name__, chunknum))
+            self._link_stack = []
 
         def write(self, stream):
             """Write a cgf file. The L{header} and L{chunk_table} are
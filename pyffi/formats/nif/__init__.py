@@ -348,7 +348,12 @@ end
 #
 # ***** END LICENSE BLOCK *****
 
+from collections.abc import Sequence
 from itertools import repeat, chain
+import concurrent.futures
+import hashlib
+import io
+import itertools
 import logging
 import math # math.pi
 import os
@@ -376,6 +381,65 @@ from pyffi.object_models.xml.basic import BasicBase
 from pyffi.object_models.xml.struct_ import StructBase
 
 
+class _LazyLink(object):
+    """Value of a link to a block which has not been read yet (see
+    :meth:`NifFormat.Data.read` with *lazy* set). Calling it reads the
+    block.
+    """
+    __slots__ = ("reader", "index")
+
+    def __init__(self, reader, index):
+        self.reader = reader
+        self.index = index
+
+    def __call__(self):
+        return self.reader._read_lazy_block(self.index)
+
+
+def _replace_links(blocks, mapping):
+    """Replace every link to a key of *mapping*, in *blocks*, by a link
+    to the corresponding value. Only the links of the blocks themselves
+    are replaced, not those of the blocks they link to.
+    """
+    for block in blocks:
+        replaced = set()
+        for link in block.get_links():
+            if link in mapping and link not in replaced:
+                replaced.add(link)
+                StructBase.replace_global_node(
+                    block, link, mapping[link], recurse=False)
+
+
+def _add_to_index(index, block, parent):
+    """Add *parent* to the blocks of *index* that link to *block*."""
+    parents = index.setdefault(block, [])
+    if not any(other is parent for other in parents):
+        parents.append(parent)
+
+
+def _get_fingerprint(*args):
+    """Digest of the representation of *args*, for
+    :meth:`NifFormat.NiObject.get_fingerprint`.
+    """
+    return hashlib.sha1(repr(args).encode("utf-8")).hexdigest()
+
+
+def _scan_header_file(filename):
+    """Scan the header of a nif file, for
+    :meth:`NifFormat.scan_headers`.
+    """
+    try:
+        with open(filename, "rb") as stream:
+            record = NifFormat.scan_header(stream)
+        record["error"] = None
+    except Exception as exc:
+        record = dict.fromkeys([
+            "version", "version_string", "user_version", "user_version_2",
+            "modification", "byte_order", "num_blocks", "block_types",
+            "block_sizes", "strings"])
+        record["error"] = str(exc) or exc.__class__.__name__
+    return dict(filename=filename, **record)
+
 
 class NifFormat(FileFormat):
     """This class contains the generated classes from the xml."""
@@ -416,6 +480,8 @@ class NifFormat(FileFormat):
 
     class StringOffset(pyffi.object_models.common.Int):
         """This is just an integer with -1 as default value."""
+        __slots__ = ()
+
         def __init__(self, **kwargs):
             pyffi.object_models.common.Int.__init__(self, **kwargs)
             self.set_value(-1)
@@ -432,6 +498,8 @@ class NifFormat(FileFormat):
         >>> i.get_value()
         True
         """
+        __slots__ = ("_value",)
+
         def __init__(self, **kwargs):
             BasicBase.__init__(self, **kwargs)
             self.set_value(False)
@@ -480,11 +548,15 @@ class NifFormat(FileFormat):
                                          int(self._value)))
 
     class Flags(pyffi.object_models.common.UShort):
+        __slots__ = ()
+
         def __str__(self):
             return hex(self.get_value())
 
     class Ref(BasicBase):
         """Reference to another block."""
+        __slots__ = ("_template", "_value")
+
         _is_template = True
         _has_links = True
         _has_refs = True
@@ -494,6 +566,8 @@ class NifFormat(FileFormat):
             self.set_value(None)
 
         def get_value(self):
+            if self._value.__class__ is _LazyLink:
+                self.set_value(self._value())
             return self._value
 
         def set_value(self, value):
@@ -542,7 +616,8 @@ class NifFormat(FileFormat):
 
         def fix_links(self, data):
             """Fix block links."""
-            block_index = data._link_stack.pop(0)
+            block_index = data._link_stack[data._link_index]
+            data._link_index += 1
             # case when there's no link
             if data.version >= 0x0303000D:
                 if block_index == -1: # link by block number
@@ -553,7 +628,15 @@ class NifFormat(FileFormat):
                     self.set_value(None)
                     return
             # other case: look up the link and check the link type
-            block = data._block_dct[block_index]
+            block = data._block_dct.get(block_index)
+            if block is None:
+                if (data._lazy is not None and
+                    0 <= block_index < len(data._lazy._block_offsets)):
+                    # read the block only when the link is followed
+                    self._value = _LazyLink(data._lazy, block_index)
+                else:
+                    raise data._dangling_link_error(block_index)
+                return
             self.set_value(block)
             if self._template != None:
                 if not isinstance(block, self._template):
@@ -577,7 +660,7 @@ class NifFormat(FileFormat):
                 return []
 
         def replace_global_node(self, oldbranch, newbranch,
-                                edge_filter=EdgeFilter()):
+                                edge_filter=EdgeFilter(), recurse=True):
             """
             >>> from pyffi.formats.nif import NifFormat
             >>> x = NifFormat.NiNode()
@@ -600,8 +683,9 @@ class NifFormat(FileFormat):
             if self.get_value() is oldbranch:
                 # set_value takes care of template type
                 self.set_value(newbranch)
-                #print("replacing", repr(oldbranch), "->", repr(newbranch))
-            if self.get_value() is not None:
+            # NifFormat.Data patches the blocks that link to oldbranch
+            # directly, and does not recurse
+            if recurse and self.get_value() is not None:
                 self.get_value().replace_global_node(oldbranch, newbranch)
 
         def get_detail_display(self):
@@ -613,6 +697,8 @@ class NifFormat(FileFormat):
 
     class Ptr(Ref):
         """A weak reference to another block, used to point up the hierarchy tree. The reference is not returned by the L{get_refs} function to avoid infinite recursion."""
+        __slots__ = ()
+
         _is_template = True
         _has_links = True
         _has_refs = False
@@ -620,7 +706,11 @@ class NifFormat(FileFormat):
         # use weak reference to aid garbage collection
 
         def get_value(self):
-            return self._value() if self._value is not None else None
+            if self._value is None:
+                return None
+            if self._value.__class__ is _LazyLink:
+                self.set_value(self._value())
+            return self._value()
 
         def set_value(self, value):
             if value is None:
@@ -637,6 +727,14 @@ class NifFormat(FileFormat):
             # avoid infinite recursion
             return '%s instance at 0x%08X'%(self._value.__class__, id(self._value))
 
+        def __getstate__(self):
+            # weak references cannot be pickled
+            return self._template, self.get_value()
+
+        def __setstate__(self, state):
+            self._template, value = state
+            self.set_value(value)
+
         def get_refs(self, data=None):
             return []
 
@@ -644,11 +742,10 @@ class NifFormat(FileFormat):
             return None
 
         def replace_global_node(self, oldbranch, newbranch,
-                              edge_filter=EdgeFilter()):
+                              edge_filter=EdgeFilter(), recurse=True):
             # overridden to avoid infinite recursion
             if self.get_value() is oldbranch:
                 self.set_value(newbranch)
-                #print("replacing", repr(oldbranch), "->", repr(newbranch))
 
     class LineString(BasicBase):
         """Basic type for strings ending in a newline character (0x0a).
@@ -674,6 +771,8 @@ class NifFormat(FileFormat):
         >>> str(m)
         'Hi There'
         """
+        __slots__ = ("_value",)
+
         def __init__(self, **kwargs):
             BasicBase.__init__(self, **kwargs)
             self.set_value('')
@@ -701,6 +800,8 @@ class NifFormat(FileFormat):
             stream.write("\x0a".encode("ascii"))
 
     class HeaderString(BasicBase):
+        __slots__ = ()
+
         def __str__(self):
             return 'NetImmerse/Gamebryo File Format, Version x.x.x.x'
 
@@ -781,6 +882,8 @@ class NifFormat(FileFormat):
                 return "%s File Format, Version %s" % (s, v)
 
     class FileVersion(pyffi.object_models.common.UInt):
+        __slots__ = ()
+
         def set_value(self):
             raise NotImplementedError("file version is specified via data")
 
@@ -840,6 +943,8 @@ class NifFormat(FileFormat):
 
     class ShortString(BasicBase):
         """Another type for strings."""
+        __slots__ = ("_value",)
+
         def __init__(self, **kwargs):
             BasicBase.__init__(self, **kwargs)
             self._value = ''.encode("ascii")
@@ -875,6 +980,8 @@ class NifFormat(FileFormat):
             stream.write('\x00'.encode("ascii"))
 
     class string(SizedString):
+        __slots__ = ()
+
         _has_strings = True
 
         def get_size(self, data=None):
@@ -907,12 +1014,15 @@ class NifFormat(FileFormat):
                         struct.pack(data._byte_order + 'i', -1))
                 else:
                     try:
-                        stream.write(struct.pack(
-                            data._byte_order + 'i',
-                            data._string_list.index(self._value)))
-                    except ValueError:
+                        if data._string_index_dct is not None:
+                            index = data._string_index_dct[self._value]
+                        else:
+                            index = data._string_list.index(self._value)
+                    except (KeyError, ValueError):
                         raise ValueError(
                             "string '%s' not in string list" % self._value)
+                    stream.write(struct.pack(
+                        data._byte_order + 'i', index))
             else:
                 stream.write(struct.pack(data._byte_order + 'I',
                                          len(self._value)))
@@ -931,6 +1041,8 @@ class NifFormat(FileFormat):
 
     class FilePath(string):
         """A file path."""
+        __slots__ = ()
+
         def get_hash(self, data=None):
             """Returns a case insensitive hash value."""
             return self.get_value().lower()
@@ -938,6 +1050,8 @@ class NifFormat(FileFormat):
     class ByteArray(BasicBase):
         """Array (list) of bytes. Implemented as basic type to speed up reading
         and also to prevent data to be dumped by __str__."""
+        __slots__ = ("_value",)
+
         def __init__(self, **kwargs):
             BasicBase.__init__(self, **kwargs)
             self.set_value("".encode()) # b'' for > py25
@@ -970,6 +1084,8 @@ class NifFormat(FileFormat):
     class ByteMatrix(BasicBase):
         """Matrix of bytes. Implemented as basic type to speed up reading
         and to prevent data being dumped by __str__."""
+        __slots__ = ("_value",)
+
         def __init__(self, **kwargs):
             BasicBase.__init__(self, **kwargs)
             self.set_value([])
@@ -1059,6 +1175,234 @@ class NifFormat(FileFormat):
         while len(ver_list) < 4: ver_list.append(0)
         return (ver_list[0] << 24) + (ver_list[1] << 16) + (ver_list[2] << 8) + ver_list[3]
 
+    @staticmethod
+    def scan_version(stream):
+        """Read the version of a nif file from its header, without
+        creating any structures. Does not change the stream position.
+
+        :raise ``ValueError``: If the stream does not contain a NIF file.
+        :param stream: The stream from which to read.
+        :type stream: ``file``
+        :return: The version, user version, user version 2,
+            modification, and byte order.
+        :rtype: ``tuple``
+        """
+        pos = stream.tell()
+        try:
+            s = stream.readline(64).rstrip()
+        finally:
+            stream.seek(pos)
+        modification = None
+        byte_order = '<'
+        if s.startswith("NetImmerse File Format, Version ".encode("ascii")):
+            version_str = s[32:].decode("ascii")
+        elif s.startswith("Gamebryo File Format, Version ".encode("ascii")):
+            version_str = s[30:].decode("ascii")
+        elif s.startswith("NS".encode("ascii")):
+            # neosteam
+            version_str = "NS"
+            modification = "neosteam"
+        elif s.startswith("NDSNIF....@....@...., Version ".encode("ascii")):
+            version_str = s[30:].decode("ascii")
+            modification = "ndoors"
+        elif s.startswith("Joymaster HS1 Object Format - (JMI), Version ".encode("ascii")):
+            version_str = s[45:].decode("ascii")
+            modification = "jmihs1"
+        else:
+            raise ValueError("Not a NIF file.")
+        try:
+            ver = NifFormat.version_number(version_str)
+        except:
+            raise ValueError("Nif version %s not supported." % version_str)
+        if not ver in list(NifFormat.versions.values()):
+            raise ValueError("Nif version %s not supported." % version_str)
+        # check version integer and user version
+        userver = 0
+        userver2 = 0
+        if ver >= 0x0303000D:
+            ver_int = None
+            try:
+                stream.readline(64)
+                ver_int, = struct.unpack('<I', stream.read(4))
+                # special case for Laxe Lore
+                if ver_int == 0x5A000004 and ver == 0x14000004:
+                    modification = "laxelore"
+                # neosteam and ndoors have a special version integer
+                elif (not modification) or modification == "jmihs1":
+                    if ver_int != ver:
+                        raise ValueError(
+                            "Corrupted NIF file: header version string %s"
+                            " does not correspond with header version field"
+                            " 0x%08X." % (version_str, ver_int))
+                elif modification == "neosteam":
+                    if ver_int != 0x08F35232:
+                        raise ValueError(
+                            "Corrupted NIF file: invalid NeoSteam version.")
+                elif modification == "ndoors":
+                    if ver_int != 0x73615F67:
+                        raise ValueError(
+                            "Corrupted NIF file: invalid Ndoors version.")
+                if ver >= 0x14000004:
+                    endian_type, = struct.unpack('<B', stream.read(1))
+                    if endian_type == 0:
+                        # big endian!
+                        byte_order = '>'
+                if ver >= 0x0A010000:
+                    userver, = struct.unpack('<I', stream.read(4))
+                    if userver >= 10:
+                        stream.read(4) # number of blocks
+                        userver2, = struct.unpack('<I', stream.read(4))
+            finally:
+                stream.seek(pos)
+        return ver, userver, userver2, modification, byte_order
+
+    @staticmethod
+    def scan_header(stream):
+        """Read the version, block types, block sizes and strings from
+        the header of a nif file, without creating any structures. This
+        is much faster than :meth:`Data.inspect`. Does not reset stream
+        position.
+
+        Block types and strings are decoded as latin-1. For files
+        whose header has no block types (before 10.0.1.0), the
+        histogram of block types is empty, and the block sizes and
+        strings are ``None`` if the header does not have them.
+
+        :raise ``ValueError``: If the stream does not contain a NIF file.
+        :param stream: The stream from which to read.
+        :type stream: ``file``
+        :return: A dictionary with keys ``version`` (as ``int``),
+            ``version_string``, ``user_version``, ``user_version_2``,
+            ``modification``, ``byte_order``, ``num_blocks``,
+            ``block_types`` (number of blocks of each type),
+            ``block_sizes``, and ``strings``.
+        :rtype: ``dict``
+        """
+        ver, userver, userver2, modification, byte_order = (
+            NifFormat.scan_version(stream))
+
+        def read(size):
+            buf = stream.read(size)
+            if len(buf) != size:
+                raise ValueError("Truncated NIF header.")
+            return buf
+
+        def read_uint(byte_order=byte_order):
+            return struct.unpack(byte_order + 'I', read(4))[0]
+
+        def read_string(size):
+            if size > 0x10000:
+                raise ValueError("Corrupt NIF header: string too long.")
+            return read(size).decode("latin-1")
+
+        record = {
+            "version": ver,
+            "version_string": "%i.%i.%i.%i" % tuple(
+                (ver >> shift) & 0xff for shift in (24, 16, 8, 0)),
+            "user_version": userver,
+            "user_version_2": userver2,
+            "modification": modification,
+            "byte_order": byte_order,
+            "num_blocks": None,
+            "block_types": {},
+            "block_sizes": None,
+            "strings": None,
+            }
+        # the fields below follow the Header structure in nif.xml
+        stream.readline(64)
+        if ver <= 0x03010000:
+            for i in range(3):
+                stream.readline(256)
+        if ver < 0x0303000D:
+            return record
+        read(4) # version
+        if ver >= 0x14000004:
+            read(1) # endian type
+        if ver >= 0x0A010000:
+            read(4) # user version
+        num_blocks = read_uint('<')
+        if num_blocks > 0x1000000:
+            raise ValueError("Corrupt NIF header: too many blocks.")
+        record["num_blocks"] = num_blocks
+        has_export_info = (
+            (userver >= 10) or (userver == 1 and ver != 0x0A020000))
+        if ver >= 0x0A010000 and has_export_info:
+            read(4) # user version 2
+        if ver >= 0x1E000002:
+            read(4) # unknown int 3
+        if ver == 0x0A000102 or (ver >= 0x0A010000 and has_export_info):
+            if ver == 0x0A000102:
+                read(4) # unknown
+            for i in range(3):
+                read_string(read(1)[0])
+        if ver < 0x0A000100:
+            return record
+        num_block_types, = struct.unpack(byte_order + 'H', read(2))
+        block_types = [read_string(read_uint())
+                       for i in range(num_block_types)]
+        block_type_index = struct.unpack(
+            byte_order + '%iH' % num_blocks, read(2 * num_blocks))
+        histogram = record["block_types"]
+        for index in block_type_index:
+            # note the 0xfff mask: required for the NiPhysX blocks
+            # special case: NiDataStream stores part of data in block type
+            block_type = block_types[index & 0xfff].split("\x01")[0]
+            histogram[block_type] = histogram.get(block_type, 0) + 1
+        if ver >= 0x14020007:
+            record["block_sizes"] = list(struct.unpack(
+                byte_order + '%iI' % num_blocks, read(4 * num_blocks)))
+        if ver >= 0x14010003:
+            num_strings = read_uint()
+            read(4) # max string length
+            if num_strings > 0x1000000:
+                raise ValueError("Corrupt NIF header: too many strings.")
+            record["strings"] = [read_string(read_uint())
+                                 for i in range(num_strings)]
+        return record
+
+    @classmethod
+    def scan_headers(cls, paths, jobs=None):
+        """Scan the headers of many nif files with :meth:`scan_header`,
+        in *jobs* processes if more than one. Records are yielded in
+        the same order as *paths*, as soon as they are available, so
+        they can be streamed to a sink (see :mod:`pyffi.utils.sinks`).
+
+        >>> import os.path
+        >>> from pyffi.formats.nif import NifFormat
+        >>> filename = os.path.join(
+        ...     "tests", "spells", "nif", "files", "nds.nif")
+        >>> for record in NifFormat.scan_headers([filename]):
+        ...     print(record["version_string"], sorted(record["block_types"]))
+        20.2.0.8 ['NiNode', 'NiTriShape', 'NiTriShapeData']
+
+        :param paths: The file names.
+        :type paths: iterable of ``str``
+        :param jobs: The number of processes.
+        :type jobs: ``int``
+        :return: For each file, the record of :meth:`scan_header`,
+            with the file name under ``filename``, and ``error`` set to
+            the error message if the file could not be scanned, or
+            ``None`` otherwise.
+        :rtype: iterator of ``dict``
+        """
+        if not jobs or jobs <= 1:
+            for path in paths:
+                yield _scan_header_file(path)
+            return
+        paths = iter(paths)
+        # submit files in batches, so paths can be a generator over
+        # a huge number of files
+        batch_size = 256 * jobs
+        with concurrent.futures.ProcessPoolExecutor(
+                max_workers=jobs) as executor:
+            while True:
+                batch = list(itertools.islice(paths, batch_size))
+                if not batch:
+                    break
+                for record in executor.map(
+                        _scan_header_file, batch, chunksize=64):
+                    yield record
+
     # exceptions
     class NifError(Exception):
         """Standard nif exception class."""
@@ -1088,9 +1432,59 @@ class NifFormat(FileFormat):
         """
 
         _link_stack = None
+        _link_index = 0
+        """Index in the link stack of the next link to be fixed."""
+        _link_block = None
+        _link_block_num = None
         _block_dct = None
         _string_list = None
+        _string_index_dct = None
+        """Maps strings in the string list to their index."""
+        _block_type_index_dct = None
+        """Maps block type strings to their index, while writing."""
         _block_index_dct = None
+        _lazy = None
+        """For lazily read data, the data which reads the blocks that
+        have not been read yet (see :meth:`read`)."""
+        _lazy_stream = None
+        _block_offsets = None
+        """Offset of every block in the stream that the blocks were read
+        from, or ``None`` if the blocks were not read."""
+        _block_sizes = None
+        _block_type_names = None
+        _footer_offset = None
+        _dirty_blocks = None
+        """Blocks marked with :meth:`mark_dirty` since the data was
+        read."""
+        _read_layout = None
+        """Versions and roots of the data when it was read, see
+        :meth:`write_changes`."""
+        _type_index = None
+        """Maps block types to the blocks in :attr:`blocks` of that
+        type, or of a subclass of it (see :meth:`blocks_of_type`)."""
+        _parent_index = None
+        """Maps blocks to the blocks in the tree which refer to them
+        (see :meth:`parents_of`)."""
+        _pointer_index = None
+        """Maps blocks to the blocks in the tree which point to them,
+        other than by reference (see :meth:`replace_global_nodes`)."""
+
+        class _LazyBlockList(Sequence):
+            """Blocks of lazily read data, in file order. Blocks are
+            read when they are first accessed.
+            """
+
+            def __init__(self, reader):
+                self.reader = reader
+
+            def __len__(self):
+                return len(self.reader._block_offsets)
+
+            def __getitem__(self, index):
+                if isinstance(index, slice):
+                    return [self.reader._read_lazy_block(i)
+                            for i in range(len(self))[index]]
+                return self.reader._read_lazy_block(range(len(self))[index])
 
         class VersionUInt(pyffi.object_models.common.UInt):
             def set_value(self, value):
@@ -1167,75 +1561,9 @@ class NifFormat(FileFormat):
             :param stream: The stream from which to read.
             :type stream: ``file``
             """
-            pos = stream.tell()
-            try:
-                s = stream.readline(64).rstrip()
-            finally:
-                stream.seek(pos)
-            self.modification = None
-            if s.startswith("NetImmerse File Format, Version ".encode("ascii")):
-                version_str = s[32:].decode("ascii")
-            elif s.startswith("Gamebryo File Format, Version ".encode("ascii")):
-                version_str = s[30:].decode("ascii")
-            elif s.startswith("NS".encode("ascii")):
-                # neosteam
-                version_str = "NS"
-                self.modification = "neosteam"
-            elif s.startswith("NDSNIF....@....@...., Version ".encode("ascii")):
-                version_str = s[30:].decode("ascii")
-                self.modification = "ndoors"
-            elif s.startswith("Joymaster HS1 Object Format - (JMI), Version ".encode("ascii")):
-                version_str = s[45:].decode("ascii")
-                self.modification = "jmihs1"
-            else:
-                raise ValueError("Not a NIF file.")
-            try:
-                ver = NifFormat.version_number(version_str)
-            except:
-                raise ValueError("Nif version %s not supported." % version_str)
-            if not ver in list(NifFormat.versions.values()):
-                raise ValueError("Nif version %s not supported." % version_str)
-            # check version integer and user version
-            userver = 0
-            userver2 = 0
-            if ver >= 0x0303000D:
-                ver_int = None
-                try:
-                    stream.readline(64)
-                    ver_int, = struct.unpack('<I', stream.read(4))
-                    # special case for Laxe Lore
-                    if ver_int == 0x5A000004 and ver == 0x14000004:
-                        self.modification = "laxelore"
-                    # neosteam and ndoors have a special version integer
-                    elif (not self.modification) or self.modification == "jmihs1":
-                        if ver_int != ver:
-                            raise ValueError(
-                                "Corrupted NIF file: header version string %s"
-                                " does not correspond with header version field"
-                                " 0x%08X." % (version_str, ver_int))
-                    elif self.modification == "neosteam":
-                        if ver_int != 0x08F35232:
-                            raise ValueError(
-                                "Corrupted NIF file: invalid NeoSteam version.")
-                    elif self.modification == "ndoors":
-                        if ver_int != 0x73615F67:
-                            raise ValueError(
-                                "Corrupted NIF file: invalid Ndoors version.")
-                    if ver >= 0x14000004:
-                        endian_type, = struct.unpack('<B', stream.read(1))
-                        if endian_type == 0:
-                            # big endian!
-                            self._byte_order = '>'
-                    if ver >= 0x0A010000:
-                        userver, = struct.unpack('<I', stream.read(4))
-                        if userver >= 10:
-                            stream.read(4) # number of blocks
-                            userver2, = struct.unpack('<I', stream.read(4))
-                finally:
-                    stream.seek(pos)
-            self.version = ver
-            self.user_version = userver
-            self.user_version_2 = userver2
+            (self.version, self.user_version, self.user_version_2,
+             self.modification, self._byte_order) = NifFormat.scan_version(
+                 stream)
 
         # GlobalNode
 
@@ -1246,12 +1574,39 @@ class NifFormat(FileFormat):
 
         def replace_global_node(self, oldbranch, newbranch,
                               edge_filter=EdgeFilter()):
+            self.replace_global_nodes({oldbranch: newbranch})
+
+        def replace_global_nodes(self, mapping):
+            """Replace several blocks at once: every root, and every
+            link in the tree, to a key of *mapping*, is replaced by the
+            corresponding value. The index of :meth:`parents_of` is
+            built again, in one pass over the tree, so links that were
+            changed directly are seen as well, and then only the blocks
+            which link to a key are patched. The values themselves are
+            not replaced again.
+
+            :param mapping: Maps the blocks to replace to their
+                replacement, or to ``None`` to remove them.
+            :type mapping: ``dict``
+            """
+            if not mapping:
+                return
+            self._parent_index = None
+            self._update_link_index()
+            blocks = []
+            visited = set()
+            for oldbranch in mapping:
+                for index in (self._parent_index, self._pointer_index):
+                    for block in index.get(oldbranch, ()):
+                        if block not in visited:
+                            visited.add(block)
+                            blocks.append(block)
             for i, root in enumerate(self.roots):
-                if root is oldbranch:
-                    self.roots[i] = newbranch
-                else:
-                    root.replace_global_node(oldbranch, newbranch,
-                                           edge_filter=edge_filter)
+                if root in mapping:
+                    self.roots[i] = mapping[root]
+            _replace_links(blocks, mapping)
+            # the tree changed
+            self._parent_index = None
 
         def get_detail_child_nodes(self, edge_filter=EdgeFilter()):
             yield self._version_value_
@@ -1283,11 +1638,22 @@ class NifFormat(FileFormat):
             finally:
                 stream.seek(pos)
 
-        def read(self, stream):
+        def read(self, stream, lazy=False):
             """Read a NIF file. Does not reset stream position.
 
+            If *lazy* is set, and the file has block sizes in its header
+            (version 20.2.0.7 and up), then only the header, the footer,
+            and the root blocks are read. Any other block is read from
+            the stream when it, or a link to it, is first accessed, so
+            the stream must stay open until all blocks of interest have
+            been accessed (for instance, through :attr:`blocks`,
+            :meth:`get_block`, or :meth:`blocks_of_type`). For older
+            versions, *lazy* is ignored.
+
             :param stream: The stream from which to read.
             :type stream: ``file``
+            :param lazy: Whether to read blocks on first access.
+            :type lazy: ``bool``
             """
             logger = logging.getLogger("pyffi.nif.data")
             # read header
@@ -1306,9 +1672,22 @@ class NifFormat(FileFormat):
             # read the blocks
             self._link_stack = [] # list of indices, as they are added to the stack
             self._string_list = [s for s in self.header.strings]
+            self._string_index_dct = None
             self._block_dct = {} # maps block index to actual block
             self.blocks = [] # records all blocks as read from file in order
+            self._lazy = None
+            self._dirty_blocks = None
+            self._type_index = None
+            self._parent_index = None
+            if lazy and self.version >= 0x14020007:
+                self._read_lazy(stream, logger)
+                self._read_layout = self._get_layout()
+                return
+            self._block_offsets = []
+            self._block_sizes = []
             block_num = 0 # the current block numner
+            link_starts = [] # index of the first link of each block
+            tracer = StructBase._tracer
 
             while True:
                 if self.version < 0x0303000D:
@@ -1376,11 +1755,15 @@ class NifFormat(FileFormat):
                 except AttributeError:
                     raise ValueError(
                         "Unknown block type '%s'." % block_type)
-                logger.debug("Reading %s block at 0x%08X"
-                             % (block_type, stream.tell()))
                 # read the block
+                link_starts.append(len(self._link_stack))
+                offset = stream.tell()
                 try:
-                    block.read(stream, self)
+                    if tracer is None:
+                        block.read(stream, self)
+                    else:
+                        tracer.trace("read", block_type, None,
+                                     block, stream, self)
                 except:
                     logger.exception("Reading %s failed" % block.__class__)
                     #logger.error("link stack: %s" % self._link_stack)
@@ -1396,10 +1779,9 @@ class NifFormat(FileFormat):
                 self.blocks.append(block)
                 # check block size
                 if self.version >= 0x14020007:
-                    logger.debug("Checking block size")
-                    calculated_size = block.get_size(data=self)
-                    if calculated_size != self.header.block_size[block_num]:
-                        extra_size = self.header.block_size[block_num] - calculated_size
+                    extra_size = (offset + self.header.block_size[block_num]
+                                  - stream.tell())
+                    if extra_size != 0:
                         logger.error(
                             "Block size check failed: corrupt NIF file "
                             "or bad nif.xml?")
@@ -1407,6 +1789,8 @@ class NifFormat(FileFormat):
                                      % (extra_size, block.__class__.__name__))
                         # skip bytes that were missed
                         stream.seek(extra_size, 1)
+                self._block_offsets.append(offset)
+                self._block_sizes.append(stream.tell() - offset)
                 # add block to roots if flagged as such
                 if is_root:
                     self.roots.append(block)
@@ -1418,7 +1802,9 @@ class NifFormat(FileFormat):
 
             # read footer
             ftr = NifFormat.Footer()
+            link_starts.append(len(self._link_stack))
             ftr.read(stream, self)
+            link_starts.append(len(self._link_stack))
 
             # check if we are at the end of the file
             if stream.read(1):
@@ -1426,41 +1812,419 @@ class NifFormat(FileFormat):
                     'End of file not reached: corrupt NIF file?')
 
             # fix links in blocks and footer (header has no links)
-            for block in self.blocks:
-                block.fix_links(self)
-            ftr.fix_links(self)
-            # the link stack should be empty now
-            if self._link_stack:
-                raise NifFormat.NifError('not all links have been popped from the stack (bug?)')
+            for block_num, block in enumerate(self.blocks):
+                self._fix_block_links(block, block_num,
+                                      link_starts[block_num],
+                                      link_starts[block_num + 1])
+            self._fix_block_links(ftr, None, link_starts[-2], link_starts[-1])
+            self._link_stack = []
             # add root objects in footer to roots list
             if self.version >= 0x0303000D:
                 for root in ftr.roots:
                     self.roots.append(root)
+            self._read_layout = self._get_layout()
+
+        def _get_block_reader(self, stream):
+            """Helper function for :meth:`read`, to set up a separate
+            data instance which reads the blocks from their offsets in
+            *stream*. The header must have been read already.
+            """
+            # blocks are read through a separate data instance, so
+            # they are not affected by later changes to this instance,
+            # for instance the string list and header when writing
+            reader = NifFormat.Data(
+                self.version, self.user_version, self.user_version_2)
+            reader._byte_order = self._byte_order
+            reader.modification = self.modification
+            reader._link_stack = []
+            reader._string_list = self._string_list
+            reader._block_dct = {}
+            reader._lazy = reader
+            reader._block_offsets = []
+            reader._block_sizes = list(self.header.block_size)
+            offset = stream.tell()
+            for size in reader._block_sizes:
+                reader._block_offsets.append(offset)
+                offset += size
+            reader._footer_offset = offset
+            block_types = [block_type.decode("ascii")
+                           for block_type in self.header.block_types]
+            # note the 0xfff mask: required for the NiPhysX blocks
+            reader._block_type_names = [
+                block_types[block_type_index & 0xfff]
+                for block_type_index in self.header.block_type_index]
+            reader.blocks = self._LazyBlockList(reader)
+            return reader
+
+        def _read_footer(self, stream, data, logger):
+            """Helper function for :meth:`read`, to read the footer,
+            fix its links through *data*, and add its roots.
+            """
+            ftr = NifFormat.Footer()
+            data._link_stack = []
+            ftr.read(stream, data)
+            # check if we are at the end of the file
+            if stream.read(1):
+                logger.error(
+                    'End of file not reached: corrupt NIF file?')
+            data._fix_block_links(ftr, None, 0, len(data._link_stack))
+            data._link_stack = []
+            # add root objects in footer to roots list
+            for root in ftr.roots:
+                self.roots.append(root)
+
+        def _read_lazy(self, stream, logger):
+            """Helper function for :meth:`read`, to read the footer
+            and set up lazy reading of the blocks.
+            """
+            reader = self._get_block_reader(stream)
+            reader._lazy_stream = stream
+            self._lazy = reader
+            self._block_dct = reader._block_dct
+            self._block_offsets = reader._block_offsets
+            self._block_sizes = reader._block_sizes
+            self.blocks = reader.blocks
+            stream.seek(reader._footer_offset)
+            self._read_footer(stream, reader, logger)
+
+        def _read_block_at(self, stream, index):
+            """Read the block with given index from its offset in
+            *stream*, without fixing its links, and return it. Only for
+            the data instance which reads the blocks (see
+            :meth:`_get_block_reader`).
+            """
+            logger = logging.getLogger("pyffi.nif.data")
+            block_type = self._block_type_names[index]
+            # special case: NiDataStream stores part of data in block type list
+            if block_type.startswith("NiDataStream\x01"):
+                block_type, data_stream_usage, data_stream_access = \
+                    block_type.split("\x01")
+                data_stream_usage = int(data_stream_usage)
+                data_stream_access = int(data_stream_access)
+            try:
+                block = getattr(NifFormat, block_type)()
+            except AttributeError:
+                raise ValueError(
+                    "Unknown block type '%s'." % block_type)
+            offset = self._block_offsets[index]
+            stream.seek(offset)
+            tracer = StructBase._tracer
+            try:
+                if tracer is None:
+                    block.read(stream, self)
+                else:
+                    tracer.trace("read", block_type, None, block, stream, self)
+            except:
+                logger.exception("Reading %s failed" % block.__class__)
+                raise
+            if block_type == "NiDataStream":
+                block.usage = data_stream_usage
+                block.access.populate_attribute_values(data_stream_access, self)
+            # check block size
+            extra_size = offset + self._block_sizes[index] - stream.tell()
+            if extra_size != 0:
+                logger.error(
+                    "Block size check failed: corrupt NIF file "
+                    "or bad nif.xml?")
+                logger.error("Skipping %i bytes in %s"
+                             % (extra_size, block.__class__.__name__))
+            return block
+
+        def _read_lazy_block(self, index):
+            """Read the block with given index, if it has not been
+            read yet, and return it. Only for the data instance which
+            reads the blocks of lazily read data.
+            """
+            block = self._block_dct.get(index)
+            if block is not None:
+                return block
+            self._link_stack = []
+            block = self._read_block_at(self._lazy_stream, index)
+            # store the block before fixing its links, so links to
+            # itself are resolved
+            self._block_dct[index] = block
+            self._fix_block_links(block, index, 0, len(self._link_stack))
+            self._link_stack = []
+            return block
+
+        def _fix_block_links(self, block, block_num, start, stop):
+            """Fix the links of *block*, which were added to the link
+            stack at *start* up to *stop* while reading the block.
+
+            :param block: The block, or the footer.
+            :param block_num: The index of the block, or ``None`` for
+                the footer.
+            :type block_num: ``int``
+            :param start: Index in the link stack of the first link.
+            :type start: ``int``
+            :param stop: Index in the link stack after the last link.
+            :type stop: ``int``
+            """
+            self._link_index = start
+            self._link_block = block
+            self._link_block_num = block_num
+            block.fix_links(self)
+            if self._link_index != stop:
+                raise NifFormat.NifError(
+                    'not all links of %s have been fixed (bug?)'
+                    % self._get_link_block_description())
+
+        def _get_link_block_description(self):
+            """Describe the block whose links are being fixed, for
+            error messages.
+            """
+            if self._link_block_num is None:
+                return self._link_block.__class__.__name__
+            return "%s block %i" % (self._link_block.__class__.__name__,
+                                    self._link_block_num)
+
+        def _dangling_link_error(self, block_index):
+            """Get the error for a link to a block which does not
+            exist.
+            """
+            return KeyError(
+                "dangling link to block %i in %s"
+                % (block_index, self._get_link_block_description()))
+
+        def get_block(self, index):
+            """Get the block with given index in :attr:`blocks`.
+            For lazily read data, the block is read if it has not been
+            read yet.
+
+            :param index: The index of the block.
+            :type index: ``int``
+            :return: The block.
+            :rtype: L{NifFormat.NiObject}
+            """
+            return self.blocks[index]
+
+        def blocks_of_type(self, block_type):
+            """Get all blocks of the given type, including its
+            subclasses, in the order of :attr:`blocks`. For lazily
+            read data, only blocks of the given type are read, and the
+            other blocks are not.
+
+            The blocks are looked up in an index, which is built on
+            first use. Call :meth:`update_blocks` after adding or
+            removing blocks.
+
+            :param block_type: The block type.
+            :type block_type: L{NifFormat.NiObject}
+            :return: The blocks.
+            :rtype: ``list`` of L{NifFormat.NiObject}
+            """
+            if self._lazy is None:
+                if self._type_index is None:
+                    self._type_index = {}
+                    for block in self.blocks:
+                        for cls in block.__class__.__mro__:
+                            self._type_index.setdefault(cls, []).append(block)
+                return list(self._type_index.get(block_type, ()))
+            blocks = []
+            for index, name in enumerate(self._lazy._block_type_names):
+                block_class = getattr(NifFormat, name.split("\x01")[0], None)
+                if (isinstance(block_class, type)
+                    and issubclass(block_class, block_type)):
+                    blocks.append(self._lazy._read_lazy_block(index))
+            return blocks
+
+        def parents_of(self, block):
+            """Get all blocks which refer to the given block, in the
+            order of the tree. The parents are looked up in an index,
+            which is built on first use, and which reads all blocks of
+            lazily read data. Call :meth:`update_blocks` after changing
+            references.
+
+            :param block: The block.
+            :type block: L{NifFormat.NiObject}
+            :return: The parents.
+            :rtype: ``list`` of L{NifFormat.NiObject}
+            """
+            self._update_link_index()
+            return list(self._parent_index.get(block, ()))
+
+        def _update_link_index(self):
+            """Build the index of :meth:`parents_of`, and of the other
+            blocks which point to a block, if it is not built yet.
+            """
+            if self._parent_index is not None:
+                return
+            self._parent_index = {}
+            self._pointer_index = {}
+            visited = set()
+            for root in self.roots:
+                if root is None or root in visited:
+                    continue
+                for block in root._unique_tree(None, True, visited):
+                    refs = block.get_refs(self)
+                    for child in refs:
+                        _add_to_index(self._parent_index, child, block)
+                    for link in block.get_links(self):
+                        if link is not None and link not in refs:
+                            _add_to_index(self._pointer_index, link, block)
+
+        def update_blocks(self):
+            """Update :attr:`blocks` from the tree at :attr:`roots`, in
+            the order in which :meth:`write` would write them, and reset
+            the indices of :meth:`blocks_of_type` and
+            :meth:`parents_of`. Call this method after changing the
+            tree. For lazily read data, all blocks are read.
+            """
+            self._lazy = None
+            self.blocks = []
+            self._block_type_index_dct = {}
+            block_index_dct = {}
+            for root in self.roots:
+                self._makeBlockList(root, block_index_dct, [], {})
+            self._type_index = None
+            self._parent_index = None
+
+        def mark_dirty(self, block):
+            """Mark a block as changed, so :meth:`write_changes` writes
+            it back.
+
+            :param block: The block.
+            :type block: L{NifFormat.NiObject}
+            """
+            if self._dirty_blocks is None:
+                self._dirty_blocks = set()
+            self._dirty_blocks.add(block)
+
+        def is_dirty(self):
+            """Whether any block is marked with :meth:`mark_dirty`.
+
+            :rtype: ``bool``
+            """
+            return bool(self._dirty_blocks)
+
+        def _get_layout(self):
+            """Helper function for :meth:`write_changes`, to determine
+            what, besides the blocks, must not change for the blocks to
+            be written back in place.
+            """
+            return (self.version, self.user_version, self.user_version_2,
+                    self._byte_order, self.modification,
+                    tuple(id(root) for root in self.roots))
+
+        def write_changes(self, stream):
+            """Write the blocks that are marked with :meth:`mark_dirty`
+            back to *stream*, which must be the stream from which the
+            data was read, opened for reading and writing. Only the
+            bytes of these blocks are overwritten.
+
+            This is only possible if some block is marked, if each of
+            these blocks still has the same size, if they only link to
+            blocks that were read, if their strings are all in the
+            header, and if the version and the roots did not change. Otherwise, nothing is written, and
+            the file must be written in full with :meth:`write`.
+            Changes to blocks that are not marked are not written.
+            If writing fails, the original bytes of the blocks are
+            restored before the exception is raised again.
+
+            :param stream: The stream from which the data was read.
+            :type stream: ``file``
+            :return: ``True`` if the changes were written, ``False``
+                otherwise.
+            :rtype: ``bool``
+            """
+            if (not self._dirty_blocks
+                or self._block_offsets is None
+                or self.version < 0x0303000D
+                or self._read_layout != self._get_layout()):
+                return False
+            dirty_blocks = list(self._dirty_blocks)
+            # links of lazily read data are read here, so they are
+            # in the block index below
+            links = [block.get_links(self) for block in dirty_blocks]
+            self._block_index_dct = dict(
+                (block, index) for index, block in self._block_dct.items())
+            self._string_index_dct = {}
+            for index, s in enumerate(self._string_list):
+                self._string_index_dct.setdefault(s, index)
+            tracer = StructBase._tracer
+            changes = []
+            for block, block_links in zip(dirty_blocks, links):
+                index = self._block_index_dct.get(block)
+                if index is None:
+                    return False
+                if any(link not in self._block_index_dct
+                       for link in block_links):
+                    return False
+                block_stream = io.BytesIO()
+                try:
+                    if tracer is None:
+                        block.write(block_stream, self)
+                    else:
+                        tracer.trace("write", block.__class__.__name__, None,
+                                     block, block_stream, self)
+                except ValueError:
+                    # string not in string list
+                    return False
+                if block_stream.tell() != self._block_sizes[index]:
+                    return False
+                changes.append((self._block_offsets[index], block_stream))
+            # only write once all blocks are known to fit
+            changes.sort(key=lambda change: change[0])
+            # keep the original bytes, to restore them if writing fails
+            originals = []
+            for offset, block_stream in changes:
+                stream.seek(offset)
+                originals.append((offset, stream.read(block_stream.tell())))
+            try:
+                for offset, block_stream in changes:
+                    stream.seek(offset)
+                    with block_stream.getbuffer() as view:
+                        stream.write(view)
+                stream.flush()
+            except:  # not just Exception, also CTRL-C
+                for offset, original in originals:
+                    stream.seek(offset)
+                    stream.write(original)
+                stream.flush()
+                raise
+            self._dirty_blocks = None
+            return True
 
         def write(self, stream):
             """Write a NIF file. The L{header} and the L{blocks} are recalculated
             from the tree at L{roots} (e.g. list of block types, number of blocks,
             list of block types, list of strings, list of block sizes etc.).
 
+            The file is first written to memory, so the block sizes are
+            known when the header is written, and then written to
+            *stream* at once.
+
             :param stream: The stream to which to write.
             :type stream: file
             """
-            logger = logging.getLogger("pyffi.nif.data")
+            # blocks which are not read yet are read while walking
+            # the tree below
+            self._lazy = None
+            # the blocks will no longer be where they were read from
+            self._block_offsets = None
+            self._block_sizes = None
+            self._dirty_blocks = None
             # set up index and type dictionary
             self.blocks = [] # list of all blocks to be written
             self._block_index_dct = {} # maps block to block index
             block_type_list = [] # list of all block type strings
             block_type_dct = {} # maps block to block type string index
-            self._string_list = []
+            # maps block type string to its index in block_type_list
+            self._block_type_index_dct = {}
             for root in self.roots:
                 self._makeBlockList(root,
                                     self._block_index_dct,
                                     block_type_list, block_type_dct)
-                for block in root.tree():
-                    self._string_list.extend(
-                        block.get_strings(self))
-            self._string_list = list(set(self._string_list)) # ensure unique elements
-            #print(self._string_list) # debug
+            self._type_index = None
+            self._parent_index = None
+            # unique strings, in the order in which they are first found
+            self._string_list = []
+            self._string_index_dct = {}
+            for block in self.blocks:
+                for s in block.get_strings(self):
+                    if s not in self._string_index_dct:
+                        self._string_index_dct[s] = len(self._string_list)
+                        self._string_list.append(s)
 
             self.header.user_version = self.user_version # TODO dedicated type for user_version similar to FileVersion
             # for oblivion CS; apparently this is the version of the bhk blocks
@@ -1481,11 +2245,8 @@ class NifFormat(FileFormat):
             self.header.strings.update_size()
             for i, s in enumerate(self._string_list):
                 self.header.strings[i] = s
+            # block sizes are filled in while the blocks are written
             self.header.block_size.update_size()
-            for i, block in enumerate(self.blocks):
-                self.header.block_size[i] = block.get_size(data=self)
-            #if verbose >= 2:
-            #    print(hdr)
 
             # set up footer
             ftr = NifFormat.Footer()
@@ -1494,39 +2255,56 @@ class NifFormat(FileFormat):
             for i, root in enumerate(self.roots):
                 ftr.roots[i] = root
 
-            # write the file
-            logger.debug("Writing header")
-            #logger.debug("%s" % self.header)
-            self.header.write(stream, self)
-            for block in self.blocks:
+            # write the file to a buffer, measuring block sizes while
+            # writing the blocks; the header is written again once all
+            # block sizes are known (this does not change its size)
+            body = io.BytesIO()
+            self.header.write(body, self)
+            header_size = body.tell()
+            tracer = StructBase._tracer
+            roots = set(self.roots)
+            block_size = self.header.block_size
+            for i, block in enumerate(self.blocks):
                 # signal top level object if block is a root object
-                if self.version < 0x0303000D and block in self.roots:
+                if self.version < 0x0303000D and block in roots:
                     s = NifFormat.SizedString()
                     s.set_value("Top Level Object")
-                    s.write(stream, self)
+                    s.write(body, self)
                 if self.version >= 0x05000001:
                     if self.version <= 0x0A01006A:
                         # write zero dummy separator
-                        stream.write('\x00\x00\x00\x00'.encode("ascii"))
+                        body.write('\x00\x00\x00\x00'.encode("ascii"))
                 else:
                     # write block type string
                     s = NifFormat.SizedString()
                     assert(block_type_list[block_type_dct[block]]
                            == block.__class__.__name__) # debug
                     s.set_value(block.__class__.__name__)
-                    s.write(stream, self)
+                    s.write(body, self)
                 # write block index
-                logger.debug("Writing %s block" % block.__class__.__name__)
                 if self.version < 0x0303000D:
-                    stream.write(struct.pack(self._byte_order + 'i',
-                                             self._block_index_dct[block]))
+                    body.write(struct.pack(self._byte_order + 'i',
+                                           self._block_index_dct[block]))
                 # write block
-                block.write(stream, self)
+                offset = body.tell()
+                if tracer is None:
+                    block.write(body, self)
+                else:
+                    tracer.trace("write", block.__class__.__name__, None,
+                                 block, body, self)
+                if block_size:
+                    block_size[i] = body.tell() - offset
             if self.version < 0x0303000D:
                 s = NifFormat.SizedString()
                 s.set_value("End Of File")
-                s.write(stream, self)
-            ftr.write(stream, self)
+                s.write(body, self)
+            ftr.write(body, self)
+            if block_size:
+                body.seek(0)
+                self.header.write(body, self)
+                assert(body.tell() == header_size) # debug
+            with body.getbuffer() as view:
+                stream.write(view)
 
         def _makeBlockList(
             self, root, block_index_dct, block_type_list, block_type_dct):
@@ -1560,7 +2338,7 @@ class NifFormat(FileFormat):
                         and not isinstance(block, NifFormat.bhkConstraint))
 
             # block already listed? if so, return
-            if root in self.blocks:
+            if root in block_index_dct:
                 return
             # add block type to block type dictionary
             block_type = root.__class__.__name__
@@ -1569,9 +2347,10 @@ class NifFormat(FileFormat):
                 block_type = ("NiDataStream\x01%i\x01%i"
                               % (root.usage, root.access.get_attributes_values(self)))
             try:
-                block_type_dct[root] = block_type_list.index(block_type)
-            except ValueError:
+                block_type_dct[root] = self._block_type_index_dct[block_type]
+            except KeyError:
                 block_type_dct[root] = len(block_type_list)
+                self._block_type_index_dct[block_type] = len(block_type_list)
                 block_type_list.append(block_type)
 
             # special case: add bhkConstraint entities before bhkConstraint
@@ -5712,7 +6491,22 @@ class NifFormat(FileFormat):
             self.add_extra_data(extra)
 
     class NiObject:
+        def replace_global_node(self, oldbranch, newbranch,
+                                edge_filter=EdgeFilter()):
+            """Replace every link to *oldbranch* in the tree of this
+            block by a link to *newbranch*.
+            """
+            _replace_links(list(self.tree(unique=True)),
+                           {oldbranch: newbranch})
+
         def find(self, block_name = None, block_type = None):
+            return self._find(block_name, block_type, set())
+
+        def _find(self, block_name, block_type, visited):
+            """Helper function for :meth:`find`. Blocks in *visited*
+            are known not to match, nor any block in their tree.
+            """
+            visited.add(self)
             # does this block match the search criteria?
             if block_name and block_type:
                 if isinstance(self, block_type):
@@ -5730,7 +6524,9 @@ class NifFormat(FileFormat):
 
             # ok, this block is not a match, so check further down in tree
             for child in self.get_refs():
-                blk = child.find(block_name, block_type)
+                if child in visited:
+                    continue
+                blk = child._find(block_name, block_type, visited)
                 if blk: return blk
 
             return None
@@ -5743,13 +6539,24 @@ class NifFormat(FileFormat):
 
             :param block: The block to find a chain to.
             :param block_type: The type that blocks should have in this chain."""
-
+            chain = self._find_chain(block, block_type, set())
+            chain.reverse()
+            return chain
+
+        def _find_chain(self, block, block_type, visited):
+            """Helper function for :meth:`find_chain`, which returns the
+            chain in reverse order. Blocks in *visited* have no chain to
+            *block*.
+            """
+            visited.add(self)
             if self is block: return [self]
             for child in self.get_refs():
                 if block_type and not isinstance(child, block_type): continue
-                child_chain = child.find_chain(block, block_type)
+                if child in visited: continue
+                child_chain = child._find_chain(block, block_type, visited)
                 if child_chain:
-                    return [self] + child_chain
+                    child_chain.append(self)
+                    return child_chain
 
             return []
 
@@ -5768,13 +6575,10 @@ class NifFormat(FileFormat):
             :param follow_all: If C{block_type} is not ``None``, then if this is ``True`` the function will parse the whole tree. Otherwise, the function will not follow branches that start by a non-C{block_type} block.
 
             :param unique: Whether the generator can return the same block twice or not."""
-            # unique blocks: reduce this to the case of non-unique blocks
+            # unique blocks: skip the trees of blocks that were visited
             if unique:
-                block_list = []
-                for block in self.tree(block_type = block_type, follow_all = follow_all, unique = False):
-                    if not block in block_list:
-                        yield block
-                        block_list.append(block)
+                for block in self._unique_tree(block_type, follow_all, set()):
+                    yield block
                 return
 
             # yield self
@@ -5790,6 +6594,21 @@ class NifFormat(FileFormat):
                 for block in child.tree(block_type = block_type, follow_all = follow_all):
                     yield block
 
+        def _unique_tree(self, block_type, follow_all, visited):
+            """Helper function for :meth:`tree`, to yield every block once.
+            The trees of blocks in *visited* have been parsed already.
+            """
+            visited.add(self)
+            if not block_type or isinstance(self, block_type):
+                yield self
+            elif not follow_all:
+                return # don't recurse further
+            for child in self.get_refs():
+                if child not in visited:
+                    for block in child._unique_tree(
+                        block_type, follow_all, visited):
+                        yield block
+
         def _validateTree(self):
             """Raises ValueError if there is a cycle in the tree."""
             # If the tree is parsed, then each block should be visited once.
@@ -5816,11 +6635,37 @@ class NifFormat(FileFormat):
                 # for blocks with references: quick check only
                 return self is other
 
+        def get_fingerprint(self):
+            """Get a digest of what :meth:`is_interchangeable` compares:
+            interchangeable blocks have the same fingerprint, so only
+            blocks with the same fingerprint need to be compared.
+
+            :return: The fingerprint, or ``None`` if the block is only
+                interchangeable with itself.
+            :rtype: ``str``
+            """
+            if isinstance(self, (NifFormat.NiProperty, NifFormat.NiSourceTexture)):
+                return _get_fingerprint(self.__class__.__name__, self.get_hash())
+            else:
+                return None
+
     class NiMaterialProperty:
+        _special_names = (b"envmap2", b"envmap", b"skin", b"hair",
+                          b"dynalpha", b"hidesecret", b"lava")
+        """Names of materials which are never merged with materials
+        of another name."""
+
+        def get_fingerprint(self):
+            if self.name.lower() in self._special_names:
+                return _get_fingerprint(self.__class__.__name__, self.get_hash())
+            else:
+                # ignore name
+                return _get_fingerprint(self.__class__.__name__,
+                                        self.get_hash()[1:])
+
         def is_interchangeable(self, other):
             """Are the two material blocks interchangeable?"""
-            specialnames = (b"envmap2", b"envmap", b"skin", b"hair",
-                            b"dynalpha", b"hidesecret", b"lava")
+            specialnames = self._special_names
             if self.__class__ is not other.__class__:
                 return False
             if (self.name.lower() in specialnames
@@ -6052,6 +6897,12 @@ class NifFormat(FileFormat):
             self.translation.z *= scale
 
     class NiTriBasedGeomData:
+        def get_fingerprint(self):
+            # is_interchangeable compares the vertices as sets
+            return _get_fingerprint(
+                self.__class__.__name__, self.num_vertices,
+                sorted(set(self.get_vertex_hash_generator())))
+
         def is_interchangeable(self, other):
             """Heuristically checks if two NiTriBasedGeomData blocks describe
             the same geometry, that is, if they can be used interchangeably in
@@ -212,6 +212,38 @@ class FileFormat(object):
             """
             raise NotImplementedError
 
+        def mark_dirty(self, block):
+            """Mark part of the data as changed, for :meth:`write_changes`.
+            Override this method, along with :meth:`write_changes`.
+            This implementation does nothing.
+
+            :param block: The part of the data that changed.
+            """
+            pass
+
+        def is_dirty(self):
+            """Whether any part of the data is marked with
+            :meth:`mark_dirty`. Override this method, along with
+            :meth:`mark_dirty`. This implementation returns ``False``.
+
+            :rtype: ``bool``
+            """
+            return False
+
+        def write_changes(self, stream):
+            """Write the parts of the data that are marked with
+            :meth:`mark_dirty` back to the stream from which the data
+            was read, in place, if possible. Override this method.
+            This implementation writes nothing.
+
+            :param stream: The file from which the data was read.
+            :type stream: ``file``
+            :return: ``True`` if the changes were written, ``False`` if
+                the data must be written with :meth:`write` instead.
+            :rtype: ``bool``
+            """
+            return False
+
     @staticmethod
     def version_number(version_str):
         """Converts version string into an integer.
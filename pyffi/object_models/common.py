@@ -119,6 +119,8 @@ class Int(BasicBase, EditableSpinBox):
     '0x44332211'
     """
 
+    __slots__ = ("_value",)
+
     _min = -0x80000000 #: Minimum value.
     _max = 0x7fffffff  #: Maximum value.
     _struct = 'i'      #: Character used to represent type in struct.
@@ -208,6 +210,7 @@ class Int(BasicBase, EditableSpinBox):
 
 class UInt(Int):
     """Implementation of a 32-bit unsigned integer type."""
+    __slots__ = ()
     _min = 0
     _max = 0xffffffff
     _struct = 'I'
@@ -215,6 +218,7 @@ class UInt(Int):
 
 class Int64(Int):
     """Implementation of a 64-bit signed integer type."""
+    __slots__ = ()
     _min = -0x8000000000000000
     _max = 0x7fffffffffffffff
     _struct = 'q'
@@ -222,6 +226,7 @@ class Int64(Int):
 
 class UInt64(Int):
     """Implementation of a 64-bit unsigned integer type."""
+    __slots__ = ()
     _min = 0
     _max = 0xffffffffffffffff
     _struct = 'Q'
@@ -229,6 +234,7 @@ class UInt64(Int):
 
 class Byte(Int):
     """Implementation of a 8-bit signed integer type."""
+    __slots__ = ()
     _min = -0x80
     _max = 0x7f
     _struct = 'b'
@@ -236,6 +242,7 @@ class Byte(Int):
 
 class UByte(Int):
     """Implementation of a 8-bit unsigned integer type."""
+    __slots__ = ()
     _min = 0
     _max = 0xff
     _struct = 'B'
@@ -243,6 +250,7 @@ class UByte(Int):
 
 class Short(Int):
     """Implementation of a 16-bit signed integer type."""
+    __slots__ = ()
     _min = -0x8000
     _max = 0x7fff
     _struct = 'h'
@@ -250,6 +258,7 @@ class Short(Int):
 
 class UShort(UInt):
     """Implementation of a 16-bit unsigned integer type."""
+    __slots__ = ()
     _min = 0
     _max = 0xffff
     _struct = 'H'
@@ -259,6 +268,9 @@ class ULittle32(UInt):
     """Little endian 32 bit unsigned integer (ignores specified data
     byte order).
     """
+
+    __slots__ = ()
+
     def read(self, stream, data):
         """Read value from stream.
 
@@ -278,6 +290,7 @@ class ULittle32(UInt):
 
 class Bool(UByte, EditableBoolComboBox):
     """Simple bool implementation."""
+    __slots__ = ()
 
     def get_value(self):
         """Return stored value.
@@ -297,6 +310,8 @@ class Bool(UByte, EditableBoolComboBox):
 class Char(BasicBase, EditableLineEdit):
     """Implementation of an (unencoded) 8-bit character."""
 
+    __slots__ = ("_value",)
+
     def __init__(self, **kwargs):
         """Initialize the character."""
         super(Char, self).__init__(**kwargs)
@@ -355,6 +370,8 @@ class Char(BasicBase, EditableLineEdit):
 class Float(BasicBase, EditableFloatSpinBox):
     """Implementation of a 32-bit float."""
 
+    __slots__ = ("_value",)
+
     def __init__(self, **kwargs):
         """Initialize the float."""
         super(Float, self).__init__(**kwargs)
@@ -434,6 +451,9 @@ class ZString(BasicBase, EditableLineEdit):
     >>> str(m)
     'Hi There!'
     """
+
+    __slots__ = ("_value",)
+
     _maxlen = 1000 #: The maximum length.
 
     def __init__(self, **kwargs):
@@ -529,6 +549,9 @@ class FixedString(BasicBase, EditableLineEdit):
     >>> str(m)
     'Hi There'
     """
+
+    __slots__ = ("_value",)
+
     _len = 0
 
     def __init__(self, **kwargs):
@@ -615,6 +638,8 @@ class SizedString(BasicBase, EditableLineEdit):
     'Hi There'
     """
 
+    __slots__ = ("_value",)
+
     def __init__(self, **kwargs):
         """Initialize the string."""
         super(SizedString, self).__init__(**kwargs)
@@ -680,6 +705,9 @@ class SizedString(BasicBase, EditableLineEdit):
 
 class UndecodedData(BasicBase):
     """Basic type for undecoded data trailing at the end of a file."""
+
+    __slots__ = ("_value",)
+
     def __init__(self, **kwargs):
         BasicBase.__init__(self, **kwargs)
         self._value = b''
@@ -39,6 +39,8 @@ file, and xml handler for converting the xml description into Python classes.
 #
 # ***** END LICENSE BLOCK *****
 
+import copy
+import hashlib
 import logging
 import time # for timing stuff
 import types
@@ -52,6 +54,7 @@ from pyffi.object_models.xml.basic      import BasicBase
 from pyffi.object_models.xml.bit_struct import BitStructBase
 from pyffi.object_models.xml.enum       import EnumBase
 from pyffi.object_models.xml.expression import Expression
+from pyffi.object_models.xml.cache      import SchemaCache
 
 
 class MetaFileFormat(pyffi.object_models.MetaFileFormat):
@@ -94,19 +97,61 @@ class MetaFileFormat(pyffi.object_models.MetaFileFormat):
             # open XML file
             start = time.time()
             xml_file = cls.openfile(xml_file_name, cls.xml_file_path)
+            xml_file.close()
+            with open(xml_file.name, "rb") as stream:
+                xml_data = stream.read()
+            cls.xml_file_digest = hashlib.sha1(xml_data).hexdigest()
             xmlp = XmlParser(cls)
-            try:
-                xmlp.load_xml(xml_file)
-            finally:
-                xml_file.close()
+            # use the cached definitions if possible
+            schema_cache = (SchemaCache(cls, xml_file.name, xml_data)
+                            if cls.xml_cache else None)
+            schema = schema_cache.load() if schema_cache else None
+            if schema is None:
+                xmlp.load_root(ET.fromstring(xml_data))
+                if schema_cache and schema_cache.autosave:
+                    schema_cache.save(xmlp.get_schema())
+            else:
+                if cls.xml_lazy:
+                    cls._xml_parser = xmlp
+                xmlp.load_schema(schema, lazy=cls.xml_lazy)
+            xmlp.final_cleanup()
 
             cls.logger.debug("Parsing finished in %.3f seconds." % (time.time() - start))
 
+    def __getattr__(cls, name):
+        """Create classes of lazily loaded formats on first access
+        (see :attr:`FileFormat.xml_lazy`)."""
+        for klass in cls.__mro__:
+            xmlp = klass.__dict__.get("_xml_parser")
+            if xmlp is not None:
+                return xmlp.get_class(name)
+        raise AttributeError(
+            "type object '%s' has no attribute '%s'" % (cls.__name__, name))
+
+    def create_all_classes(cls):
+        """Create all classes which have not been created yet, which is
+        only needed for formats with :attr:`FileFormat.xml_lazy` set
+        before iterating over, say, :attr:`FileFormat.xml_struct`."""
+        for klass in cls.__mro__:
+            xmlp = klass.__dict__.get("_xml_parser")
+            if xmlp is not None:
+                xmlp.create_all_classes()
+                break
+
 class FileFormat(pyffi.object_models.FileFormat, metaclass=MetaFileFormat):
     """This class can be used as a base class for file formats
     described by an xml file."""
     xml_file_name = None #: Override.
     xml_file_path = None #: Override.
+    xml_cache = True #: Whether to cache the parsed xml file, see :mod:`pyffi.object_models.xml.cache`.
+    xml_file_digest = None #: The sha1 hex digest of the xml file, set when it is parsed.
+    #: Whether to create the classes on first access rather than on import.
+    #: This needs the cache, classes are created on import whenever the xml file is parsed.
+    xml_lazy = bool(os.getenv("PYFFI_XML_LAZY"))
+    #: Names of generated struct classes whose instances have no ``__dict__``, so
+    #: no attributes can be set on them which are not in the xml file.
+    #: Classes which are customized in the format's module always have one.
+    xml_no_dict_classes = frozenset()
     logger = logging.getLogger("pyffi.object_models.xml")
 
     # We also keep an ordered list of all classes that have been created.
@@ -275,13 +320,88 @@ class XmlParser:
         self.tokens = [ ]
         self.versions = [ ([], ("versions", "until", "since")), ]
 
+        # list of (kind, args) for each definition read so far, where
+        # the build_<kind>(*args) method creates it
+        self.schema = []
+
+        # for lazily created classes: map each class name to its
+        # (index, kind, args) definition, until it is created
+        self.lazy_definitions = {}
+        self.indices = {}
+        # indices of the definitions which are being created
+        self.building = []
+        # names of created classes which still need final_cleanup
+        self.created = []
+        # classes of self.cls which customize lazily created classes
+        self.customizers = {}
+
     def load_xml(self, file):
         """Loads an XML (can be filepath or open file) and does all parsing"""
         tree = ET.parse(file)
         root = tree.getroot()
         self.load_root(root)
         self.final_cleanup()
-            
+
+    def load_schema(self, schema, lazy=False):
+        """Creates all definitions from a list that was recorded while
+        parsing (see :meth:`get_schema`). Call :meth:`final_cleanup`
+        afterwards. If *lazy* is ``True``, then classes are only created
+        when they are first accessed (see :meth:`get_class`)."""
+        for index, (kind, args) in enumerate(schema):
+            if kind in ("version", "basic") or not lazy:
+                self.add_definition(kind, *args)
+                continue
+            # args[1] is the class name
+            cls_klass = self.cls.__dict__.get(args[1])
+            if isinstance(cls_klass, type) and issubclass(
+                    cls_klass, (BasicBase, pyffi.object_models.FileFormat.Data)):
+                # nothing to create, or must be aliased (see create_class)
+                # so create it now, as if it was needed by a later class
+                self.building.append(index)
+                try:
+                    self.add_definition(kind, *args)
+                finally:
+                    self.building.pop()
+                continue
+            self.lazy_definitions[args[1]] = (index, kind, args)
+            self.indices[args[1]] = index
+            # move customized classes out of the way, until created
+            if cls_klass is not None:
+                self.customizers[args[1]] = cls_klass
+                delattr(self.cls, args[1])
+
+    def get_schema(self):
+        """Returns the definitions read so far, in a form that can be
+        pickled. Must be called before :meth:`final_cleanup`."""
+        schema = []
+        for kind, args in self.schema:
+            if kind == "struct":
+                # refer to types by name, they are resolved when built
+                attrs = []
+                for attr in args[5]:
+                    attr = copy.copy(attr)
+                    if isinstance(attr.type_, type) \
+                       and attr.type_ is not type(None):
+                        attr.type_ = self.get_type_name(attr.type_)
+                    attrs.append(attr)
+                args = args[:5] + (attrs,) + args[6:]
+            schema.append((kind, args))
+        return schema
+
+    def get_type_name(self, klass):
+        """Returns a name under which klass is found in self.cls."""
+        if getattr(self.cls, klass.__name__, None) is klass:
+            return klass.__name__
+        for name in dir(self.cls):
+            if getattr(self.cls, name) is klass:
+                return name
+        raise XmlError("type %s not found" % klass.__name__)
+
+    def add_definition(self, kind, *args):
+        """Records a definition, and builds it."""
+        self.schema.append((kind, args))
+        getattr(self, "build_" + kind)(*args)
+
     def load_root(self, root):
         """Goes over all children of the root node and calls the appropriate function depending on type of the child"""
         for child in root:
@@ -315,10 +435,16 @@ class XmlParser:
         # versions must be in reverse order so don't append but insert at beginning
         if "id" in version.attrib:
             self.versions[0][0].insert( 0, (version.attrib["id"], version.attrib["num"]) )
-        # add to supported versions
-        self.version_string = version.attrib["num"]
-        self.cls.versions[self.version_string] = self.cls.version_number(self.version_string)
-        self.update_gamesdict(self.cls.games, version.text)
+        version_string = version.attrib["num"]
+        self.add_definition(
+            "version", version_string,
+            self.cls.version_number(version_string), version.text)
+
+    def build_version(self, version_string, version_number, games_text):
+        """Adds a version to the supported versions"""
+        self.version_string = version_string
+        self.cls.versions[self.version_string] = version_number
+        self.update_gamesdict(self.cls.games, games_text)
         self.version_string = None
     
     def read_module(self, module):
@@ -328,12 +454,16 @@ class XmlParser:
 
     def read_basic(self, basic):
         """Maps to a type defined in self.cls"""
-        self.class_name = basic.attrib["name"]
+        self.add_definition(
+            "basic", basic.attrib["name"], self.is_generic(basic.attrib))
+
+    def build_basic(self, class_name, is_template):
+        """Checks the type defined in self.cls"""
+        self.class_name = class_name
         # Each basic type corresponds to a type defined in C{self.cls}.
         # The link between basic types and C{self.cls} types is done via the name of the class.
         basic_class = getattr(self.cls, self.class_name)
         # check the class variables
-        is_template = self.is_generic(basic.attrib)
         if basic_class._is_template != is_template:
             raise XmlError( 'class %s should have _is_template = %s' % (self.class_name, is_template))
 
@@ -344,15 +474,13 @@ class XmlParser:
     def read_bitstruct(self, bitstruct):
         """Create a bitstruct class"""
         attrs = self.replace_tokens(bitstruct.attrib)
-        self.base_class = BitStructBase
-        self.update_class_dict(attrs, bitstruct.text)
+        class_name = attrs["name"]
         try:
             numbytes = int(attrs["numbytes"])
         except KeyError:
             # niftools style: storage attribute
             numbytes = getattr(self.cls, attrs["storage"]).get_size()
-        self.class_dict["_attrs"] = []
-        self.class_dict["_numbytes"] = numbytes
+        bitstruct_attrs = []
         for member in bitstruct:
             attrs = self.replace_tokens(member.attrib)
             if member.tag == "bits":
@@ -363,7 +491,7 @@ class XmlParser:
                 # niftools compatibility, we have a bitflags field
                 # so convert value into numbits
                 # first, calculate current bit position
-                bitpos = sum(bitattr.numbits for bitattr in self.class_dict["_attrs"])
+                bitpos = sum(bitattr.numbits for bitattr in bitstruct_attrs)
                 # avoid crash
                 if "value" in attrs:
                     # check if extra bits must be inserted
@@ -371,8 +499,8 @@ class XmlParser:
                     if numextrabits < 0:
                         raise XmlError("values of bitflags must be increasing")
                     if numextrabits > 0:
-                        reserved = dict(name="Reserved Bits %i"% len(self.class_dict["_attrs"]), numbits=numextrabits)
-                        self.class_dict["_attrs"].append( BitStructAttribute( self.cls, reserved))
+                        reserved = dict(name="Reserved Bits %i"% len(bitstruct_attrs), numbits=numextrabits)
+                        bitstruct_attrs.append( BitStructAttribute( self.cls, reserved))
                 # add the actual attribute
                 bit_attrs = dict(name=attrs["name"], numbits=1)
             # new nif xml    
@@ -381,57 +509,84 @@ class XmlParser:
             else:
                 raise XmlError("only bits tags allowed in struct type declaration")
             
-            self.class_dict["_attrs"].append( BitStructAttribute(self.cls, bit_attrs) )
-            self.update_doc(self.class_dict["_attrs"][-1].doc, member.text)
+            bitstruct_attrs.append( BitStructAttribute(self.cls, bit_attrs) )
+            self.update_doc(bitstruct_attrs[-1].doc, member.text)
 
-        self.create_class(bitstruct.tag)
+        self.add_definition(
+            "bitstruct", bitstruct.tag, class_name, bitstruct.text,
+            numbytes, bitstruct_attrs)
+
+    def build_bitstruct(self, tag, class_name, doc_text, numbytes, attrs):
+        """Create a bitstruct class from its definition"""
+        self.base_class = BitStructBase
+        self.update_class_dict(dict(name=class_name), doc_text)
+        self.class_dict["_attrs"] = attrs
+        self.class_dict["_numbytes"] = numbytes
+        self.create_class(tag)
 
     def read_struct(self, struct):
         """Create a struct class"""
         attrs = self.replace_tokens(struct.attrib)
-        self.update_class_dict(attrs, struct.text)
-        # struct types can be organized in a hierarchy
-        # if inherit attribute is defined, look for corresponding base block
+        class_name = attrs["name"]
         class_basename = attrs.get("inherit")
-        if class_basename:
-            # class_basename must have been assigned to a class
-            try:
-                self.base_class = getattr(self.cls, class_basename)
-            except KeyError:
-                raise XmlError( "typo, or forward declaration of struct %s" % class_basename)
-        else:
-            self.base_class = StructBase
-        # set attributes (see class StructBase)
         # 'generic' attribute is optional- if not set, then the struct is not a template
-        self.class_dict["_is_template" ] = self.is_generic(attrs)
-        self.class_dict["_attrs" ] = []
-        self.class_dict["_games" ] = {}
+        is_template = self.is_generic(attrs)
+        struct_attrs = []
+        struct_versions = {}
+        games = {}
         for field in struct:
             attrs = self.replace_tokens(field.attrib)
             # the common case
             if field.tag in ("add", "field"):
                 # add attribute to class dictionary
-                self.class_dict["_attrs"].append( StructAttribute(self.cls, attrs) )
-                self.update_doc(self.class_dict["_attrs"][-1].doc, field.text)
+                struct_attrs.append( StructAttribute(self.cls, attrs) )
+                self.update_doc(struct_attrs[-1].doc, field.text)
             # not found in current nifxml
             elif field.tag == "version":
                 # set the version string
                 self.version_string = attrs["num"]
-                self.cls.versions[self.version_string] = self.cls.version_number(self.version_string)
-                self.update_gamesdict(self.class_dict["_games"], field.text)
+                struct_versions[self.version_string] = self.cls.versions[self.version_string] = self.cls.version_number(self.version_string)
+                self.update_gamesdict(games, field.text)
             else:
                 print("only add and version tags allowed in struct declaration")
             # load defaults for this <field>
             for default in field:
                 if default.tag != "default":
                     raise AttributeError("struct children's children must be 'default' tag")
-        self.create_class(struct.tag)
+        self.add_definition(
+            "struct", struct.tag, class_name, struct.text, class_basename,
+            is_template, struct_attrs, struct_versions, games)
+
+    def build_struct(self, tag, class_name, doc_text, class_basename,
+                     is_template, attrs, versions, games):
+        """Create a struct class from its definition"""
+        self.update_class_dict(dict(name=class_name), doc_text)
+        self.cls.versions.update(versions)
+        # struct types can be organized in a hierarchy
+        # if inherit attribute is defined, look for corresponding base block
+        if class_basename:
+            # class_basename must have been assigned to a class
+            try:
+                self.base_class = getattr(self.cls, class_basename)
+            except KeyError:
+                raise XmlError( "typo, or forward declaration of struct %s" % class_basename)
+        else:
+            self.base_class = StructBase
+        # resolve types which were recorded by name
+        for attr in attrs:
+            if isinstance(attr.type_, str):
+                # forward declaration, resolved in final_cleanup()
+                attr.type_ = getattr(self.cls, attr.type_, attr.type_)
+        # set attributes (see class StructBase)
+        self.class_dict["_is_template" ] = is_template
+        self.class_dict["_attrs" ] = attrs
+        self.class_dict["_games" ] = games
+        self.create_class(tag)
 
     def read_enum(self, enum):
         """Create an enum class"""
         attrs = self.replace_tokens(enum.attrib)
-        self.base_class = EnumBase
-        self.update_class_dict(attrs, enum.text)
+        class_name = attrs["name"]
         try:
             numbytes = int(attrs["numbytes"])
         except KeyError:
@@ -443,10 +598,8 @@ class XmlParser:
             except AttributeError:
                 raise XmlError("typo, or forward declaration of type %s" % typename)
             numbytes = typ.get_size()
-        # add stuff to classdict
-        self.class_dict["_numbytes"] = numbytes
-        self.class_dict["_enumkeys"] = []
-        self.class_dict["_enumvalues"] = []
+        enumkeys = []
+        enumvalues = []
         for option in enum:
             attrs = self.replace_tokens(option.attrib)
             if option.tag not in ("option",):
@@ -458,19 +611,37 @@ class XmlParser:
                 value = int(value)
             except ValueError:
                 value = int(value, 16)
-            self.class_dict["_enumkeys"].append(attrs["name"])
-            self.class_dict["_enumvalues"].append(value)
-        self.create_class(enum.tag)
+            enumkeys.append(attrs["name"])
+            enumvalues.append(value)
+        self.add_definition(
+            "enum", enum.tag, class_name, enum.text, numbytes,
+            enumkeys, enumvalues)
+
+    def build_enum(self, tag, class_name, doc_text, numbytes,
+                   enumkeys, enumvalues):
+        """Create an enum class from its definition"""
+        self.base_class = EnumBase
+        self.update_class_dict(dict(name=class_name), doc_text)
+        # add stuff to classdict
+        self.class_dict["_numbytes"] = numbytes
+        self.class_dict["_enumkeys"] = enumkeys
+        self.class_dict["_enumvalues"] = enumvalues
+        self.create_class(tag)
 
     def read_alias(self, alias):
         """Create an alias class, ie. one that gives access to another class"""
-        self.update_class_dict(alias.attrib, alias.text)
-        typename = alias.attrib["type"]
+        self.add_definition(
+            "alias", alias.tag, alias.attrib["name"], alias.text,
+            alias.attrib["type"])
+
+    def build_alias(self, tag, class_name, doc_text, typename):
+        """Create an alias class from its definition"""
+        self.update_class_dict(dict(name=class_name), doc_text)
         try:
             self.base_class = getattr(self.cls, typename)
         except AttributeError:
             raise XmlError("typo, or forward declaration of type %s" % typename)
-        self.create_class(alias.tag)
+        self.create_class(tag)
 
 
     # the following are helper functions
@@ -493,6 +664,19 @@ class XmlParser:
         self.class_name = attrs["name"]
         self.class_dict = {"__doc__": doc_text, "__module__": self.cls.__module__}
 
+    def get_qualname(self, name):
+        """The qualified name of the class *name* of the format, so
+        instances can be pickled (classes are looked up by this name
+        when unpickling).
+        """
+        return "%s.%s" % (self.cls.__name__, name)
+
+    def get_class_dict(self, name):
+        """A copy of class_dict, for creating the class *name*."""
+        class_dict = dict(self.class_dict)
+        class_dict["__qualname__"] = self.get_qualname(name)
+        return class_dict
+
     def update_doc(self, doc, doc_text):
         if doc_text:
             doc += doc_text.strip()
@@ -502,7 +686,26 @@ class XmlParser:
         # assign it to cls.<class_name> if it has not been implemented internally
 
         # type(name, bases, dict) returns a new type object, essentially a dynamic form of the class statement
-        cls_klass = getattr(self.cls, self.class_name, None)
+        cls_klass = (self.customizers.pop(self.class_name, None)
+                     or getattr(self.cls, self.class_name, None))
+        # store attribute values of generated structs and enums in slots
+        # rather than in an instance dictionary, to save memory
+        if tag in self.struct_types:
+            inherited_names = set(getattr(self.base_class, "_names", ()))
+            slots = []
+            for attr in self.class_dict["_attrs"]:
+                slot = "_%s_value_" % attr.name
+                if attr.name not in inherited_names and slot not in slots:
+                    slots.append(slot)
+            # other attributes can still be set, as some code relies on it;
+            # the dictionary is only allocated once such an attribute is set
+            if (self.class_name not in self.cls.xml_no_dict_classes
+                    and not any("__dict__" in vars(klass)
+                                for klass in self.base_class.__mro__)):
+                slots.append("__dict__")
+            self.class_dict["__slots__"] = tuple(slots)
+        elif tag in ("enum", "alias"):
+            self.class_dict["__slots__"] = ()
         # does the class exist?
         if cls_klass:
             # do nothing if this is a Basic type
@@ -510,11 +713,18 @@ class XmlParser:
                 return
             # it has been created in format's __init__.py
             # create and add to base class of customizer
-            gen_klass = type("_"+self.class_name, (self.base_class,), self.class_dict)
+            gen_klass = type("_"+self.class_name, (self.base_class,),
+                             self.get_class_dict("_"+self.class_name))
             setattr(self.cls, "_"+self.class_name, gen_klass)
             # recreate the class, to ensure that the metaclass is called!!
             # (otherwise, cls_klass does not have correct _attribute_list, etc.)
-            cls_klass = type(cls_klass.__name__, (gen_klass,) + cls_klass.__bases__, dict(cls_klass.__dict__))
+            # the customizer keeps its instance dictionary, unless it
+            # defines __slots__ itself
+            cls_dict = dict(cls_klass.__dict__)
+            cls_dict.pop("__dict__", None)
+            cls_dict.pop("__weakref__", None)
+            cls_dict["__qualname__"] = self.get_qualname(self.class_name)
+            cls_klass = type(cls_klass.__name__, (gen_klass,) + cls_klass.__bases__, cls_dict)
             setattr(self.cls, self.class_name, cls_klass)
             # if the class derives from Data, then make an alias
             if issubclass(cls_klass, pyffi.object_models.FileFormat.Data):
@@ -523,7 +733,8 @@ class XmlParser:
             gen_klass = cls_klass
         else:
             # does not yet exist: create it and assign to class dict
-            gen_klass = type(self.class_name, (self.base_class,), self.class_dict)
+            gen_klass = type(self.class_name, (self.base_class,),
+                             self.get_class_dict(self.class_name))
             setattr(self.cls, self.class_name, gen_klass)
         # append class to the appropriate list
         if tag in self.struct_types:
@@ -566,22 +777,80 @@ class XmlParser:
         """
         # get 'name_attribute' for all classes
         # we need this to fix them in cond="..." later
-        klass_filter = {}
+        self.klass_filter = {}
         for klass in self.cls.xml_struct:
-            klass_filter[self.cls.name_attribute(klass.__name__)] = klass
+            self.klass_filter[self.cls.name_attribute(klass.__name__)] = klass.__name__
+        for index, kind, args in self.lazy_definitions.values():
+            if kind == "struct":
+                self.klass_filter[self.cls.name_attribute(args[1])] = args[1]
         for obj in list(self.cls.__dict__.values()):
             # skip objects that are not generated by the C{type} function
             # or that do not derive from StructBase
             if not (isinstance(obj, type) and issubclass(obj, StructBase)):
                 continue
-            # fix templates
-            for attr in obj._attrs:
-                templ = attr.template
-                if isinstance(templ, str):
-                    attr.template =  getattr(self.cls, templ) if templ != "TEMPLATE" else type(None)
-                attrtype = attr.type_
-                if isinstance(attrtype, str):
-                    attr.type_ = getattr(self.cls, attrtype)
-                # fix refs to types in conditions
-                if attr.cond:
-                    attr.cond.map_(lambda x: klass_filter[x] if x in klass_filter else x)
+            self.cleanup_class(obj)
+
+    def cleanup_class(self, obj):
+        """Fixes forward declarations and conditions of a struct class."""
+        # fix templates
+        for attr in obj._attrs:
+            templ = attr.template
+            if isinstance(templ, str):
+                attr.template =  getattr(self.cls, templ) if templ != "TEMPLATE" else type(None)
+            attrtype = attr.type_
+            if isinstance(attrtype, str):
+                attr.type_ = getattr(self.cls, attrtype)
+            # fix refs to types in conditions
+            if attr.cond:
+                attr.cond.map_(lambda x: getattr(self.cls, self.klass_filter[x]) if x in self.klass_filter else x)
+            # compile all expressions now, rather than on first use
+            for expr in (attr.cond, attr.vercond, attr.arr1, attr.arr2):
+                if isinstance(expr, Expression):
+                    expr.compile()
+
+    def get_class(self, name):
+        """Creates a class whose definition was loaded lazily (see
+        :meth:`load_schema`), along with the classes it depends on.
+        Raises ``AttributeError`` if there is no such definition, or if
+        it is a forward declaration of the class that is being created.
+        """
+        try:
+            index, kind, args = self.lazy_definitions[name]
+        except KeyError:
+            raise AttributeError(
+                "type object '%s' has no attribute '%s'"
+                % (self.cls.__name__, name))
+        if self.building and index >= self.building[-1]:
+            # forward declaration: resolved once the class is created
+            raise AttributeError(
+                "forward declaration of %s in %s" % (name, self.cls.__name__))
+        # classes may be created while another one is being created
+        state = (self.class_name, self.class_dict, self.base_class,
+                 self.version_string)
+        self.building.append(index)
+        try:
+            self.add_definition(kind, *args)
+        finally:
+            self.building.pop()
+            (self.class_name, self.class_dict, self.base_class,
+             self.version_string) = state
+        del self.lazy_definitions[name]
+        self.created.append(name)
+        # once all classes that depend on each other exist, fix them
+        if not self.building:
+            while self.created:
+                obj = getattr(self.cls, self.created.pop())
+                if isinstance(obj, type) and issubclass(obj, StructBase):
+                    self.cleanup_class(obj)
+        return getattr(self.cls, name)
+
+    def create_all_classes(self):
+        """Creates all classes whose definition was loaded lazily."""
+        for name in sorted(self.lazy_definitions,
+                           key=lambda name: self.lazy_definitions[name][0]):
+            if name in self.lazy_definitions:
+                self.get_class(name)
+        # sort as if all classes were created in order
+        for classes in (self.cls.xml_struct, self.cls.xml_enum,
+                        self.cls.xml_alias, self.cls.xml_bit_struct):
+            classes.sort(key=lambda klass: self.indices[klass.__name__])
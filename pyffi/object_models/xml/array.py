@@ -40,16 +40,62 @@
 # --------------------------------------------------------------------------
 
 # note: some imports are defined at the end to avoid problems with circularity
+import array
+import collections
+import copyreg
 import logging
+import math
+import os
+import struct
+import sys
 import weakref
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 from pyffi.utils.graph import DetailNode, EdgeFilter
+import pyffi.object_models.common
+
+
+def _unpacking(method):
+    """Wrap a list method which changes the elements of the list, so
+    that a packed list is unpacked first (see :meth:`_ListWrap._unpack`).
+    """
+    def unpacking_method(self, *args, **kwargs):
+        if self._buffer is not None:
+            self._unpack()
+        return method(self, *args, **kwargs)
+    unpacking_method.__name__ = method.__name__
+    unpacking_method.__doc__ = method.__doc__
+    return unpacking_method
+
+
+def _same_value(value, other):
+    """Compare two values of a packed list, where NaN equals NaN."""
+    return value == other or (value != value and other != other)
 
 
 class _ListWrap(list, DetailNode):
     """A wrapper for list, which uses get_value and set_value for
     getting and setting items of the basic type."""
 
+    _buffer = None
+    """If not ``None``, the list is packed: the values of all elements
+    are stored in this :class:`array.array`, and the list itself holds
+    ``None`` for each element which has not been accessed yet (see
+    :meth:`Array.read`)."""
+
+    _layout = None
+    """The :class:`_PackedLayout` of the elements of a packed list."""
+
+    _synced = None
+    """If not ``None``, the buffer of the packed list has been returned
+    by :meth:`as_array`, and this maps the index of every element which
+    has been created to the values of the element and of the buffer
+    when they were last synchronized (see :meth:`_sync_item`)."""
+
     def __init__(self, element_type, parent=None):
         self._parent = weakref.ref(parent) if parent else None
         self._elementType = element_type
@@ -70,6 +116,19 @@ class _ListWrap(list, DetailNode):
     def __setitem__(self, index, value):
         return self._set_item_hook(self, index, value)
 
+    # these change the elements of the list, rather than their values
+    __delitem__ = _unpacking(list.__delitem__)
+    __iadd__ = _unpacking(list.__iadd__)
+    __imul__ = _unpacking(list.__imul__)
+    append = _unpacking(list.append)
+    clear = _unpacking(list.clear)
+    extend = _unpacking(list.extend)
+    insert = _unpacking(list.insert)
+    pop = _unpacking(list.pop)
+    remove = _unpacking(list.remove)
+    reverse = _unpacking(list.reverse)
+    sort = _unpacking(list.sort)
+
     def __iter__(self):
         return self._iter_item_hook(self)
 
@@ -81,6 +140,20 @@ class _ListWrap(list, DetailNode):
                 return True
         return False
 
+    def __reduce_ex__(self, protocol):
+        # pickle the elements rather than their values (see __iter__),
+        # and the parent itself as weak references cannot be pickled
+        state = dict(self.__dict__)
+        if self._parent is not None:
+            state["_parent"] = self._parent()
+        return (copyreg.__newobj__, (self.__class__,), state,
+                list.__iter__(self))
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if self._parent is not None:
+            self._parent = weakref.ref(self._parent)
+
     def _not_implemented_hook(self, *args):
         """A hook for members that are not implemented."""
         raise NotImplementedError
@@ -110,11 +183,192 @@ class _ListWrap(list, DetailNode):
         elements."""
         return list.__getitem__(self, index)
 
+    def get_packed_item(self, index):
+        """Item getter for packed lists, which creates the element from
+        the buffer when it is first accessed."""
+        if isinstance(index, slice):
+            return [self.get_packed_item(i)
+                    for i in range(*index.indices(list.__len__(self)))]
+        elem = list.__getitem__(self, index)
+        if index < 0:
+            index += list.__len__(self)
+        if elem is None:
+            elem = self._unpack_item(index)
+        elif self._synced is not None:
+            self._sync_item(index, elem)
+        return elem
+
+    def iter_packed_item(self):
+        """Iterator over all items of a packed list, which creates the
+        elements from the buffer as they are needed."""
+        for i, elem in enumerate(list.__iter__(self)):
+            if elem is None:
+                elem = self._unpack_item(i)
+            elif self._synced is not None:
+                self._sync_item(i, elem)
+            yield elem
+
+    def _iter_elements(self):
+        """Iterator over all elements (rather than their values, for
+        basic types), also if the list is packed."""
+        if self._buffer is None:
+            return list.__iter__(self)
+        else:
+            return self.iter_packed_item()
+
+    def _set_packed(self, layout, buffer):
+        """Pack the list: replace all elements by those stored in
+        *buffer*, which has the given *layout*."""
+        self._layout = layout
+        self._buffer = buffer
+        self._synced = None
+        list.__delitem__(self, slice(None))
+        list.extend(self, [None] * (len(buffer) // len(layout.value_names)))
+        self._get_item_hook = self.__class__.get_packed_item
+        self._iter_item_hook = self.__class__.iter_packed_item
+
+    def _unpack(self):
+        """Turn a packed list back into a regular list of elements.
+        Elements which were created already are kept."""
+        if self._buffer is None:
+            return
+        list.__setitem__(self, slice(None), list(self.iter_packed_item()))
+        self._discard_packed()
+
+    def _discard_packed(self):
+        """Forget the buffer of a packed list, without creating its
+        elements, for instance because the list is about to be read
+        again."""
+        if self._buffer is None:
+            return
+        self._layout = None
+        self._buffer = None
+        self._synced = None
+        self._get_item_hook = self.__class__.get_item
+        self._iter_item_hook = self.__class__.iter_item
+
+    def _unpack_item(self, index):
+        """Create the element at *index* of a packed list from the
+        buffer, and store it in the list."""
+        value_names = self._layout.value_names
+        start = index * len(value_names)
+        elem = self._elementType()
+        values = self._buffer[start:start + len(value_names)]
+        for value_name, value in zip(value_names, values):
+            getattr(elem, value_name)._value = value
+        list.__setitem__(self, index, elem)
+        if self._synced is not None:
+            self._synced[index] = (tuple(values), tuple(values))
+        return elem
+
+    def _store_value(self, pos, value):
+        """Store *value* at position *pos* of the buffer."""
+        buffer = self._buffer
+        buffer[pos] = value
+        if (buffer.typecode == 'f' and math.isinf(buffer[pos])
+            and not math.isinf(value)):
+            logger = logging.getLogger("pyffi.object_models")
+            logger.warn("float value overflow, writing NaN")
+            buffer[pos] = float("nan")
+
+    def _sync_item(self, index, elem):
+        """Merge the changes to the element at *index* of a packed list,
+        and to its values in the array returned by :meth:`as_array`,
+        since they were last synchronized. If both changed, the element
+        wins."""
+        value_names = self._layout.value_names
+        start = index * len(value_names)
+        elem_values, buffer_values = self._synced[index]
+        for j, value_name in enumerate(value_names):
+            value = getattr(elem, value_name)
+            if not _same_value(value._value, elem_values[j]):
+                self._store_value(start + j, value._value)
+            elif not _same_value(self._buffer[start + j], buffer_values[j]):
+                value._value = self._buffer[start + j]
+        self._synced[index] = (
+            tuple(getattr(elem, value_name)._value
+                  for value_name in value_names),
+            tuple(self._buffer[start:start + len(value_names)]))
+
+    def _flush_packed(self):
+        """Store the values of all elements of a packed list that have
+        been accessed back into the buffer."""
+        value_names = self._layout.value_names
+        for i, elem in enumerate(list.__iter__(self)):
+            if elem is None:
+                continue
+            if self._synced is not None:
+                self._sync_item(i, elem)
+                continue
+            start = i * len(value_names)
+            for j, value_name in enumerate(value_names):
+                self._store_value(
+                    start + j, getattr(elem, value_name)._value)
+
+    def as_array(self):
+        """Get the values of all elements of a packed list, without
+        copying them. If numpy is available, this is a two dimensional
+        numpy array, with one row per element, and one column per
+        attribute. Otherwise, it is the flat :class:`array.array` which
+        stores the values.
+
+        Changes to the returned array, and to the elements, are
+        merged whenever an element is accessed through the list, and
+        when the list is written. If a value changed on both sides,
+        the change to the element wins. Changing the length of the
+        list unpacks it, after which the returned array is no longer
+        used.
+
+        :return: The values of all elements.
+        """
+        if self._buffer is None:
+            raise ValueError("cannot get values of a list that is not packed")
+        self._flush_packed()
+        if self._synced is None:
+            value_names = self._layout.value_names
+            self._synced = {}
+            for i, elem in enumerate(list.__iter__(self)):
+                if elem is not None:
+                    start = i * len(value_names)
+                    values = tuple(
+                        getattr(elem, value_name)._value
+                        for value_name in value_names)
+                    self._synced[i] = (
+                        values,
+                        tuple(self._buffer[start:start + len(value_names)]))
+        if numpy is None:
+            return self._buffer
+        return numpy.frombuffer(
+            self._buffer, dtype=self._buffer.typecode).reshape(
+                -1, len(self._layout.value_names))
+
+    def _read_packed(self, layout, size, stream, data):
+        """Read *size* elements of the given *layout* from *stream*, and
+        pack the list with them."""
+        buffer = array.array(layout.typecode)
+        nbytes = size * len(layout.value_names) * buffer.itemsize
+        values = stream.read(nbytes)
+        if len(values) != nbytes:
+            raise struct.error("unpack requires a buffer of %i bytes" % nbytes)
+        buffer.frombytes(values)
+        if data._byte_order != _NATIVE_BYTE_ORDER:
+            buffer.byteswap()
+        self._set_packed(layout, buffer)
+
+    def _write_packed(self, stream, data):
+        """Write all elements of a packed list to *stream*."""
+        self._flush_packed()
+        buffer = self._buffer
+        if data._byte_order != _NATIVE_BYTE_ORDER:
+            buffer = array.array(buffer.typecode, buffer)
+            buffer.byteswap()
+        stream.write(buffer.tobytes())
+
     # DetailNode
 
     def get_detail_child_nodes(self, edge_filter=EdgeFilter()):
         """Yield children."""
-        return (item for item in list.__iter__(self))
+        return (item for item in self._iter_elements())
 
     def get_detail_child_names(self, edge_filter=EdgeFilter()):
         """Yield child names."""
@@ -127,6 +381,14 @@ class Array(_ListWrap):
 
     logger = logging.getLogger("pyffi.nif.data.array")
     arg = None  # default argument
+    use_packed = bool(os.getenv("PYFFI_PACKED_ARRAYS"))
+    """Whether arrays of fixed layout structs, such as vectors, colors,
+    and triangles, are packed when they are read (see
+    :meth:`_ListWrap.as_array`). Packed arrays store all values in a
+    single buffer, and create elements only when they are accessed.
+    Set this, or the :envvar:`PYFFI_PACKED_ARRAYS` environment
+    variable, to enable packing.
+    """
 
     def __init__(
             self,
@@ -134,7 +396,7 @@ class Array(_ListWrap):
             element_type_template=None,
             element_type_argument=None,
             count1=None, count2=None,
-            parent=None):
+            parent=None, populate=True):
         """Initialize the array type.
 
         :param element_type: The class describing the type of each element.
@@ -146,7 +408,10 @@ class Array(_ListWrap):
         :param count2: Either ``None``, or an C{Expression} describing the
             second dimension count.
         :param parent: The parent of this instance, that is, the instance this
-            array is an attribute of."""
+            array is an attribute of.
+        :param populate: Whether to fill the array with elements, as
+            given by the counts. If ``False``, the array is empty
+            until it is read, or until :meth:`update_size` is called."""
         if count2 is None:
             _ListWrap.__init__(self,
                                element_type=element_type, parent=parent)
@@ -160,7 +425,9 @@ class Array(_ListWrap):
         self._count1 = count1
         self._count2 = count2
 
-        if self._count2 is None:
+        if not populate:
+            pass
+        elif self._count2 is None:
             for i in range(self._len1()):
                 elem_instance = self._elementType(
                     template=self._elementTypeTemplate,
@@ -226,7 +493,7 @@ class Array(_ListWrap):
     def __str__(self):
         text = '%s instance at 0x%08X\n' % (self.__class__, id(self))
         if self._count2 is None:
-            for i, element in enumerate(list.__iter__(self)):
+            for i, element in enumerate(self._iter_elements()):
                 if i > 16:
                     text += "etc...\n"
                     break
@@ -236,7 +503,7 @@ class Array(_ListWrap):
         else:
             k = 0
             for i, elemlist in enumerate(list.__iter__(self)):
-                for j, elem in enumerate(list.__iter__(elemlist)):
+                for j, elem in enumerate(elemlist._iter_elements()):
                     if k > 16:
                         text += "etc...\n"
                         break
@@ -255,6 +522,8 @@ class Array(_ListWrap):
         old_size = len(self)
         new_size = self._len1()
         if self._count2 is None:
+            if new_size != old_size:
+                self._unpack()
             if new_size < old_size:
                 del self[new_size:old_size]
             else:
@@ -272,6 +541,8 @@ class Array(_ListWrap):
             for i, elemlist in enumerate(list.__iter__(self)):
                 old_size_i = len(elemlist)
                 new_size_i = self._len2(i)
+                if new_size_i != old_size_i:
+                    elemlist._unpack()
                 if new_size_i < old_size_i:
                     del elemlist[new_size_i:old_size_i]
                 else:
@@ -288,34 +559,51 @@ class Array(_ListWrap):
 
         # check array size
         len1 = self._len1()
-        self.logger.debug("Reading array of size " + str(len1))
         if len1 > 0x10000000:
             raise ValueError('array too long (%i)' % len1)
+        self._discard_packed()
         del self[0:self.__len__()]
 
         # read array
+        bulk_char = _get_bulk_struct_char(self._elementType)
+        layout = (_get_packed_layout(self._elementType)
+                  if self.use_packed else None)
         if self._count2 is None:
+            if bulk_char:
+                self._read_bulk(self, len1, bulk_char, stream, data)
+                return
+            if layout:
+                self._read_packed(layout, len1, stream, data)
+                return
             for i in range(len1):
                 elem = self._elementType(
                     template=self._elementTypeTemplate,
                     argument=self._elementTypeArgument,
                     parent=self)
                 elem.read(stream, data)
-                self.append(elem)
+                list.append(self, elem)
         else:
             for i in range(len1):
                 len2i = self._len2(i)
                 if len2i > 0x10000000:
                     raise ValueError('array too long (%i)' % len2i)
                 elemlist = _ListWrap(self._elementType, parent=self)
+                if bulk_char:
+                    self._read_bulk(elemlist, len2i, bulk_char, stream, data)
+                    list.append(self, elemlist)
+                    continue
+                if layout:
+                    elemlist._read_packed(layout, len2i, stream, data)
+                    list.append(self, elemlist)
+                    continue
                 for j in range(len2i):
                     elem = self._elementType(
                         template=self._elementTypeTemplate,
                         argument=self._elementTypeArgument,
                         parent=elemlist)
                     elem.read(stream, data)
-                    elemlist.append(elem)
-                self.append(elemlist)
+                    list.append(elemlist, elem)
+                list.append(self, elemlist)
 
     def write(self, stream, data):
         """Write array to stream."""
@@ -326,7 +614,13 @@ class Array(_ListWrap):
                              (self.__len__(), len1))
         if len1 > 0x10000000:
             raise ValueError('array too long (%i)' % len1)
+        bulk_char = _get_bulk_struct_char(self._elementType)
         if self._count2 is None:
+            if bulk_char and self._write_bulk(self, bulk_char, stream, data):
+                return
+            if self._buffer is not None:
+                self._write_packed(stream, data)
+                return
             for elem in list.__iter__(self):
                 elem.write(stream, data)
         else:
@@ -337,9 +631,47 @@ class Array(_ListWrap):
                                      (elemlist.__len__(), len2i))
                 if len2i > 0x10000000:
                     raise ValueError('array too long (%i)' % len2i)
+                if bulk_char and self._write_bulk(
+                        elemlist, bulk_char, stream, data):
+                    continue
+                if elemlist._buffer is not None:
+                    elemlist._write_packed(stream, data)
+                    continue
                 for elem in list.__iter__(elemlist):
                     elem.write(stream, data)
 
+    def _read_bulk(self, elemlist, size, bulk_char, stream, data):
+        """Read *size* elements into the empty list *elemlist*, all at
+        once. The element type must be a basic type which supports
+        bulk reads (see :func:`_get_bulk_struct_char`).
+        """
+        element_type = self._elementType
+        fmt = "%s%i%s" % (data._byte_order, size, bulk_char)
+        values = struct.unpack(fmt, stream.read(struct.calcsize(fmt)))
+        new = element_type.__new__
+        elems = []
+        for value in values:
+            elem = new(element_type)
+            elem.arg = None
+            elem._value = value
+            elems.append(elem)
+        list.extend(elemlist, elems)
+
+    def _write_bulk(self, elemlist, bulk_char, stream, data):
+        """Write all elements of *elemlist* at once. Returns ``False``
+        if the values cannot be packed, in which case nothing is
+        written, and the elements must be written one by one (this
+        gives the usual overflow handling and error messages).
+        """
+        values = [elem._value for elem in list.__iter__(elemlist)]
+        try:
+            stream.write(struct.pack(
+                "%s%i%s" % (data._byte_order, len(values), bulk_char),
+                *values))
+        except (struct.error, OverflowError):
+            return False
+        return True
+
     def fix_links(self, data):
         """Fix the links in the array by calling C{fix_links} on all elements
         of the array."""
@@ -380,8 +712,16 @@ class Array(_ListWrap):
 
     def get_size(self, data=None):
         """Calculate the sum of the size of all elements in the array."""
-        return sum(
-            (elem.get_size(data) for elem in self._elementList()), 0)
+        elemlists = [self] if self._count2 is None else list.__iter__(self)
+        size = 0
+        for elemlist in elemlists:
+            if elemlist._buffer is not None:
+                size += len(elemlist._buffer) * elemlist._buffer.itemsize
+            else:
+                size += sum(
+                    (elem.get_size(data) for elem in list.__iter__(elemlist)),
+                    0)
+        return size
 
     def get_hash(self, data=None):
         """Calculate a hash value for the array, as a tuple."""
@@ -398,13 +738,98 @@ class Array(_ListWrap):
     def _elementList(self, **kwargs):
         """Generator for listing all elements."""
         if self._count2 is None:
-            for elem in list.__iter__(self):
+            for elem in self._iter_elements():
                 yield elem
         else:
             for elemlist in list.__iter__(self):
-                for elem in list.__iter__(elemlist):
+                for elem in elemlist._iter_elements():
                     yield elem
 
 
+def _get_bulk_struct_char(element_type):
+    """Get the :mod:`struct` format character for reading and writing
+    arrays of *element_type* all at once, or ``None`` if the elements
+    must be read and written one by one. Bulk reads and writes are
+    supported for the integer and float types from
+    :mod:`pyffi.object_models.common`, and for subclasses which do
+    not override their initialization, read, or write methods.
+
+    >>> from pyffi.object_models.common import UShort, Float, ULittle32
+    >>> _get_bulk_struct_char(UShort)
+    'H'
+    >>> _get_bulk_struct_char(Float)
+    'f'
+    >>> _get_bulk_struct_char(ULittle32) is None
+    True
+    """
+    try:
+        return _bulk_struct_chars[element_type]
+    except KeyError:
+        pass
+    bulk_char = None
+    if isinstance(element_type, type):
+        common = pyffi.object_models.common
+        for basic_type, char in ((common.Int, None), (common.Float, 'f')):
+            if (issubclass(element_type, basic_type)
+                and element_type.__init__ is basic_type.__init__
+                and element_type.read is basic_type.read
+                and element_type.write is basic_type.write):
+                bulk_char = char or element_type._struct
+                break
+    _bulk_struct_chars[element_type] = bulk_char
+    return bulk_char
+
+_bulk_struct_chars = {}
+
+_NATIVE_BYTE_ORDER = '<' if sys.byteorder == 'little' else '>'
+
+_PackedLayout = collections.namedtuple(
+    "_PackedLayout", ("value_names", "typecode"))
+
+def _get_packed_layout(element_type):
+    """Get the :class:`_PackedLayout` for storing an array of
+    *element_type* in packed form, or ``None`` if it cannot be packed.
+    Arrays of a struct type can be packed if all its attributes are
+    present in every version, unconditionally, and have the same basic
+    type which can be read in bulk (see :func:`_get_bulk_struct_char`).
+    The struct type must not override its initialization, read, or
+    write methods.
+    """
+    try:
+        return _packed_layouts[element_type]
+    except KeyError:
+        pass
+    layout = None
+    if (isinstance(element_type, type)
+        and issubclass(element_type, StructBase)
+        and not element_type._is_template
+        and element_type.__init__ is StructBase.__init__
+        and element_type.read is StructBase.read
+        and element_type.write is StructBase.write
+        and element_type._attribute_list):
+        chars = set()
+        value_names = []
+        for attr in element_type._attribute_list:
+            if (attr.arr1 is not None or attr.cond is not None
+                or attr.vercond is not None or attr.ver1 is not None
+                or attr.ver2 is not None or attr.userver is not None
+                or attr.is_abstract):
+                break
+            # duplicate names are skipped, as the first one always wins
+            if "_%s_value_" % attr.name in value_names:
+                continue
+            chars.add(_get_bulk_struct_char(attr.type_))
+            value_names.append("_%s_value_" % attr.name)
+        else:
+            if len(chars) == 1 and None not in chars:
+                char = chars.pop()
+                if (array.array(char).itemsize
+                    == struct.calcsize(_NATIVE_BYTE_ORDER + char)):
+                    layout = _PackedLayout(tuple(value_names), char)
+    _packed_layouts[element_type] = layout
+    return layout
+
+_packed_layouts = {}
+
 from pyffi.object_models.xml.basic import BasicBase
 from pyffi.object_models.xml.struct_ import StructBase
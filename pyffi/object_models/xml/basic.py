@@ -76,11 +76,12 @@ class BasicBase(DetailNode):
     NotImplementedError
     """
 
+    __slots__ = ("arg",)
+
     _is_template = False # is it a template type?
     _has_links = False # does the type contain a Ref or a Ptr?
     _has_refs = False # does the type contain a Ref?
     _has_strings = False # does the type contain a string?
-    arg = None # default argument
 
     def __init__(self, template = None, argument = None, parent = None):
         """Initializes the instance.
@@ -92,7 +93,7 @@ class BasicBase(DetailNode):
             instance is an attribute of."""
         # parent disabled for performance
         #self._parent = weakref.ref(parent) if parent else None
-        pass
+        self.arg = None # default argument
 
     # string representation
     def __str__(self):
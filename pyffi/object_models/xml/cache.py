@@ -0,0 +1,201 @@
+"""Persistent cache of the parsed xml description of file formats.
+
+Parsing the xml file, and in particular processing all attributes and
+expressions, takes a good part of the time needed to import a format
+such as :mod:`pyffi.formats.nif`. The result of the parsing, that is,
+the list of definitions recorded by
+:class:`~pyffi.object_models.xml.XmlParser`, is therefore pickled, so
+the classes can be created from the pickle next time.
+
+A cache file is only used if it matches the sha1 hash of the xml file,
+the sha1 hash of the source of the module which defines the format, the
+pyffi version, and :attr:`SchemaCache.cache_version`. Cache files are
+searched for next to the xml file, and in the user cache directory.
+
+Importing a format does not write cache files, unless
+:attr:`SchemaCache.autosave` is set, for instance through the
+``PYFFI_XML_CACHE_SAVE`` environment variable. Cache files can be built
+with :file:`scripts/build_xml_cache.py`. New cache files are written to
+the user cache directory, unless :attr:`SchemaCache.directory` or
+:attr:`SchemaCache.save_next_to_xml` say otherwise.
+"""
+
+# --------------------------------------------------------------------------
+# ***** BEGIN LICENSE BLOCK *****
+#
+# Copyright (c) 2007-2012, Python File Format Interface
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#
+#    * Redistributions in binary form must reproduce the above
+#      copyright notice, this list of conditions and the following
+#      disclaimer in the documentation and/or other materials provided
+#      with the distribution.
+#
+#    * Neither the name of the Python File Format Interface
+#      project nor the names of its contributors may be used to endorse
+#      or promote products derived from this software without specific
+#      prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+# ***** END LICENSE BLOCK *****
+# --------------------------------------------------------------------------
+
+import hashlib
+import logging
+import os
+import os.path
+import pickle
+import sys
+import tempfile
+
+import pyffi
+
+
+class SchemaCache(object):
+    """Load and save the parsed xml description of a file format.
+
+    :param cls: The file format class.
+    :param xml_filename: The full path of the xml file.
+    :type xml_filename: ``str``
+    :param xml_data: The contents of the xml file.
+    :type xml_data: ``bytes``
+    """
+
+    logger = logging.getLogger("pyffi.object_models.xml.cache")
+    cache_version = 2
+    """Version of the cache layout; increase whenever the recorded
+    definitions change."""
+    directory = os.getenv("PYFFI_XML_CACHE_DIR")
+    """If set, cache files are only loaded from, and saved to, this
+    directory."""
+    autosave = bool(os.getenv("PYFFI_XML_CACHE_SAVE"))
+    """Whether to save a new cache file whenever the xml file of a
+    format is parsed on import."""
+    save_next_to_xml = False
+    """Whether new cache files are saved next to the xml file, rather
+    than in the user cache directory."""
+    refresh = False
+    """Whether to ignore existing cache files, and always parse the
+    xml file."""
+
+    def __init__(self, cls, xml_filename, xml_data):
+        self.xml_dir = os.path.dirname(os.path.abspath(xml_filename))
+        self.filename = "%s.%s.pickle" % (
+            os.path.basename(xml_filename), cls.__name__)
+        key = hashlib.sha1(xml_data)
+        key.update(self.get_source(cls))
+        key.update(("%s %s %i" % (
+            cls.__name__, pyffi.__version__, self.cache_version)
+                    ).encode("ascii"))
+        self.key = key.hexdigest()
+
+    @staticmethod
+    def get_source(cls):
+        """The source of the module which defines the format class
+        *cls*, which may customize the classes created from the xml
+        file, or ``b""`` if it cannot be read.
+        """
+        module = sys.modules.get(cls.__module__)
+        filename = getattr(module, "__file__", None)
+        if not filename:
+            return b""
+        try:
+            with open(filename, "rb") as stream:
+                return stream.read()
+        except OSError:
+            return b""
+
+    @staticmethod
+    def get_user_cache_dir():
+        """The directory where cache files are saved by default."""
+        if os.name == "nt":
+            root = os.getenv("LOCALAPPDATA") or os.path.expanduser("~")
+        else:
+            root = (os.getenv("XDG_CACHE_HOME")
+                    or os.path.join(os.path.expanduser("~"), ".cache"))
+        return os.path.join(root, "pyffi")
+
+    def get_load_dirs(self):
+        """Directories where cache files are searched for, in order."""
+        if self.directory:
+            return [self.directory]
+        return [self.xml_dir, self.get_user_cache_dir()]
+
+    def get_save_dir(self):
+        """Directory where new cache files are saved."""
+        if self.directory:
+            return self.directory
+        elif self.save_next_to_xml:
+            return self.xml_dir
+        else:
+            return self.get_user_cache_dir()
+
+    def load(self):
+        """Return the cached definitions, or ``None`` if there is no
+        valid cache file.
+        """
+        if self.refresh:
+            return None
+        for directory in self.get_load_dirs():
+            filename = os.path.join(directory, self.filename)
+            try:
+                with open(filename, "rb") as stream:
+                    key, schema = pickle.load(stream)
+            except FileNotFoundError:
+                continue
+            except Exception:
+                self.logger.debug("Could not load %s." % filename)
+                continue
+            if key == self.key:
+                self.logger.debug("Loaded %s." % filename)
+                return schema
+        return None
+
+    def save(self, schema):
+        """Save definitions to the cache. Failures are logged, and
+        otherwise ignored.
+
+        :return: The name of the cache file, or ``None`` if it could not
+            be saved.
+        """
+        directory = self.get_save_dir()
+        filename = os.path.join(directory, self.filename)
+        try:
+            os.makedirs(directory, exist_ok=True)
+            # write to a temporary file first, so other processes which
+            # import the format at the same time never see partial files
+            handle, tmp_filename = tempfile.mkstemp(dir=directory)
+            try:
+                with os.fdopen(handle, "wb") as stream:
+                    pickle.dump((self.key, schema), stream,
+                                pickle.HIGHEST_PROTOCOL)
+                # temporary files are only readable by their owner
+                os.chmod(tmp_filename, 0o644)
+                os.replace(tmp_filename, filename)
+            except Exception:
+                os.remove(tmp_filename)
+                raise
+        except Exception:
+            self.logger.debug("Could not save %s." % filename)
+            return None
+        self.logger.debug("Saved %s." % filename)
+        return filename
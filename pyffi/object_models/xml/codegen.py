@@ -0,0 +1,137 @@
+"""Generates specialized read and write functions for struct types."""
+
+# --------------------------------------------------------------------------
+# ***** BEGIN LICENSE BLOCK *****
+#
+# Copyright (c) 2007-2012, Python File Format Interface
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#
+#    * Redistributions in binary form must reproduce the above
+#      copyright notice, this list of conditions and the following
+#      disclaimer in the documentation and/or other materials provided
+#      with the distribution.
+#
+#    * Neither the name of the Python File Format Interface
+#      project nor the names of its contributors may be used to endorse
+#      or promote products derived from this software without specific
+#      prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+# ***** END LICENSE BLOCK *****
+# --------------------------------------------------------------------------
+
+import keyword
+import re
+
+_RE_IDENTIFIER = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+
+def _getattr_source(obj_name, attr_name):
+    """Python source for getting attribute *attr_name* of *obj_name*.
+
+    >>> _getattr_source("self", "num_vertices")
+    'self.num_vertices'
+    >>> _getattr_source("self", "not a name")
+    "getattr(self, 'not a name')"
+    """
+    if _RE_IDENTIFIER.match(attr_name) and not keyword.iskeyword(attr_name):
+        return "%s.%s" % (obj_name, attr_name)
+    else:
+        return "getattr(%s, %r)" % (obj_name, attr_name)
+
+
+def make_struct_function(cls, method, data):
+    """Generate a function which reads or writes all attributes of
+    struct type *cls*, for the version of *data*.
+
+    The checks which only depend on the version are resolved at
+    generation time (see
+    :meth:`~pyffi.object_models.xml.struct_.StructBase._get_static_attribute_list`),
+    so the generated function only evaluates the conditions which
+    depend on the instance (``cond``) or on the rest of the data
+    (``vercond``). The result is equivalent to looping over
+    :meth:`~pyffi.object_models.xml.struct_.StructBase._get_filtered_attribute_list`
+    and calling *method* on each non-abstract attribute.
+
+    :param cls: The struct class.
+    :type cls: :class:`~pyffi.object_models.xml.struct_.StructBase`
+    :param method: Either ``"read"`` or ``"write"``.
+    :type method: ``str``
+    :param data: The data, or ``None``.
+    :return: A function taking ``self``, ``stream``, and ``data``
+        arguments.
+    """
+    if method not in ("read", "write"):
+        raise ValueError("cannot generate %s function" % method)
+    attrs, checks = cls._get_static_attribute_list(data)
+    if checks is None:
+        checks = [(None, None, False)] * len(attrs)
+    # attributes whose name occurs more than once can only be
+    # resolved at runtime: keep track of them with a flag
+    flags = {}
+    for attr, (cond, vercond, dedupe) in zip(attrs, checks):
+        if dedupe and attr.name not in flags:
+            flags[attr.name] = "have_%i" % len(flags)
+
+    namespace = {}
+    lines = ["def %s(self, stream, data):" % method]
+    for flag in flags.values():
+        lines.append("    %s = False" % flag)
+    for i, (attr, (cond, vercond, dedupe)) in enumerate(zip(attrs, checks)):
+        tests = []
+        flag = flags.get(attr.name)
+        if flag:
+            tests.append("not %s" % flag)
+        if cond is not None:
+            namespace["cond_%i" % i] = cond
+            tests.append("cond_%i.eval(self)" % i)
+        if vercond is not None:
+            namespace["vercond_%i" % i] = vercond
+            tests.append("vercond_%i.eval(data)" % i)
+        indent = "    "
+        if tests:
+            lines.append("%sif %s:" % (indent, " and ".join(tests)))
+            indent += "    "
+        if flag:
+            lines.append("%s%s = True" % (indent, flag))
+        if not attr.is_abstract:
+            if method == "read" and attr.arr1 is not None:
+                namespace["attr_%i" % i] = attr
+                lines.append("%svalue = self._get_read_value(attr_%i)" % (
+                    indent, i))
+            else:
+                lines.append("%svalue = %s" % (
+                    indent, _getattr_source("self", "_%s_value_" % attr.name)))
+            if isinstance(attr.arg, (int, type(None))):
+                lines.append("%svalue.arg = %r" % (indent, attr.arg))
+            else:
+                lines.append("%svalue.arg = %s" % (
+                    indent, _getattr_source("self", attr.arg)))
+            lines.append("%svalue.%s(stream, data)" % (indent, method))
+        elif not flag:
+            lines.append("%spass" % indent)
+    if len(lines) == 1:
+        lines.append("    pass")
+    source = "\n".join(lines) + "\n"
+    exec(compile(source, "<%s.%s>" % (cls.__name__, method), "exec"),
+         namespace)
+    return namespace[method]
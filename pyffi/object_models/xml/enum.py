@@ -122,6 +122,8 @@ class _MetaEnumBase(type):
         return returns
 
 class EnumBase(BasicBase, EditableComboBox, metaclass=_MetaEnumBase):
+    __slots__ = ("_value",)
+
     _enumkeys = []
     _enumvalues = []
     _numbytes = 1 # default width of an enum
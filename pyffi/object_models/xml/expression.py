@@ -43,6 +43,8 @@
 import re
 import sys  # stderr (for debugging)
 
+from pyffi.object_models.xml.codegen import _getattr_source
+
 
 class Expression(object):
     """This class represents an expression.
@@ -78,6 +80,12 @@ class Expression(object):
     operators = set(('==', '!=', '>=', '<=', '&&', '||', '&', '|', '-', '!',
                      '<', '>', '/', '*', '+', '%'))
 
+    # python equivalents of all binary operators
+    _python_operators = dict((op, op) for op in operators if op != '!')
+    _python_operators.update({'&&': 'and', '||': 'or'})
+
+    _func = None
+
     def __init__(self, expr_str, name_filter=None):
         try:
             left, self._op, right = self._partition(expr_str)
@@ -89,76 +97,77 @@ class Expression(object):
 
     def eval(self, data=None):
         """Evaluate the expression to an integer."""
+        func = self._func
+        if func is None:
+            func = self.compile()
+        return func(data)
 
-        if isinstance(self._left, Expression):
-            left = self._left.eval(data)
-        elif isinstance(self._left, str):
-            if self._left == '""':
-                left = ""
-            else:
-                left = data
-                for part in self._left.split("."):
-                    left = getattr(left, part)
-        elif isinstance(self._left, type):
-            left = isinstance(data, self._left)
-        elif self._left is None:
-            pass
-        else:
-            assert (isinstance(self._left, int))  # debug
-            left = self._left
+    def compile(self):
+        """Compile the expression into a Python function, which takes
+        the data as its only argument, and which evaluates the
+        expression exactly like :meth:`eval` does. The function is
+        cached on the expression, and recompiled when the expression
+        is changed with :meth:`map_`.
+
+        >>> class A(object):
+        ...     x = 2
+        >>> Expression('(x == 2) && (x + 3)').compile()(A())
+        5
+        >>> print(Expression('!(x.real >= y)')._source({}))
+        (not (data.x.real >= data.y))
+        """
+        namespace = {}
+        source = "lambda data=None: %s" % self._source(namespace)
+        self._func = eval(
+            compile(source, "<expression '%s'>" % self, "eval"), namespace)
+        return self._func
 
+    def _source(self, namespace):
+        """Python source which evaluates the expression. Types are
+        added to *namespace*.
+        """
+        left = self._operand_source(self._left, namespace, dotted=True)
         if not self._op:
             return left
+        right = self._operand_source(self._right, namespace, dotted=False)
+        if self._op == '!':
+            return "(not %s)" % right
+        try:
+            op = self._python_operators[self._op]
+        except KeyError:
+            raise NotImplementedError("expression syntax error: operator '" + self._op + "' not implemented")
+        return "(%s %s %s)" % (left, op, right)
 
-        if isinstance(self._right, Expression):
-            right = self._right.eval(data)
-        elif isinstance(self._right, str):
-            if (not self._right) or self._right == '""':
-                right = ""
-            else:
-                right = getattr(data, self._right)
-        elif isinstance(self._right, type):
-            right = isinstance(data, self._right)
-        elif self._right is None:
-            pass
-        else:
-            assert (isinstance(self._right, int))  # debug
-            right = self._right
-
-        if self._op == '==':
-            return left == right
-        elif self._op == '!=':
-            return left != right
-        elif self._op == '>=':
-            return left >= right
-        elif self._op == '<=':
-            return left <= right
-        elif self._op == '&&':
-            return left and right
-        elif self._op == '||':
-            return left or right
-        elif self._op == '&':
-            return left & right
-        elif self._op == '|':
-            return left | right
-        elif self._op == '-':
-            return left - right
-        elif self._op == '!':
-            return not (right)
-        elif self._op == '>':
-            return left > right
-        elif self._op == '<':
-            return left < right
-        elif self._op == '/':
-            return left / right
-        elif self._op == '*':
-            return left * right
-        elif self._op == '+':
-            return left + right
-        elif self._op == '%':
-            return left % right
+    @staticmethod
+    def _operand_source(operand, namespace, dotted):
+        """Python source for the left or right operand of an
+        expression. Only the left operand is looked up as a dotted
+        name.
+        """
+        if isinstance(operand, Expression):
+            return operand._source(namespace)
+        elif isinstance(operand, str):
+            if (not (dotted or operand)) or operand == '""':
+                return '""'
+            source = "data"
+            for part in (operand.split(".") if dotted else [operand]):
+                source = _getattr_source(source, part)
+            return source
+        elif isinstance(operand, type):
+            name = "type_%i" % len(namespace)
+            namespace[name] = operand
+            return "isinstance(data, %s)" % name
+        elif operand is None:
+            return "None"
         else:
-            raise NotImplementedError("expression syntax error: operator '" + self._op + "' not implemented")
+            assert (isinstance(operand, int))  # debug
+            return repr(operand)
+
+    def __getstate__(self):
+        # compiled functions cannot be pickled
+        state = self.__dict__.copy()
+        state.pop("_func", None)
+        return state
 
     def __str__(self):
         """Reconstruct the expression to a string."""
@@ -340,7 +349,24 @@ class Expression(object):
                 raise ValueError("expression syntax error (non-matching brackets?)")
         return start_pos, end_pos
 
+    def get_names(self):
+        """Set of names of all attributes of the data that the
+        expression depends on. For dotted names, only the first
+        component is included.
+
+        >>> sorted(Expression('(x.y == 2) && !(z || 3)').get_names())
+        ['x', 'z']
+        """
+        names = set()
+        for operand, dotted in ((self._left, True), (self._right, False)):
+            if isinstance(operand, Expression):
+                names |= operand.get_names()
+            elif isinstance(operand, str) and operand and operand != '""':
+                names.add(operand.split(".")[0] if dotted else operand)
+        return names
+
     def map_(self, func):
+        self._func = None
         if isinstance(self._left, Expression):
             self._left.map_(func)
         else:
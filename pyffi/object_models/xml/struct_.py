@@ -40,7 +40,9 @@
 # --------------------------------------------------------------------------
 
 # note: some imports are defined at the end to avoid problems with circularity
+import collections
 import logging
+import os
 from functools import partial
 
 
@@ -126,6 +128,17 @@ class _MetaStructBase(type):
                     # strings
                     cls._has_strings = True
 
+        cls._update_attribute_lists()
+
+    def __setattr__(cls, name, value):
+        super(_MetaStructBase, cls).__setattr__(name, value)
+        if name == "_attrs":
+            cls._update_attribute_lists()
+
+    def _update_attribute_lists(cls):
+        """Precalculate the attribute lists of the class, and of all
+        its subclasses, and clear all caches which depend on them.
+        """
         # precalculate the attribute list
         # profiling shows that this speeds up most of the StructBase methods
         # that rely on parsing the attribute list
@@ -134,6 +147,24 @@ class _MetaStructBase(type):
         # precalculate the attribute name list
         cls._names = cls._get_names()
 
+        # attribute for each value, skipping duplicate names
+        # (for this to work properly, duplicates must have the same
+        # type, template, argument, arr1, and arr2)
+        cls._value_attributes = {}
+        for attr in cls._attribute_list:
+            cls._value_attributes.setdefault(
+                "_%s_value_" % attr.name, attr)
+
+        # cache for attribute lists filtered by version, per version key
+        cls._static_attribute_lists = {}
+
+        # cache for generated read and write functions, per version key
+        cls._readers = {}
+        cls._writers = {}
+
+        for subcls in cls.__subclasses__():
+            subcls._update_attribute_lists()
+
     def __repr__(cls):
         return "<struct '%s'>"%(cls.__name__)
 
@@ -221,11 +252,32 @@ class StructBase(GlobalNode, metaclass=_MetaStructBase):
     <BLANKLINE>
     """
 
+    __slots__ = ("_template", "arg", "__weakref__")
+
     _is_template = False
     _attrs = []
     _games = {}
-    arg = None
     logger = logging.getLogger("pyffi.nif.data.struct")
+    # data attributes which make up the version key
+    _version_key_names = ("version", "user_version", "user_version_2")
+    use_codegen = not os.getenv("PYFFI_NO_CODEGEN")
+    """Whether :meth:`read` and :meth:`write` use generated functions
+    (see :mod:`pyffi.object_models.xml.codegen`). These are bypassed
+    when a tracer is enabled, so every attribute is still traced.
+    Clear this, or set the :envvar:`PYFFI_NO_CODEGEN` environment
+    variable, to use the generic implementation.
+    """
+    _tracer = None
+    """Tracer which is notified of every attribute that is read or
+    written (see :mod:`pyffi.object_models.xml.tracer`), or ``None``.
+    """
+    use_lazy = bool(os.getenv("PYFFI_LAZY_ATTRIBUTES"))
+    """Whether attribute values are created when they are first accessed,
+    or read, rather than when the structure is created. This also
+    applies to the elements of arrays of structures, which avoids
+    creating values that are replaced on read anyway. Set this, or the
+    :envvar:`PYFFI_LAZY_ATTRIBUTES` environment variable, to enable it.
+    """
 
     # initialize all attributes
     def __init__(self, template = None, argument = None, parent = None):
@@ -240,61 +292,71 @@ class StructBase(GlobalNode, metaclass=_MetaStructBase):
             it is described here.
         :param parent: The parent of this instance, that is, the instance this
             array is an attribute of."""
-        # used to track names of attributes that have already been added
-        # is faster than self.__dict__.has_key(...)
-        names = set()
         # initialize argument
         self.arg = argument
+        # save template, for attributes which are created later
+        self._template = template
         # save parent (note: disabled for performance)
         #self._parent = weakref.ref(parent) if parent else None
-        # initialize item list
-        # this list is used for instance by qskope to display the structure
-        # in a tree view
-        self._items = []
+        if self.use_lazy:
+            # attributes are created on first access, see __getattr__
+            return
         # initialize attributes
-        for attr in self._attribute_list:
-            # skip attributes with dupiclate names
-            # (for this to work properly, duplicates must have the same
-            # type, template, argument, arr1, and arr2)
-            if attr.name in names:
-                continue
-            names.add(attr.name)
+        for name, attr in self._value_attributes.items():
+            setattr(self, name, self._create_attribute(attr))
 
-            # things that can only be determined at runtime (rt_xxx)
-            rt_type = attr.type_ if attr.type_ != type(None) \
-                      else template
-            rt_template = attr.template if attr.template != type(None) \
-                          else template
-            rt_arg = attr.arg if isinstance(attr.arg, (int, type(None))) \
-                     else getattr(self, attr.arg)
-
-            # instantiate the class, handling arrays at the same time
-            if attr.arr1 == None:
-                attr_instance = rt_type(
-                    template = rt_template, argument = rt_arg,
-                    parent = self)
-                if attr.default != None:
-                    attr_instance.set_value(attr.default)
-            elif attr.arr2 == None:
-                attr_instance = Array(
-                    element_type = rt_type,
-                    element_type_template = rt_template,
-                    element_type_argument = rt_arg,
-                    count1 = attr.arr1,
-                    parent = self)
-            else:
-                attr_instance = Array(
-                    element_type = rt_type,
-                    element_type_template = rt_template,
-                    element_type_argument = rt_arg,
-                    count1 = attr.arr1, count2 = attr.arr2,
-                    parent = self)
-
-            # assign attribute value
-            setattr(self, "_%s_value_" % attr.name, attr_instance)
-
-            # add instance to item list
-            self._items.append(attr_instance)
+    def __getattr__(self, name):
+        """Create attribute values which have not been created yet (only
+        happens if :attr:`use_lazy` is set)."""
+        try:
+            attr = self._value_attributes[name]
+        except KeyError:
+            raise AttributeError(
+                "'%s' object has no attribute '%s'"
+                % (self.__class__.__name__, name))
+        attr_instance = self._create_attribute(attr)
+        setattr(self, name, attr_instance)
+        return attr_instance
+
+    def _create_attribute(self, attr, populate=True):
+        """Instantiate the value of an attribute.
+
+        :param attr: The attribute.
+        :type attr: :class:`~pyffi.object_models.xml.StructAttribute`
+        :param populate: Whether arrays are filled with elements, as
+            given by their size.
+        :type populate: ``bool``
+        """
+        # things that can only be determined at runtime (rt_xxx)
+        rt_type = attr.type_ if attr.type_ != type(None) \
+                  else self._template
+        rt_template = attr.template if attr.template != type(None) \
+                      else self._template
+        rt_arg = attr.arg if isinstance(attr.arg, (int, type(None))) \
+                 else getattr(self, attr.arg)
+
+        # instantiate the class, handling arrays at the same time
+        if attr.arr1 == None:
+            attr_instance = rt_type(
+                template = rt_template, argument = rt_arg,
+                parent = self)
+            if attr.default != None:
+                attr_instance.set_value(attr.default)
+        elif attr.arr2 == None:
+            attr_instance = Array(
+                element_type = rt_type,
+                element_type_template = rt_template,
+                element_type_argument = rt_arg,
+                count1 = attr.arr1,
+                parent = self, populate = populate)
+        else:
+            attr_instance = Array(
+                element_type = rt_type,
+                element_type_template = rt_template,
+                element_type_argument = rt_arg,
+                count1 = attr.arr1, count2 = attr.arr2,
+                parent = self, populate = populate)
+        return attr_instance
 
     def deepcopy(self, block):
         """Copy attributes from a given block (one block class must be a
@@ -340,22 +402,39 @@ class StructBase(GlobalNode, metaclass=_MetaStructBase):
                 text += '* %s : <None>\n' % attr.name
         return text
 
-    def _log_struct(self, stream, attr):
-        val = getattr(self, "_%s_value_" % attr.name)  # debug
-        if not isinstance(val, BasicBase):  # debug
-            self.logger.debug(val.__class__.__name__ + ":" + attr.name)
-        else:
-            try:
-                out = val.get_value()  # debug
-            except Exception:
-                pass
-            else:
-                offset = stream.tell()
-                hex_ver = "0x%08X" % offset
-                self.logger.debug("* {0}.{1} = {2} : type {3} at {4} offset {5} - ".format(self.__class__.__name__, attr.name, str(out), attr.type_, hex_ver, offset ))  # debug
+    def _get_read_value(self, attr):
+        """Get the value of an attribute which is about to be read.
+        In lazy mode, arrays are created empty, as their elements
+        would be replaced on read.
+        """
+        if self.use_lazy and attr.arr1 is not None:
+            attr_value = self._create_attribute(attr, populate=False)
+            setattr(self, "_%s_value_" % attr.name, attr_value)
+            return attr_value
+        return getattr(self, "_%s_value_" % attr.name)
+
+    def _get_struct_function(self, method, data):
+        """Get the generated read or write function for the version of
+        *data*, or ``None`` if the generic implementation must be used.
+        """
+        if not self.use_codegen or self._tracer is not None:
+            return None
+        cache = self._readers if method == "read" else self._writers
+        key = self._get_version_key(data)
+        try:
+            return cache[key]
+        except KeyError:
+            func = cache[key] = make_struct_function(
+                self.__class__, method, data)
+            return func
 
     def read(self, stream, data):
         """Read structure from stream."""
+        reader = self._get_struct_function("read", data)
+        if reader is not None:
+            reader(self, stream, data)
+            return
+        tracer = self._tracer
         # read all attributes
         for attr in self._get_filtered_attribute_list(data):
             # skip abstract attributes
@@ -365,16 +444,23 @@ class StructBase(GlobalNode, metaclass=_MetaStructBase):
             rt_arg = attr.arg if isinstance(attr.arg, (int, type(None))) \
                 else getattr(self, attr.arg)
             # read the attribute
-            attr_value = getattr(self, "_%s_value_" % attr.name)
+            attr_value = self._get_read_value(attr)
             attr_value.arg = rt_arg
             # if hasattr(attr, "type_"):
             #     attr_value._elementType = attr.type_
-            self._log_struct(stream, attr)
-            attr_value.read(stream, data)
-
+            if tracer is None:
+                attr_value.read(stream, data)
+            else:
+                tracer.trace("read", self.__class__.__name__, attr.name,
+                             attr_value, stream, data)
 
     def write(self, stream, data):
         """Write structure to stream."""
+        writer = self._get_struct_function("write", data)
+        if writer is not None:
+            writer(self, stream, data)
+            return
+        tracer = self._tracer
         # write all attributes
         for attr in self._get_filtered_attribute_list(data):
             # skip abstract attributes
@@ -386,8 +472,11 @@ class StructBase(GlobalNode, metaclass=_MetaStructBase):
             # write the attribute
             attr_value = getattr(self, "_%s_value_" % attr.name)
             attr_value.arg = rt_arg
-            getattr(self, "_%s_value_" % attr.name).write(stream, data)
-            self._log_struct(stream, attr)
+            if tracer is None:
+                attr_value.write(stream, data)
+            else:
+                tracer.trace("write", self.__class__.__name__, attr.name,
+                             attr_value, stream, data)
 
     def fix_links(self, data):
         """Fix links in the structure."""
@@ -397,7 +486,6 @@ class StructBase(GlobalNode, metaclass=_MetaStructBase):
             # check if there are any links at all, commonly this speeds things up considerably
             if not attr.type_._has_links:
                 continue
-            self.logger.debug("fixlinks %s" % attr.name)
             # fix the links in the attribute
             getattr(self, "_%s_value_" % attr.name).fix_links(data)
 
@@ -517,59 +605,115 @@ class StructBase(GlobalNode, metaclass=_MetaStructBase):
                 names.append(attr.name)
         return names
 
-    def _get_filtered_attribute_list(self, data=None):
-        """Generator for listing all 'active' attributes, that is,
-        attributes whose condition evaluates ``True``, whose version
-        interval contains C{version}, and whose user version is
-        C{user_version}. ``None`` for C{version} or C{user_version} means
-        that these checks are ignored. Duplicate names are skipped as
-        well.
-
-        Note: version and user_version arguments are deprecated, use
-        the data argument instead.
+    @staticmethod
+    def _get_version_key(data):
+        """The version, user version, and user version 2 of *data*, as
+        a tuple. ``None`` for *data* gives ``(None, None, None)``.
         """
-        if data is not None:
-            version = data.version
-            user_version = data.user_version
-        else:
-            version = None
-            user_version = None
-        names = set()
-        for attr in self._attribute_list:
-            #print(attr.name, version, attr.ver1, attr.ver2) # debug
+        if data is None:
+            return (None, None, None)
+        return (data.version, data.user_version,
+                getattr(data, "user_version_2", None))
 
+    @classmethod
+    def _get_static_attribute_list(cls, data=None):
+        """Get all attributes whose version interval contains the
+        version of *data*, and whose user version is the user version
+        of *data*, with duplicate names removed as far as this can be
+        done without looking at the instance. The result is cached per
+        version key (see :meth:`_get_version_key`).
+
+        Returns a tuple ``(attrs, checks)``. If *checks* is ``None``,
+        then all *attrs* are active for every instance. Otherwise,
+        *checks* lists for each attribute a tuple ``(cond, vercond,
+        dedupe)``: the condition on the instance, the condition on the
+        data (or ``None`` for either), and whether the attribute must
+        be skipped if an attribute of the same name was already
+        active.
+        """
+        key = cls._get_version_key(data)
+        try:
+            return cls._static_attribute_lists[key]
+        except KeyError:
+            pass
+        version, user_version, user_version_2 = key
+        # vercond is only checked if both version and user version are known
+        check_vercond = (version is not None and user_version is not None)
+        attrs = []
+        conds = []
+        taken_names = set()
+        for attr in cls._attribute_list:
             # check version
             if version is not None:
                 if attr.ver1 is not None and version < attr.ver1:
                     continue
                 if attr.ver2 is not None and version > attr.ver2:
                     continue
-            #print("version check passed") # debug
-
             # check user version
             if (attr.userver is not None and user_version is not None
                 and user_version != attr.userver):
                 continue
-            #print("user version check passed") # debug
-
-            # check conditions
-            if attr.cond is not None and not attr.cond.eval(self):
+            # skip names that are already taken by an earlier
+            # unconditional attribute
+            if attr.name in taken_names:
                 continue
-
-            if (version is not None and user_version is not None
-                and attr.vercond is not None):
-                if not attr.vercond.eval(data):
+            # check the version condition now if it only depends on
+            # the version key
+            vercond = attr.vercond if check_vercond else None
+            if vercond is not None and all(
+                (name in cls._version_key_names
+                 and key[cls._version_key_names.index(name)] is not None)
+                for name in vercond.get_names()):
+                if not vercond.eval(data):
                     continue
+                vercond = None
+            if attr.cond is None and vercond is None:
+                taken_names.add(attr.name)
+            attrs.append(attr)
+            conds.append((attr.cond, vercond))
+        # names that occur more than once must be resolved at runtime
+        name_counts = collections.Counter(attr.name for attr in attrs)
+        checks = tuple(
+            (cond, vercond, name_counts[attr.name] > 1)
+            for attr, (cond, vercond) in zip(attrs, conds))
+        if not any(cond is not None or vercond is not None or dedupe
+                   for cond, vercond, dedupe in checks):
+            checks = None
+        result = cls._static_attribute_lists[key] = (tuple(attrs), checks)
+        return result
 
-            #print("condition passed") # debug
-
-            # skip dupiclate names
+    def _get_filtered_attribute_list(self, data=None):
+        """List all 'active' attributes, that is,
+        attributes whose condition evaluates ``True``, whose version
+        interval contains C{version}, and whose user version is
+        C{user_version}. ``None`` for C{version} or C{user_version} means
+        that these checks are ignored. Duplicate names are skipped as
+        well. Returns an iterable.
 
-            if attr.name in names:
+        Note: version and user_version arguments are deprecated, use
+        the data argument instead.
+        """
+        attrs, checks = self._get_static_attribute_list(data)
+        if checks is None:
+            return attrs
+        return self._iter_checked_attributes(attrs, checks, data)
+
+    def _iter_checked_attributes(self, attrs, checks, data):
+        """Generator for those *attrs* which pass their *checks* (see
+        :meth:`_get_static_attribute_list`).
+        """
+        names = set()
+        for attr, (cond, vercond, dedupe) in zip(attrs, checks):
+            # check conditions
+            if cond is not None and not cond.eval(self):
                 continue
-            #print("duplicate check passed") # debug
-
-            names.add(attr.name)
+            if vercond is not None and not vercond.eval(data):
+                continue
+            # skip duplicate names
+            if dedupe:
+                if attr.name in names:
+                    continue
+                names.add(attr.name)
             # passed all tests
             # so yield the attribute
             yield attr
@@ -628,7 +772,7 @@ class StructBase(GlobalNode, metaclass=_MetaStructBase):
 
     def get_detail_child_nodes(self, edge_filter=EdgeFilter()):
         """Yield children of this structure."""
-        return (item for item in self._items)
+        return (getattr(self, "_%s_value_" % name) for name in self._names)
 
     def get_detail_child_names(self, edge_filter=EdgeFilter()):
         """Yield names of the children of this structure."""
@@ -649,3 +793,4 @@ class StructBase(GlobalNode, metaclass=_MetaStructBase):
 
 from pyffi.object_models.xml.basic import BasicBase
 from pyffi.object_models.xml.array import Array
+from pyffi.object_models.xml.codegen import make_struct_function
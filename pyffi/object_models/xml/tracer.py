@@ -0,0 +1,175 @@
+"""Tracing of reading and writing, for profiling and for annotating files.
+
+A tracer is enabled by assigning an instance of :class:`Tracer` to
+:attr:`StructBase._tracer <pyffi.object_models.xml.struct_.StructBase._tracer>`.
+It is ``None`` by default, so reading and writing do not pay for it.
+While a tracer is enabled, every attribute of every structure, and every
+block of a file, is read and written through :meth:`Tracer.trace`, which
+reports a :class:`TraceEvent` for it.
+
+>>> from pyffi.object_models.common import UInt
+>>> from pyffi.object_models.xml.struct_ import StructBase
+>>> from pyffi.object_models.xml import StructAttribute as Attr
+>>> import io
+>>> class SimpleFormat(object):
+...     UInt = UInt
+...     @staticmethod
+...     def name_attribute(name):
+...         return name
+>>> class X(StructBase):
+...     _attrs = [
+...         Attr(SimpleFormat, dict(name='a', type='UInt')),
+...         Attr(SimpleFormat, dict(name='b', type='UInt'))]
+>>> class SimpleData(object):
+...     version = None
+...     user_version = None
+...     _byte_order = "<"
+>>> tracer = RecordingTracer()
+>>> StructBase._tracer = tracer
+>>> X().read(io.BytesIO(b"\\x01\\x00\\x00\\x00\\x02\\x00\\x00\\x00"),
+...          SimpleData())
+>>> StructBase._tracer = None
+>>> for event in tracer.events:
+...     print(event.method, event.cls, event.attribute, event.offset,
+...           event.size, event.value)
+read X a 0 4 1
+read X b 4 4 2
+"""
+
+# --------------------------------------------------------------------------
+# ***** BEGIN LICENSE BLOCK *****
+#
+# Copyright (c) 2007-2012, Python File Format Interface
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#
+#    * Redistributions in binary form must reproduce the above
+#      copyright notice, this list of conditions and the following
+#      disclaimer in the documentation and/or other materials provided
+#      with the distribution.
+#
+#    * Neither the name of the Python File Format Interface
+#      project nor the names of its contributors may be used to endorse
+#      or promote products derived from this software without specific
+#      prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+# ***** END LICENSE BLOCK *****
+# --------------------------------------------------------------------------
+
+from collections import namedtuple
+import logging
+import time
+
+from pyffi.object_models.xml.basic import BasicBase
+
+TraceEvent = namedtuple(
+    "TraceEvent",
+    ["method", "cls", "attribute", "offset", "size", "elapsed", "depth",
+     "value"])
+"""A single read or write of an attribute, or of a block.
+
+* method: ``"read"`` or ``"write"``.
+* cls: Name of the class of the structure which has the attribute, or,
+  for blocks, the name of the class of the block.
+* attribute: Name of the attribute, or ``None`` for blocks.
+* offset: Position in the stream where reading or writing started.
+* size: Number of bytes read or written.
+* elapsed: Time spent, in seconds, including nested events.
+* depth: Nesting level; nested events are reported before the event
+  that contains them.
+* value: The object that was read or written.
+"""
+
+
+class Tracer(object):
+    """Base class for tracers. Override :meth:`event` to process the
+    events.
+    """
+
+    def __init__(self):
+        self.depth = 0
+
+    def trace(self, method, cls_name, attr_name, value, stream, data):
+        """Read or write *value*, and report it to :meth:`event`.
+
+        :param method: Either ``"read"`` or ``"write"``.
+        :type method: ``str``
+        :param cls_name: The name of the class of the structure.
+        :type cls_name: ``str``
+        :param attr_name: The name of the attribute, or ``None``.
+        :type attr_name: ``str``
+        :param value: The object to read or write.
+        :param stream: The stream.
+        :param data: The data, passed to the read or write method.
+        """
+        offset = stream.tell()
+        start = time.perf_counter()
+        self.depth += 1
+        try:
+            getattr(value, method)(stream, data)
+        finally:
+            self.depth -= 1
+        self.event(TraceEvent(
+            method, cls_name, attr_name, offset, stream.tell() - offset,
+            time.perf_counter() - start, self.depth, value))
+
+    def event(self, event):
+        """Called for every attribute and block that has been read or
+        written.
+
+        :param event: The event.
+        :type event: :class:`TraceEvent`
+        """
+        raise NotImplementedError
+
+
+class RecordingTracer(Tracer):
+    """Tracer which keeps all events in a list."""
+
+    def __init__(self):
+        Tracer.__init__(self)
+        self.events = []
+
+    def event(self, event):
+        self.events.append(event)
+
+
+class LoggingTracer(Tracer):
+    """Tracer which logs every event as a debug message, much like
+    earlier versions of pyffi did when debug logging was enabled.
+    """
+
+    logger = logging.getLogger("pyffi.object_models.xml.tracer")
+
+    def event(self, event):
+        if event.attribute is None:
+            name = event.cls
+        else:
+            name = "%s.%s" % (event.cls, event.attribute)
+        if isinstance(event.value, BasicBase):
+            value = event.value.get_value()
+        else:
+            value = event.value.__class__.__name__
+        self.logger.debug(
+            "%s* %s %s = %s at 0x%08X (%i bytes)"
+            % ("  " * event.depth, event.method, name, value,
+               event.offset, event.size))
@@ -50,7 +50,7 @@ toaster.
    :members: READONLY, SPELLNAME, data, stream, toaster,
              __init__, recurse, _datainspect, datainspect, _branchinspect,
              branchinspect, dataentry, dataexit, branchentry,
-             branchexit, toastentry, toastexit
+             branchexit, toastentry, toastexit, toastresult, toastmerge
 
 Grouping spells together
 ------------------------
@@ -136,22 +136,35 @@ the file format class of the files it can toast.
 
 
 from configparser import ConfigParser
+import contextlib  # nullcontext
 from copy import deepcopy
 import gc
-
+import io  # BytesIO
 import logging  # Logger
-import concurrent.futures  # ProcessPoolExecutor
-import multiprocessing  # current_process, cpu_count
+import multiprocessing  # current_process, cpu_count, Process, Queue
 import optparse
 import os  # remove
 import os.path  # getsize, split, join
+import queue  # Empty
 import re  # for regex parsing (--skip, --only)
 import shlex  # shlex.split for parsing option lists in ini files
 import subprocess
+import sys  # platform
 import tempfile
+import time  # time
+import traceback  # format_exc
+
+try:
+    import resource  # getrusage
+except ImportError:
+    # not available on Windows
+    resource = None
 
 import pyffi  # for pyffi.__version__
 import pyffi.object_models  # pyffi.object_models.FileFormat
+import pyffi.spells.manifest  # ToasterManifest
+import pyffi.spells.pipeline  # FilePrefetcher, AsyncWriter
+import pyffi.spells.profiler  # ToasterProfiler
 
 
 class Spell(object):
@@ -189,6 +202,16 @@ class Spell(object):
     back to the disk.
     """
 
+    MARKS_DIRTY = False
+    """A ``bool`` which determines whether the spell marks every block
+    that it changes with
+    :meth:`~pyffi.object_models.FileFormat.Data.mark_dirty`. If so, and
+    the file is overwritten, then the toaster first tries to write only
+    these blocks back, in place, through
+    :meth:`~pyffi.object_models.FileFormat.Data.write_changes`. The
+    pipelined toaster always writes the full file.
+    """
+
     SPELLNAME = None
     """A ``str`` describing how to refer to the spell from the command line.
     Override this class attribute when subclassing.
@@ -388,6 +411,34 @@ class Spell(object):
         """
         pass
 
+    @classmethod
+    def toastresult(cls, toaster):
+        """Called in a worker process, when toasting with more than
+        one job, after every file. Override this function if the spell
+        aggregates statistics on the toaster: return what was gathered
+        since the previous call, and reset it, so it can be passed to
+        :meth:`toastmerge` in the main process. The default
+        implementation returns ``None``.
+
+        :param toaster: The toaster of the worker process.
+        :type toaster: :class:`Toaster`
+        :return: Anything that can be pickled.
+        """
+        return None
+
+    @classmethod
+    def toastmerge(cls, toaster, result):
+        """Called in the main process, for every result returned by
+        :meth:`toastresult` in a worker process, so :meth:`toastexit`
+        sees the statistics of all files. The default implementation
+        does nothing.
+
+        :param toaster: The toaster of the main process.
+        :type toaster: :class:`Toaster`
+        :param result: The result of :meth:`toastresult`.
+        """
+        pass
+
     @classmethod
     def get_toast_stream(cls, toaster, filename, test_exists=False):
         """Returns the stream that the toaster will write to. The
@@ -455,6 +506,16 @@ class SpellGroupBase(Spell):
         for spellclass in cls.ACTIVESPELLCLASSES:
             spellclass.toastexit(toaster)
 
+    @classmethod
+    def toastresult(cls, toaster):
+        return [spellclass.toastresult(toaster)
+                for spellclass in cls.ACTIVESPELLCLASSES]
+
+    @classmethod
+    def toastmerge(cls, toaster, result):
+        for spellclass, spellresult in zip(cls.ACTIVESPELLCLASSES, result):
+            spellclass.toastmerge(toaster, spellresult)
+
 
 class SpellGroupSeriesBase(SpellGroupBase):
     """Base class for running spells in series."""
@@ -529,7 +590,9 @@ def SpellGroupSeries(*args):
                  "SPELLNAME":
                      " | ".join(spellclass.SPELLNAME for spellclass in args),
                  "READONLY": 
-                      all(spellclass.READONLY for spellclass in args)})
+                      all(spellclass.READONLY for spellclass in args),
+                 "MARKS_DIRTY":
+                      all(spellclass.MARKS_DIRTY for spellclass in args)})
 
 
 def SpellGroupParallel(*args):
@@ -540,7 +603,9 @@ def SpellGroupParallel(*args):
                  "SPELLNAME":
                      " & ".join(spellclass.SPELLNAME for spellclass in args),
                  "READONLY": 
-                      all(spellclass.READONLY for spellclass in args)})
+                      all(spellclass.READONLY for spellclass in args),
+                 "MARKS_DIRTY":
+                      all(spellclass.MARKS_DIRTY for spellclass in args)})
 
 class SpellApplyPatch(Spell):
     """A spell for applying a patch on files."""
@@ -604,9 +669,27 @@ class fake_logger:
         cls.level = level
 
 
-def _toaster_job(args):
-    """For multiprocessing. This function creates a new toaster, with the
-    given options and spells, and calls the toaster on filename.
+def _get_peak_rss():
+    """Return the peak resident set size of the current process, in
+    bytes, or ``0`` if it cannot be determined on this platform.
+    """
+    if resource is None:
+        return 0
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes, except on Mac OS X
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+def _toaster_worker(toasterclass, options, spellnames, tasks, results):
+    """For multiprocessing. This function runs in a worker process of
+    :meth:`Toaster._toast_jobs`. It creates the classes of the file
+    format (see :meth:`Toaster.warm_up`), and a toaster with the given
+    options and spells, just once, and then toasts every file name that
+    it gets from *tasks*, until it gets ``None``, or until it has to be
+    recycled. For every file, the files done, skipped, and failed, the
+    result of :meth:`Spell.toastresult`, the profile if profiling, the
+    traceback of an exception to be raised, if any, and whether the
+    worker retires, are put on *results*.
     """
 
     class multiprocessing_fake_logger(fake_logger):
@@ -619,21 +702,60 @@ def _toaster_job(args):
                       % (multiprocessing.current_process().pid,
                          level_str, msg))
 
-    toasterclass, filename, options, spellnames = args
+    # create the classes of the file format before the first file,
+    # in case the worker was not forked from a warmed up toaster
+    toasterclass.warm_up()
     toaster = toasterclass(options=options, spellnames=spellnames,
                            logger=multiprocessing_fake_logger)
+    pid = multiprocessing.current_process().pid
+    max_tasks = toaster.options["refresh"]
+    max_rss = toaster.options["maxrss"] * 1024 * 1024
 
-    # toast entry code
-    if not toaster.spellclass.toastentry(toaster):
+    # toast entry code, for all files of this worker
+    applies = toaster.spellclass.toastentry(toaster)
+    if not applies:
         print("pyffi.toaster:%s" % "Spell does not apply! quiting early...")
-        return
-
-    # toast single file
-    stream = open(filename, mode='rb' if toaster.spellclass.READONLY else 'r+b')
-    toaster._toast(stream)
 
-    # toast exit code
-    toaster.spellclass.toastexit(toaster)
+    num_tasks = 0
+    while True:
+        filename = tasks.get()
+        if filename is None:
+            break
+        error = None
+        if applies:
+            try:
+                with open(filename, mode='rb' if toaster.spellclass.READONLY
+                          else 'r+b') as stream:
+                    toaster._toast(stream)
+            except Exception:
+                # errors in spells are handled by _toast,
+                # so either the file cannot be opened, or --raise is set
+                toaster.files_failed.add(filename)
+                if toaster.options["raisetesterror"]:
+                    error = traceback.format_exc()
+                else:
+                    toaster.logger.error(traceback.format_exc())
+            result = toaster.spellclass.toastresult(toaster)
+        else:
+            toaster.files_skipped.add(filename)
+            result = None
+        num_tasks += 1
+        retire = ((max_tasks and num_tasks >= max_tasks)
+                  or (max_rss and _get_peak_rss() >= max_rss))
+        profile = toaster._profiler.pop_result() if toaster._profiler else None
+        results.put((pid, filename, toaster.files_done,
+                     toaster.files_skipped, toaster.files_failed,
+                     result, profile, error, retire))
+        toaster.files_done = {}
+        toaster.files_skipped = set()
+        toaster.files_failed = set()
+        if toaster.options["gccollect"]:
+            gc.collect()
+        if retire:
+            break
+
+# returned by Toaster._timed when not profiling
+_NOT_TIMED = contextlib.nullcontext()
 
 # CPU_COUNT is used for default number of jobs
 if multiprocessing:
@@ -663,6 +785,14 @@ class Toaster(object):
     ALIASDICT = {}
     """Dictionary with aliases for spells."""
 
+    PIPELINE_THREADS = 4
+    """Maximal number of threads which read files ahead with
+    ``--pipeline``."""
+
+    PROGRESS_INTERVAL = 10
+    """Number of seconds between progress messages when toasting with
+    more than one job."""
+
     DEFAULT_OPTIONS = dict(
         raisetesterror=False, verbose=1, pause=False,
         exclude=[], include=[], examples=False,
@@ -672,10 +802,12 @@ class Toaster(object):
         createpatch=False, applypatch=False, diffcmd="", patchcmd="",
         series=False,
         skip=[], only=[],
-        jobs=CPU_COUNT, refresh=32,
+        jobs=CPU_COUNT, refresh=32, maxrss=0,
         sourcedir="", destdir="",
         archives=False,
-        resume=False,
+        resume=False, manifest="",
+        pipeline=False, readahead=16, readaheadmb=256, writebehind=16,
+        profile="",
         gccollect=False,
         inifile="")
     """List of spell classes of the particular :class:`Toaster` instance."""
@@ -692,6 +824,14 @@ class Toaster(object):
     indent = 0
     """An ``int`` which describes the current indentation level for messages."""
 
+    _writer = None
+    """The :class:`~pyffi.spells.pipeline.AsyncWriter` of
+    :meth:`_toast_pipeline`, while it runs."""
+
+    _profiler = None
+    """The :class:`~pyffi.spells.profiler.ToasterProfiler`, if the
+    profile option is set."""
+
     logger = logging.getLogger("pyffi.toaster")
     """A :class:`logging.Logger` for toaster log messages."""
 
@@ -760,6 +900,9 @@ class Toaster(object):
         if self.options["patchcmd"] and not(self.options["applypatch"]):
             raise ValueError(
                 "option --patch-cmd can only be used with --patch")
+        # profile?
+        self._profiler = (pyffi.spells.profiler.ToasterProfiler()
+                          if self.options["profile"] else None)
         # multiprocessing available?
         if (multiprocessing is None) and self.options["jobs"] > 1:
             self.logger.warn(
@@ -982,6 +1125,20 @@ class Toaster(object):
             type="int",
             metavar="JOBS",
             help="allow JOBS jobs at once [default: %default]")
+        parser.add_option(
+            "--manifest", dest="manifest",
+            type="string",
+            metavar="FILE",
+            help="record all files toasted in FILE, and skip files that"
+                 " were toasted successfully before with the same spells"
+                 " and options, and have not changed since")
+        parser.add_option(
+            "--max-rss", dest="maxrss",
+            type="int",
+            metavar="MAXRSS",
+            help="start a new process after a file if the process used"
+                 " more than MAXRSS megabytes, if JOBS is 2 or more;"
+                 " 0 means no limit [default: %default]")
         parser.add_option(
             "--noninteractive", dest="interactive",
             action="store_false",
@@ -1009,6 +1166,11 @@ class Toaster(object):
             metavar="CMD",
             help="use CMD as patch command; this command must accept precisely "
                  "3 arguments: 'CMD oldfile newfile patchfile'.""")
+        parser.add_option(
+            "--pipeline", dest="pipeline",
+            action="store_true",
+            help="if JOBS is 1, read files ahead, and write files, in"
+                 " separate threads while toasting")
         parser.add_option(
             "-p", "--pause", dest="pause",
             action="store_true",
@@ -1019,18 +1181,37 @@ class Toaster(object):
             metavar="PREFIX",
             help="prepend PREFIX to file name when saving modification"
                  " instead of overwriting the original")
+        parser.add_option(
+            "--profile", dest="profile",
+            type="string",
+            metavar="FILE",
+            help="save the time spent on every file, and by every spell,"
+                 " as JSON to FILE, and log a summary")
         parser.add_option(
             "-r", "--raise", dest="raisetesterror",
             action="store_true",
             help="raise exception on errors during the spell (for debugging)")
+        parser.add_option(
+            "--read-ahead", dest="readahead",
+            type="int",
+            metavar="FILES",
+            help="with --pipeline, read at most FILES files ahead"
+                 " [default: %default]")
+        parser.add_option(
+            "--read-ahead-mb", dest="readaheadmb",
+            type="int",
+            metavar="MB",
+            help="with --pipeline, read at most MB megabytes ahead"
+                 " [default: %default]")
         parser.add_option(
             "--refresh", dest="refresh",
             type="int",
             metavar="REFRESH",
-            help="start new process pool every JOBS * REFRESH files"
+            help="start a new process after every REFRESH files"
                  " if JOBS is 2 or more"
                  " (when processing a large number of files, this prevents"
-                 " leaking memory on some operating systems) [default: %default]")
+                 " leaking memory on some operating systems);"
+                 " 0 means never [default: %default]")
         parser.add_option(
             "--resume", dest="resume",
             action="store_true",
@@ -1062,6 +1243,12 @@ class Toaster(object):
             metavar="SUFFIX",
             help="append SUFFIX to file name when saving modification"
                  " instead of overwriting the original")
+        parser.add_option(
+            "--write-behind", dest="writebehind",
+            type="int",
+            metavar="FILES",
+            help="with --pipeline, keep at most FILES files waiting to be"
+                 " written [default: %default]")
         parser.add_option(
             "-v", "--verbose", dest="verbose",
             type="int",
@@ -1172,25 +1359,6 @@ class Toaster(object):
         :type top: str
         """
 
-        def file_pools(chunksize):
-            """Helper function which generates list of files, sorted by size,
-            in chunks of given size.
-            """
-            all_files = pyffi.utils.walk(
-                top, onerror=None,
-                re_filename=self.FILEFORMAT.RE_FILENAME)
-            while True:
-                # fetch chunksize files from all files
-                file_pool = [
-                    filename for i, filename in zip(
-                        range(chunksize), all_files)]
-                if not file_pool:
-                    # done!
-                    break
-                # sort files by size
-                file_pool.sort(key=os.path.getsize, reverse=True)
-                yield file_pool
-
         # toast entry code
         if not self.spellclass.toastentry(self):
             self.msg("spell does not apply! quiting early...")
@@ -1246,30 +1414,260 @@ class Toaster(object):
                     input("Press enter...")
                 return
 
-        # walk over all streams, and create a data instance for each of them
-        # inspect the file but do not yet read in full
-        if jobs == 1:
-            for stream in self.FILEFORMAT.walk(top, mode='rb' if self.spellclass.READONLY else 'r+b'):
+        # files toasted before, and unchanged since, are skipped
+        manifest = None
+        if self.options["manifest"]:
+            manifest = pyffi.spells.manifest.ToasterManifest(
+                self.options["manifest"], self)
+        toasted = []
+
+        try:
+            # walk over all streams, and create a data instance for each of them
+            # inspect the file but do not yet read in full
+            if jobs == 1 and not self.options["pipeline"]:
+                for stream in self.FILEFORMAT.walk(top, mode='rb' if self.spellclass.READONLY else 'r+b'):
+                    if manifest and manifest.is_unchanged(stream.name):
+                        self.msg("=== %s (unchanged) ===" % stream.name)
+                        continue
+                    toasted.append(stream.name)
+                    self._toast(stream)
+                    if self.options["gccollect"]:
+                        # force free memory (helps when parsing many files)
+                        gc.collect()
+            else:
+                file_sizes = list(pyffi.utils.walk_sizes(
+                    top, re_filename=self.FILEFORMAT.RE_FILENAME))
+                if jobs > 1:
+                    # largest files first, so no worker is left with a
+                    # large file at the end while all others are idle
+                    file_sizes.sort(
+                        key=lambda file_size: file_size[1], reverse=True)
+                if manifest:
+                    num_files = len(file_sizes)
+                    file_sizes = [
+                        (filename, size) for filename, size in file_sizes
+                        if not manifest.is_unchanged(filename)]
+                    self.msg("skipping %i unchanged files"
+                             % (num_files - len(file_sizes)))
+                toasted = [filename for filename, size in file_sizes]
+                if jobs > 1:
+                    self.msg("toasting %i files with %i processes"
+                             % (len(file_sizes), jobs))
+                    self._toast_jobs(file_sizes)
+                else:
+                    self._toast_pipeline(file_sizes)
+        finally:
+            if manifest:
+                for filename in toasted:
+                    if filename in self.files_failed:
+                        manifest.update(filename, "failed")
+                    elif filename in self.files_done:
+                        manifest.update(filename, "done")
+                    elif filename in self.files_skipped:
+                        manifest.update(filename, "skipped")
+                manifest.save()
+
+        # toast exit code
+        self.spellclass.toastexit(self)
+        if self._profiler:
+            self._profiler.save(self.options["profile"])
+            self.msg(self._profiler.get_summary())
+
+    def _toast_pipeline(self, file_sizes):
+        """Toast files in a pipeline (see :mod:`pyffi.spells.pipeline`):
+        files are read ahead by a :class:`~pyffi.spells.pipeline.FilePrefetcher`,
+        toasted from memory, and written by an
+        :class:`~pyffi.spells.pipeline.AsyncWriter` through
+        :meth:`write`.
+
+        :param file_sizes: The names and sizes of the files to toast.
+        :type file_sizes: ``list`` of ``(str, int)``
+        """
+        prefetcher = pyffi.spells.pipeline.FilePrefetcher(
+            file_sizes, max_files=self.options["readahead"],
+            max_bytes=self.options["readaheadmb"] * 1024 * 1024,
+            threads=min(self.options["readahead"], self.PIPELINE_THREADS))
+        self._writer = pyffi.spells.pipeline.AsyncWriter(
+            self.options["writebehind"])
+        try:
+            for filename, future in prefetcher:
+                try:
+                    stream = io.BytesIO(future.result())
+                except Exception:
+                    self.files_failed.add(filename)
+                    self.logger.error("FAILED TO READ %s" % filename)
+                    if self.options["raisetesterror"]:
+                        raise
+                    continue
+                stream.name = filename
                 self._toast(stream)
+                self._check_writer()
                 if self.options["gccollect"]:
                     # force free memory (helps when parsing many files)
                     gc.collect()
-        else:
-            chunksize = self.options["refresh"] * self.options["jobs"]
-            self.msg("toasting with %i threads in chunks of %i files"
-                     % (jobs, chunksize))
-            for file_pool in file_pools(chunksize):
-                self.logger.debug("process file pool:")
-                for filename in file_pool:
-                    self.logger.debug("  " + filename)
-                with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as executor:
-                    list(executor.map(
-                        _toaster_job,
-                        ((self.__class__, filename, self.options, self.spellnames)
-                         for filename in file_pool)))
+        finally:
+            writer, self._writer = self._writer, None
+            writer.close()
+            self._check_writer(writer)
+
+    def _check_writer(self, writer=None):
+        """Move files which failed to be written by the writer of
+        :meth:`_toast_pipeline` to :attr:`files_failed`, and reraise
+        the first error if ``raisetesterror`` is set.
+        """
+        writer = writer or self._writer
+        error = None
+        for filename, exc_info in writer.get_errors():
+            self.files_done.pop(filename, None)
+            self.files_failed.add(filename)
+            self.logger.error("FAILED TO WRITE {0} - {1}".format(
+                filename, exc_info[1]))
+            if error is None:
+                error = exc_info[1]
+        if error is not None and self.options["raisetesterror"]:
+            raise error
 
-        # toast exit code
-        self.spellclass.toastexit(self)
+    @classmethod
+    def warm_up(cls):
+        """Create all classes of :attr:`FILEFORMAT`, so they are not
+        created again for every file, or for every worker process. This
+        is only needed for formats whose classes are created on first
+        access (see :attr:`pyffi.object_models.xml.FileFormat.xml_lazy`).
+        """
+        create_all_classes = getattr(
+            cls.FILEFORMAT, "create_all_classes", None)
+        if create_all_classes is not None:
+            create_all_classes()
+
+    def _toast_jobs(self, file_sizes):
+        """Toast files in a pool of worker processes, one file per worker
+        at a time. Every worker sets up its toaster, and calls
+        :meth:`Spell.toastentry`, only once. It is replaced by a new
+        worker after ``refresh`` files, or once it has used more than
+        ``maxrss`` megabytes of memory. The files done, skipped, and
+        failed, and the results of :meth:`Spell.toastresult`, are merged
+        into this toaster as soon as each file is done.
+
+        Files are handed out in the given order, each to the first
+        worker that is idle. The progress, and an estimate of the time
+        left based on the number of bytes toasted so far, are logged
+        every :attr:`PROGRESS_INTERVAL` seconds.
+
+        :param file_sizes: The names and sizes of the files to toast.
+        :type file_sizes: ``list`` of ``(str, int)``
+        """
+        jobs = self.options["jobs"]
+        filenames = iter([filename for filename, size in file_sizes])
+        sizes = dict(file_sizes)
+        total_size = sum(sizes.values())
+        done_size = 0
+        start_time = last_time = time.time()
+        results = multiprocessing.Queue()
+        workers = {}  # maps pid to (process, task queue)
+        idle = []  # pids of workers that are waiting for a file
+        busy = {}  # maps pid to the name of the file it is toasting
+        error = None
+
+        def start_worker():
+            tasks = multiprocessing.SimpleQueue()
+            process = multiprocessing.Process(
+                target=_toaster_worker,
+                args=(self.__class__, self.options, self.spellnames,
+                      tasks, results))
+            process.start()
+            workers[process.pid] = process, tasks
+            idle.append(process.pid)
+
+        def stop_worker(pid):
+            process, tasks = workers.pop(pid)
+            process.join()
+            if pid in idle:
+                idle.remove(pid)
+
+        # forked workers inherit the classes created here
+        self.warm_up()
+        try:
+            while True:
+                # hand out files to idle workers
+                while error is None and len(busy) < jobs:
+                    filename = next(filenames, None)
+                    if filename is None:
+                        break
+                    if not idle:
+                        start_worker()
+                    pid = idle.pop()
+                    busy[pid] = filename
+                    workers[pid][1].put(filename)
+                if not busy:
+                    break
+                try:
+                    (pid, filename, files_done, files_skipped, files_failed,
+                     result, profile, worker_error,
+                     retire) = results.get(timeout=1)
+                except queue.Empty:
+                    # check for workers that crashed
+                    for pid, filename in list(busy.items()):
+                        process = workers[pid][0]
+                        if process.exitcode:
+                            self.logger.error(
+                                "worker process %i crashed on %s"
+                                % (pid, filename))
+                            self.files_failed.add(filename)
+                            done_size += sizes[filename]
+                            del busy[pid]
+                            stop_worker(pid)
+                    continue
+                del busy[pid]
+                done_size += sizes[filename]
+                now = time.time()
+                if now - last_time >= self.PROGRESS_INTERVAL:
+                    last_time = now
+                    self._log_progress(done_size, total_size, now - start_time)
+                self.files_done.update(files_done)
+                self.files_skipped.update(files_skipped)
+                self.files_failed.update(files_failed)
+                if result is not None:
+                    self.spellclass.toastmerge(self, result)
+                if profile is not None:
+                    self._profiler.merge(profile)
+                if worker_error is not None and error is None:
+                    error = worker_error
+                if retire:
+                    stop_worker(pid)
+                else:
+                    idle.append(pid)
+        finally:
+            for pid, (process, tasks) in workers.items():
+                if pid in busy:
+                    # only if something went wrong in this process
+                    process.terminate()
+                elif process.is_alive():
+                    tasks.put(None)
+            for pid in list(workers):
+                stop_worker(pid)
+        if error is not None:
+            raise RuntimeError("exception in worker process:\n" + error)
+        self.msg("toasted %i bytes in %.1f seconds"
+                 % (total_size, time.time() - start_time))
+
+    def _log_progress(self, done_size, total_size, elapsed):
+        """Log how much of the toasting is done, and estimate the time
+        left from the rate at which bytes were toasted so far.
+
+        :param done_size: Number of bytes toasted so far.
+        :type done_size: ``int``
+        :param total_size: Total number of bytes to toast.
+        :type total_size: ``int``
+        :param elapsed: Number of seconds since toasting started.
+        :type elapsed: ``float``
+        """
+        if not(done_size and total_size):
+            return
+        eta = int(elapsed * (total_size - done_size) / done_size)
+        self.logger.info(
+            "toasted %.1f%% of %i bytes, about %i:%02i:%02i left"
+            % (100.0 * done_size / total_size, total_size,
+               eta // 3600, (eta // 60) % 60, eta % 60))
 
     def toast_archives(self, top):
         """Toast all files in all archives."""
@@ -1322,15 +1720,19 @@ class Toaster(object):
         self.msgblockbegin("=== %s ===" % stream.name)
         try:
             # inspect the file (reads only the header)
-            data.inspect(stream)
+            with self._timed(stream.name, "inspect"):
+                data.inspect(stream)
 
             # create spell instance
             spell = self.spellclass(toaster=self, data=data, stream=stream)
+            if self._profiler:
+                self._profiler.instrument(spell, stream.name)
             
             # inspect the spell instance
             if spell._datainspect() and spell.datainspect():
                 # read the full file
-                data.read(stream)
+                with self._timed(stream.name, "read"):
+                    data.read(stream)
                 
                 # cast the spell on the data tree
                 spell.recurse()
@@ -1338,10 +1740,14 @@ class Toaster(object):
                 # save file back to disk if not readonly and the spell
                 # changed the file
                 if (not self.spellclass.READONLY) and spell.changed:
-                    if self.options["createpatch"]:
-                        self.writepatch(stream, data)
-                    else:
-                        self.write(stream, data)
+                    # with a writer thread, only serialising is timed
+                    # here, and the writer thread times the write
+                    stage = "serialize" if self._writer else "write"
+                    with self._timed(stream.name, stage):
+                        if self.options["createpatch"]:
+                            self.writepatch(stream, data)
+                        else:
+                            self.write(stream, data)
             self.files_done[stream.name] = spell.reports
 
         except Exception as expt:
@@ -1356,6 +1762,14 @@ class Toaster(object):
         finally:
             self.msgblockend()
 
+    def _timed(self, filename, stage):
+        """Context manager which records the time spent on *stage* of
+        *filename* if profiling, and does nothing otherwise.
+        """
+        if self._profiler:
+            return self._profiler.timed(filename, stage)
+        return _NOT_TIMED
+
     def get_toast_head_root_ext(self, filename):
         """Get the name of where the input file *filename* would
         be written to by the toaster: head, root, and extension.
@@ -1424,10 +1838,38 @@ class Toaster(object):
                 self.msg("writing %s" % filename)
             return open(filename, "wb")
 
+    def _is_toast_stream(self, stream):
+        """Whether the toaster would write to the file of *stream*
+        itself.
+        """
+        if (self.spellclass.get_toast_stream.__func__
+            is not Spell.get_toast_stream.__func__):
+            # spell writes elsewhere
+            return False
+        head, root, ext = self.get_toast_head_root_ext(stream.name)
+        filename = os.path.join(head, root + ext)
+        return (os.path.exists(filename)
+                and os.path.samefile(filename, stream.name))
+
     def write(self, stream, data):
         """Writes the data to data and raises an exception if the
         write fails, but restores file if fails on overwrite.
         """
+        if self._writer is not None:
+            self._write_async(stream, data)
+            return
+        if (self.spellclass.MARKS_DIRTY and not self.options["dryrun"]
+            and data.is_dirty() and self._is_toast_stream(stream)):
+            try:
+                written = data.write_changes(stream)
+            except:  # not just Exception, also CTRL-C
+                # write_changes restores the bytes that it overwrote
+                self.msg("write failed!!!")
+                self.msg("original file restored")
+                raise
+            if written:
+                self.msg("writing changes in place")
+                return
         outstream = self.spellclass.get_toast_stream(self, stream.name)
         if stream is outstream:
             # make backup
@@ -1458,6 +1900,47 @@ class Toaster(object):
         finally:
             outstream.close()
 
+    def _write_async(self, stream, data):
+        """Like :meth:`write`, for the in-memory streams of
+        :meth:`_toast_pipeline`: the data is serialised, and the file is
+        opened, here, and only the bytes are written by the writer
+        thread.
+        """
+        outstream = io.BytesIO()
+        data.write(outstream)
+        contents = outstream.getvalue()
+        in_place = (not self.options["dryrun"]
+                    and self._is_toast_stream(stream))
+        if in_place:
+            # the original is only overwritten by the writer thread
+            original = stream.getvalue()
+            self.msg("overwriting %s" % stream.name)
+            outstream = open(stream.name, "r+b")
+        else:
+            outstream = self.spellclass.get_toast_stream(self, stream.name)
+
+        def write_contents():
+            with self._timed(stream.name, "write"):
+                try:
+                    outstream.write(contents)
+                    outstream.truncate()
+                except:  # not just Exception, also CTRL-C
+                    if in_place:
+                        outstream.seek(0)
+                        outstream.write(original)
+                        outstream.truncate()
+                    else:
+                        outstream_name = outstream.name
+                        outstream.close()
+                        if (isinstance(outstream_name, str)
+                                and os.path.exists(outstream_name)):
+                            os.remove(outstream_name)
+                    raise
+                finally:
+                    outstream.close()
+
+        self._writer.put(stream.name, write_contents)
+
     def writepatch(self, stream, data):
         """Creates a binary patch for the updated file."""
         diffcmd = self.options.get('diffcmd')
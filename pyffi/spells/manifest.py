@@ -0,0 +1,291 @@
+"""Manifest of the files toasted before, for incremental toasting.
+
+With the ``--manifest FILE`` option, the toaster records, for every file
+it toasts, the size, modification time, and sha1 hash of the file, the
+spells and options, the pyffi version, the sha1 hash of the xml
+description of the file format, and whether toasting succeeded. On the
+next run with the same manifest, files which were toasted successfully
+are skipped if neither the file nor any of the above has changed since.
+
+A file whose size and modification time are unchanged is not read
+again. Only if its modification time changed, but its size did not, is
+its hash computed to decide whether it really changed. The state of a
+file is recorded after it has been toasted, so files that a spell
+modifies in place are not toasted again either.
+
+If the toaster writes to another file, for instance with ``--prefix``,
+``--suffix``, or ``--dest-dir``, the state of that file is recorded as
+well, and a file is only skipped if its output is unchanged too. For
+spells that write to files of their own, a file is only skipped if
+:meth:`~pyffi.spells.Spell.get_toast_stream` still finds its output.
+"""
+
+# --------------------------------------------------------------------------
+# ***** BEGIN LICENSE BLOCK *****
+#
+# Copyright (c) 2007-2012, Python File Format Interface
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#
+#    * Redistributions in binary form must reproduce the above
+#      copyright notice, this list of conditions and the following
+#      disclaimer in the documentation and/or other materials provided
+#      with the distribution.
+#
+#    * Neither the name of the Python File Format Interface
+#      project nor the names of its contributors may be used to endorse
+#      or promote products derived from this software without specific
+#      prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+# ***** END LICENSE BLOCK *****
+# --------------------------------------------------------------------------
+
+import hashlib
+import json
+import logging
+import os
+import os.path
+import tempfile
+
+import pyffi
+import pyffi.spells
+
+
+class ToasterManifest(object):
+    """Load, update, and save the manifest of a toaster.
+
+    :param filename: The name of the manifest file.
+    :type filename: ``str``
+    :param toaster: The toaster.
+    :type toaster: :class:`~pyffi.spells.Toaster`
+    """
+
+    logger = logging.getLogger("pyffi.toaster.manifest")
+    manifest_version = 2
+    """Version of the manifest layout; increase whenever the recorded
+    entries change."""
+    ignored_options = frozenset([
+        "verbose", "pause", "interactive", "examples", "spells",
+        "helpspell", "raisetesterror", "jobs", "refresh", "maxrss",
+        "gccollect", "resume", "inifile", "manifest", "pipeline",
+        "readahead", "readaheadmb", "writebehind", "profile"])
+    """Options which do not affect the result of toasting."""
+
+    def __init__(self, filename, toaster):
+        self.filename = filename
+        self.toaster = toaster
+        self.config = {
+            "spells": list(toaster.spellnames),
+            "options": self.get_options_digest(toaster.options),
+            "pyffi": pyffi.__version__,
+            "schema": getattr(toaster.FILEFORMAT, "xml_file_digest", None),
+            }
+        self.entries = {}
+        self.load()
+
+    @classmethod
+    def get_options_digest(cls, options):
+        """The sha1 hex digest of all options which affect the result
+        of toasting.
+        """
+        return hashlib.sha1(json.dumps(
+            sorted((name, value) for name, value in options.items()
+                   if name not in cls.ignored_options),
+            default=repr).encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def get_file_digest(filename):
+        """The sha1 hex digest of the contents of a file."""
+        digest = hashlib.sha1()
+        with open(filename, "rb") as stream:
+            for chunk in iter(lambda: stream.read(1 << 20), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def load(self):
+        """Load the entries from the manifest file, if it exists and
+        has the current layout.
+        """
+        try:
+            with open(self.filename, "r", encoding="utf-8") as stream:
+                manifest = json.load(stream)
+        except FileNotFoundError:
+            return
+        except Exception:
+            self.logger.warning("Could not load %s, starting a new manifest."
+                             % self.filename)
+            return
+        if manifest.get("version") == self.manifest_version:
+            self.entries = manifest["files"]
+
+    def save(self):
+        """Save the entries to the manifest file."""
+        directory = os.path.dirname(os.path.abspath(self.filename))
+        # write to a temporary file first, so an interrupted save
+        # does not destroy the manifest
+        handle, tmp_filename = tempfile.mkstemp(dir=directory)
+        try:
+            with os.fdopen(handle, "w", encoding="utf-8") as stream:
+                json.dump({"version": self.manifest_version,
+                           "files": self.entries},
+                          stream, indent=1, sort_keys=True)
+            os.replace(tmp_filename, self.filename)
+        except Exception:
+            os.remove(tmp_filename)
+            raise
+
+    def get_output_filename(self, filename):
+        """The name of the file to which the toaster writes the result
+        of toasting *filename*, or ``None`` if it writes nothing, if it
+        overwrites *filename* itself, or if the spell writes to files
+        of its own.
+
+        :param filename: The name of the file.
+        :type filename: ``str``
+        :rtype: ``str``
+        """
+        toaster = self.toaster
+        if (toaster.spellclass.READONLY or toaster.options["dryrun"]
+                or self.writes_elsewhere()):
+            return None
+        head, root, ext = toaster.get_toast_head_root_ext(filename)
+        output = os.path.abspath(os.path.join(head, root + ext))
+        if output == os.path.abspath(filename):
+            return None
+        return output
+
+    def writes_elsewhere(self):
+        """Whether the spell writes to files of its own, so the toaster
+        cannot tell their names.
+        """
+        return (not self.toaster.spellclass.READONLY
+                and not self.toaster.options["dryrun"]
+                and self.toaster.spellclass.get_toast_stream.__func__
+                is not pyffi.spells.Spell.get_toast_stream.__func__)
+
+    def output_exists(self, filename):
+        """Whether the output of toasting *filename* exists, as far as
+        :meth:`~pyffi.spells.Spell.get_toast_stream` can tell.
+        """
+        return bool(self.toaster.spellclass.get_toast_stream(
+            self.toaster, filename, test_exists=True))
+
+    @classmethod
+    def is_same_file(cls, filename, state):
+        """Whether *filename* still has the recorded *state*. A file
+        which was only touched gets its new modification time recorded.
+
+        :param filename: The name of the file.
+        :type filename: ``str``
+        :param state: The size, modification time, and hash of the file.
+        :type state: ``dict``
+        :rtype: ``bool``
+        """
+        try:
+            stat = os.stat(filename)
+        except OSError:
+            return False
+        if stat.st_size != state["size"]:
+            return False
+        if stat.st_mtime_ns != state["mtime"]:
+            if cls.get_file_digest(filename) != state["hash"]:
+                return False
+            # only touched
+            state["mtime"] = stat.st_mtime_ns
+        return True
+
+    @classmethod
+    def get_file_state(cls, filename, state=None):
+        """The size, modification time, and hash of *filename*, or
+        ``None`` if it does not exist. The hash is only computed if
+        the size or modification time differ from *state*.
+
+        :param filename: The name of the file.
+        :type filename: ``str``
+        :param state: The state recorded before, if any.
+        :type state: ``dict``
+        :rtype: ``dict``
+        """
+        try:
+            stat = os.stat(filename)
+        except OSError:
+            return None
+        if (state is not None and stat.st_size == state["size"]
+                and stat.st_mtime_ns == state["mtime"]):
+            digest = state["hash"]
+        else:
+            digest = cls.get_file_digest(filename)
+        return dict(size=stat.st_size, mtime=stat.st_mtime_ns, hash=digest)
+
+    def is_unchanged(self, filename):
+        """Whether *filename* was toasted successfully before, and
+        neither the file, nor its output, nor the configuration changed
+        since.
+
+        :param filename: The name of the file.
+        :type filename: ``str``
+        :rtype: ``bool``
+        """
+        entry = self.entries.get(os.path.abspath(filename))
+        if (entry is None or entry["outcome"] != "done"
+                or any(entry[key] != value
+                       for key, value in self.config.items())):
+            return False
+        if not self.is_same_file(filename, entry):
+            return False
+        # the name of the output depends only on the configuration,
+        # so it is the same as before
+        output = entry["output"]
+        if output is not None and not self.is_same_file(output["name"],
+                                                        output):
+            return False
+        if entry["output_exists"] and not self.output_exists(filename):
+            return False
+        return True
+
+    def update(self, filename, outcome):
+        """Record the current state of *filename* and of its output,
+        and the outcome of toasting it.
+
+        :param filename: The name of the file.
+        :type filename: ``str``
+        :param outcome: ``"done"``, ``"skipped"``, or ``"failed"``.
+        :type outcome: ``str``
+        """
+        key = os.path.abspath(filename)
+        entry = self.entries.get(key)
+        state = self.get_file_state(filename, entry)
+        if state is None:
+            # file was removed
+            self.entries.pop(key, None)
+            return
+        output = None
+        output_filename = self.get_output_filename(filename)
+        if output_filename is not None:
+            output = self.get_file_state(
+                output_filename, entry and entry["output"])
+            if output is not None:
+                output["name"] = output_filename
+        output_exists = self.writes_elsewhere() and self.output_exists(filename)
+        self.entries[key] = dict(
+            self.config, outcome=outcome, output=output,
+            output_exists=output_exists, **state)
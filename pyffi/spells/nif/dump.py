@@ -66,7 +66,7 @@ def dumpArray(arr):
     """
     text = ""
     if arr._count2 == None:
-        for i, element in enumerate(list.__iter__(arr)):
+        for i, element in enumerate(arr._iter_elements()):
             if i > 16:
                 text += "etc...\n"
                 break
@@ -74,7 +74,7 @@ def dumpArray(arr):
     else:
         k = 0
         for i, elemlist in enumerate(list.__iter__(arr)):
-            for j, elem in enumerate(list.__iter__(elemlist)):
+            for j, elem in enumerate(elemlist._iter_elements()):
                 if k > 16:
                     text += "etc...\n"
                     break
@@ -216,6 +216,21 @@ class SpellHtmlReport(NifSpell):
         # spell always applies
         return True
 
+    @classmethod
+    def toastresult(cls, toaster):
+        result, toaster.reports_per_blocktype = (
+            toaster.reports_per_blocktype, {})
+        return result
+
+    @classmethod
+    def toastmerge(cls, toaster, result):
+        for blocktype, reports in result.items():
+            if blocktype in toaster.reports_per_blocktype:
+                # skip the header row
+                toaster.reports_per_blocktype[blocktype].extend(reports[1:])
+            else:
+                toaster.reports_per_blocktype[blocktype] = reports
+
     def _branchinspect(self, branch):
         # enter every branch
         # (the base method is called in branch entry)
@@ -443,14 +458,14 @@ class SpellDumpPython(NifSpell):
             if _value:
                 self.print_("%s.update_size()" % name)
                 if _value._count2 is None:
-                    for i, elem in enumerate(list.__iter__(_value)):
+                    for i, elem in enumerate(_value._iter_elements()):
                         if self.print_instance(
                             "%s[%i]" % (name, i), elem):
 
                             result = True
                 else:
                     for i, elemlist in enumerate(list.__iter__(_value)):
-                        for j, elem in enumerate(list.__iter__(elemlist)):
+                        for j, elem in enumerate(elemlist._iter_elements()):
                             if self.print_instance(
                                 "%s[%i][%i]" % (name, i, j), elem):
 
@@ -224,6 +224,7 @@ class SpellParseTexturePath(NifSpell):
 
     # abstract spell, so no spell name
     READONLY = False
+    MARKS_DIRTY = True
 
     def substitute(self, old_path):
         """Helper function to allow subclasses of this spell to
@@ -254,12 +255,17 @@ class SpellParseTexturePath(NifSpell):
     
     def branchentry(self, branch):
         if isinstance(branch, NifFormat.NiSourceTexture):
-            branch.file_name = self.substitute(branch.file_name)
+            old_path = branch.file_name
+            branch.file_name = self.substitute(old_path)
+            if branch.file_name != old_path:
+                self.data.mark_dirty(branch)
             return False
 
         elif isinstance(branch, NifFormat.BSShaderTextureSet):
             for n, tex in enumerate (branch.textures):
                 branch.textures[n] = self.substitute(tex)
+                if branch.textures[n] != tex:
+                    self.data.mark_dirty(branch)
             return False
         else:
             return True
@@ -348,6 +354,7 @@ class SpellClampMaterialAlpha(NifSpell):
 
     SPELLNAME = "fix_clampmaterialalpha"
     READONLY = False
+    MARKS_DIRTY = True
 
     def datainspect(self):
         # only run the spell if there are material property blocks
@@ -366,12 +373,14 @@ class SpellClampMaterialAlpha(NifSpell):
                 self.toaster.msg(
                     "clamping alpha value (%f -> 1.0)" % branch.alpha)
                 branch.alpha = 1.0
+                self.data.mark_dirty(branch)
                 self.changed = True
             elif branch.alpha < 0:
                 # too small
                 self.toaster.msg(
                     "clamping alpha value (%f -> 0.0)" % branch.alpha)
                 branch.alpha = 0.0
+                self.data.mark_dirty(branch)
                 self.changed = True
             # stop recursion
             return False
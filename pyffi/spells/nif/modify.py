@@ -467,6 +467,7 @@ class SpellCollisionMaterial(NifSpell):
 
     SPELLNAME = "modify_collisionmaterial"
     READONLY = False
+    MARKS_DIRTY = True
 
     class CollisionMaterialStone:
         material = 0
@@ -512,6 +513,7 @@ class SpellCollisionMaterial(NifSpell):
         if isinstance(branch, NifFormat.bhkShape):
             self.changed = True
             branch.material = self.toaster.col_material.material
+            self.data.mark_dirty(branch)
             self.toaster.msg("collision material set to %s" % self.toaster.options["arg"])
             # bhkPackedNiTriStripsShape could be further down, so keep looking
             return True
@@ -519,6 +521,9 @@ class SpellCollisionMaterial(NifSpell):
             self.changed = True
             for subshape in branch.get_sub_shapes():
                 subshape.material = self.toaster.col_type.material
+            self.data.mark_dirty(branch)
+            if branch.data:
+                self.data.mark_dirty(branch.data)
             self.toaster.msg("collision material set to %s" % self.toaster.options["arg"])
             # all extra blocks here done; no need to recurse further
             return False
@@ -548,14 +553,22 @@ class SpellDelBranches(NifSpell):
         """
         return True
 
+    def dataentry(self):
+        # maps deleted branches to None
+        self.replacements = {}
+        return True
+
     def branchentry(self, branch):
         """Strip branch if it is flagged for deletion.
         """
+        if branch in self.replacements:
+            # already wiped out
+            return False
         # check if it is to be deleted or not
         if self.is_branch_to_be_deleted(branch):
             # it is, wipe it out
             self.toaster.msg("stripping this branch")
-            self.data.replace_global_node(branch, None)
+            self.replacements[branch] = None
             self.changed = True
             # do not recurse further
             return False
@@ -563,6 +576,10 @@ class SpellDelBranches(NifSpell):
             # this one was not excluded, keep recursing
             return True
 
+    def dataexit(self):
+        # delete all branches in one go
+        self.data.replace_global_nodes(self.replacements)
+
 class _SpellDelBranchClasses(SpellDelBranches):
     """Delete blocks that match a given list. Only useful as base class
     for other spells.
@@ -1146,7 +1163,12 @@ class SpellDelInterpolatorTransformData(NifSpell):
     def datainspect(self):
         # returns only if nif/kf contains NiSequence
         return self.inspectblocktype(NifFormat.NiSequence)
-        
+
+    def dataentry(self):
+        # maps removed transform data to None
+        self.replacements = {}
+        return True
+
     def branchinspect(self, branch):
         # inspect the NiAVObject and NiSequence branches
         return isinstance(branch, (NifFormat.NiAVObject,
@@ -1156,11 +1178,14 @@ class SpellDelInterpolatorTransformData(NifSpell):
         if isinstance(branch, NifFormat.NiSequence):
             for controlled_block in branch.controlled_blocks:
                 if controlled_block.get_node_name().lower() in self.toaster.change_blocks:
-                    self.data.replace_global_node(controlled_block.interpolator.data, None)
+                    self.replacements[controlled_block.interpolator.data] = None
                     self.toaster.msg("NiTransformData removed from interpolator for %s" % (controlled_block.get_node_name()))
                     self.changed = True
         return True
 
+    def dataexit(self):
+        self.data.replace_global_nodes(self.replacements)
+
 class SpellCollisionToMopp(NifSpell):
     """Transforms non-mopp triangle collisions to the more efficient mopps."""
 
@@ -164,8 +164,10 @@ class SpellMergeDuplicates(pyffi.spells.nif.NifSpell):
 
     def __init__(self, *args, **kwargs):
         pyffi.spells.nif.NifSpell.__init__(self, *args, **kwargs)
-        # list of all branches visited so far
-        self.branches = []
+        # maps fingerprints to the branches visited so far
+        self.branches = {}
+        # maps duplicate branches to the branch that replaces them
+        self.replacements = {}
 
     def datainspect(self):
         # see MadCat221's metstaff.nif:
@@ -186,7 +188,15 @@ class SpellMergeDuplicates(pyffi.spells.nif.NifSpell):
                                    NifFormat.NiGeometryData))
 
     def branchentry(self, branch):
-        for otherbranch in self.branches:
+        if branch in self.replacements:
+            # already found to be a duplicate
+            return False
+        fingerprint = branch.get_fingerprint()
+        if fingerprint is None:
+            # branch has no duplicates, so continue recursion
+            return True
+        branches = self.branches.setdefault(fingerprint, [])
+        for otherbranch in branches:
             if (branch is not otherbranch and
                 branch.is_interchangeable(otherbranch)):
                 # skip properties that have controllers (the
@@ -200,16 +210,20 @@ class SpellMergeDuplicates(pyffi.spells.nif.NifSpell):
                     continue
                 # interchangeable branch found!
                 self.toaster.msg("removing duplicate branch")
-                self.data.replace_global_node(branch, otherbranch)
+                self.replacements[branch] = otherbranch
                 self.changed = True
-                # branch has been replaced, so no need to recurse further
+                # branch will be replaced, so no need to recurse further
                 return False
         else:
             # no duplicate found, add to list of visited branches
-            self.branches.append(branch)
+            branches.append(branch)
             # continue recursion
             return True
 
+    def dataexit(self):
+        # replace all duplicates in one go
+        self.data.replace_global_nodes(self.replacements)
+
 class SpellOptimizeGeometry(pyffi.spells.nif.NifSpell):
     """Optimize all geometries:
       - remove duplicate vertices
@@ -232,6 +246,8 @@ class SpellOptimizeGeometry(pyffi.spells.nif.NifSpell):
         # list of all optimized geometries so far
         # (to avoid optimizing the same geometry twice)
         self.optimized = []
+        # maps branches to the branch that replaces them
+        self.replacements = {}
 
     def datainspect(self):
         # do not optimize if an egm or tri file is detected
@@ -275,7 +291,7 @@ class SpellOptimizeGeometry(pyffi.spells.nif.NifSpell):
             # keep recursing
             return True
 
-        if branch in self.optimized:
+        if branch in self.optimized or branch in self.replacements:
             # already optimized
             return False
 
@@ -297,7 +313,7 @@ class SpellOptimizeGeometry(pyffi.spells.nif.NifSpell):
         if branch.data.num_vertices < 3 or branch.data.num_triangles == 0:
             self.toaster.msg(
                 "less than 3 vertices or no triangles: removing branch")
-            self.data.replace_global_node(branch, None)
+            self.replacements[branch] = None
             return False
 
         self.optimized.append(branch)
@@ -353,7 +369,7 @@ class SpellOptimizeGeometry(pyffi.spells.nif.NifSpell):
             # this means that there are no vertices
             self.toaster.msg(
                 "less than 3 vertices or no triangles: removing branch")
-            self.data.replace_global_node(branch, None)
+            self.replacements[branch] = None
             return False
         del v_map_inverse[new_numvertices:]
 
@@ -362,7 +378,7 @@ class SpellOptimizeGeometry(pyffi.spells.nif.NifSpell):
             self.toaster.msg("replacing branch by NiTriShape")
             newbranch = branch.get_interchangeable_tri_shape(
                 triangles=triangles)
-            self.data.replace_global_node(branch, newbranch)
+            self.replacements[branch] = newbranch
             branch = newbranch
             data = newbranch.data
         else:
@@ -515,6 +531,10 @@ class SpellOptimizeGeometry(pyffi.spells.nif.NifSpell):
         # stop recursion
         return False
 
+    def dataexit(self):
+        # replace all removed and converted geometries in one go
+        self.data.replace_global_nodes(self.replacements)
+
 # XXX todo
 class SpellSplitGeometry(pyffi.spells.nif.NifSpell):
     """Optimize geometry by splitting large models into pieces.
@@ -642,6 +662,8 @@ class SpellSplitGeometry(pyffi.spells.nif.NifSpell):
         # list of all optimized geometries so far
         # (to avoid optimizing the same geometry twice)
         self.optimized = []
+        # maps branches to the branch that replaces them
+        self.replacements = {}
 
     def datainspect(self):
         return self.inspectblocktype(NifFormat.NiTriBasedGeom)
@@ -672,13 +694,16 @@ class SpellSplitGeometry(pyffi.spells.nif.NifSpell):
         # radius is over the threshold, so re-organize the geometry
         newblock = split(block, threshold_radius = THRESHOLD_RADIUS)
         # replace block with newblock everywhere
-        data.replace_global_node(block, newblock)
+        self.replacements[block] = newblock
 
         self.optimized.append(block)
 
         # stop recursing
         return False
 
+    def dataexit(self):
+        self.data.replace_global_nodes(self.replacements)
+
 class SpellDelUnusedBones(pyffi.spells.nif.NifSpell):
     """Remove nodes that are not used for anything."""
 
@@ -690,6 +715,8 @@ class SpellDelUnusedBones(pyffi.spells.nif.NifSpell):
         return self.inspectblocktype(NifFormat.NiSkinInstance)
 
     def dataentry(self):
+        # maps removed bones to None
+        self.replacements = {}
         # make list of used bones
         self._used_bones = set()
         for branch in self.data.get_global_iterator():
@@ -708,12 +735,15 @@ class SpellDelUnusedBones(pyffi.spells.nif.NifSpell):
                 and (not branch.collision_object)
                 and (branch not in self._used_bones)):
                 self.toaster.msg("removing unreferenced bone")
-                self.data.replace_global_node(branch, None)
+                self.replacements[branch] = None
                 self.changed = True
                 # no need to recurse further
                 return False
         return True
 
+    def dataexit(self):
+        self.data.replace_global_nodes(self.replacements)
+
 class SpellDelZeroScale(pyffi.spells.nif.NifSpell):
     """Remove nodes with zero scale."""
 
@@ -724,20 +754,28 @@ class SpellDelZeroScale(pyffi.spells.nif.NifSpell):
         # only run the spell if there are scaled objects
         return self.inspectblocktype(NifFormat.NiAVObject)
 
+    def dataentry(self):
+        # maps removed branches to None
+        self.replacements = {}
+        return True
+
     def branchinspect(self, branch):
         # only inspect the NiAVObject branch
         return isinstance(branch, NifFormat.NiAVObject)
     
     def branchentry(self, branch):
         if isinstance(branch, NifFormat.NiAVObject):
-            if branch.scale == 0:
+            if branch.scale == 0 and branch not in self.replacements:
                 self.toaster.msg("removing zero scaled branch")
-                self.data.replace_global_node(branch, None)
+                self.replacements[branch] = None
                 self.changed = True
                 # no need to recurse further
                 return False
         return True
 
+    def dataexit(self):
+        self.data.replace_global_nodes(self.replacements)
+
 class SpellReduceGeometry(SpellOptimizeGeometry):
     """Reduce vertices of all geometries."""
 
@@ -775,7 +813,9 @@ class SpellOptimizeCollisionBox(pyffi.spells.nif.NifSpell):
         # list of all optimized geometries so far
         # (to avoid optimizing the same geometry twice)
         self.optimized = []
-        
+        # maps shapes to the shape that replaces them
+        self.replacements = {}
+
     def datainspect(self):
         # only run the spell if there are collisions
         return (
@@ -898,18 +938,19 @@ class SpellOptimizeCollisionBox(pyffi.spells.nif.NifSpell):
             box_shape = self.get_box_shape(branch.shape)
             if box_shape:
                 # it is a box, replace bhkMoppBvTreeShape
-                self.data.replace_global_node(branch, box_shape)
+                self.replacements[branch] = box_shape
                 self.toaster.msg(_("optimized box collision"))
                 self.changed = True
                 self.optimized.append(branch)
             return False # don't recurse farther
         elif (isinstance(branch, NifFormat.bhkRigidBody)
-              and isinstance(branch.shape, NifFormat.bhkNiTriStripsShape)):
+              and isinstance(branch.shape, NifFormat.bhkNiTriStripsShape)
+              and branch.shape not in self.replacements):
             # unpacked collision
             box_shape = self.get_box_shape(branch.shape)
             if box_shape:
                 # it is a box, replace bhkNiTriStripsShape
-                self.data.replace_global_node(branch.shape, box_shape)
+                self.replacements[branch.shape] = box_shape
                 self.toaster.msg(_("optimized box collision"))
                 self.changed = True
                 self.optimized.append(branch)
@@ -917,12 +958,13 @@ class SpellOptimizeCollisionBox(pyffi.spells.nif.NifSpell):
             return False
         elif (isinstance(branch, NifFormat.bhkRigidBody)
               and isinstance(branch.shape,
-                             NifFormat.bhkPackedNiTriStripsShape)):
+                             NifFormat.bhkPackedNiTriStripsShape)
+              and branch.shape not in self.replacements):
             # packed collision without mopp
             box_shape = self.get_box_shape(branch.shape)
             if box_shape:
                 # it's a box, replace bhkPackedNiTriStripsShape
-                self.data.replace_global_node(branch.shape, box_shape)
+                self.replacements[branch.shape] = box_shape
                 self.toaster.msg(_("optimized box collision"))
                 self.changed = True
                 self.optimized.append(branch)
@@ -930,6 +972,10 @@ class SpellOptimizeCollisionBox(pyffi.spells.nif.NifSpell):
         #keep recursing
         return True
 
+    def dataexit(self):
+        # replace all boxes in one go
+        self.data.replace_global_nodes(self.replacements)
+
 class SpellOptimizeCollisionGeometry(pyffi.spells.nif.NifSpell):
     """Optimize collision geometries by removing duplicate vertices."""
 
@@ -942,6 +988,8 @@ class SpellOptimizeCollisionGeometry(pyffi.spells.nif.NifSpell):
         # list of all optimized geometries so far
         # (to avoid optimizing the same geometry twice)
         self.optimized = []
+        # maps branches to None, for removed branches
+        self.replacements = {}
 
     def datainspect(self):
         # only run the spell if there are collisions
@@ -1067,7 +1115,7 @@ class SpellOptimizeCollisionGeometry(pyffi.spells.nif.NifSpell):
             self.optimize_mopp(branch)
             if branch.shape.data.num_vertices < 3:
                 self.toaster.msg(_("less than 3 vertices: removing branch"))
-                self.data.replace_global_node(branch, None)
+                self.replacements[branch] = None
                 self.changed = True
                 return False
             self.optimized.append(branch)
@@ -1083,6 +1131,7 @@ class SpellOptimizeCollisionGeometry(pyffi.spells.nif.NifSpell):
             # unpacked collision: convert to packed
             self.toaster.msg(_("packing collision"))
             new_shape = branch.shape.get_interchangeable_packed_shape()
+            # replace now, branchentry must see the new shape
             self.data.replace_global_node(branch.shape, new_shape)
             # call branchentry again in order to create a mopp for it
             # so we don't append it to self.optimized yet!!
@@ -1101,9 +1150,10 @@ class SpellOptimizeCollisionGeometry(pyffi.spells.nif.NifSpell):
                 return False
             self.toaster.msg(_("adding mopp"))
             mopp = NifFormat.bhkMoppBvTreeShape()
-            shape = branch.shape # store reference before replacing
-            self.data.replace_global_node(branch.shape, mopp)
+            shape = branch.shape
+            # the mopp is not in the tree yet, so its shape is kept
             mopp.shape = shape
+            self.data.replace_global_node(shape, mopp)
             mopp.material = shape.get_sub_shapes()[0].material
             mopp.unknown_8_bytes[0] = 160
             mopp.unknown_8_bytes[1] = 13
@@ -1122,6 +1172,9 @@ class SpellOptimizeCollisionGeometry(pyffi.spells.nif.NifSpell):
             return False
         # keep recursing
         return True
+
+    def dataexit(self):
+        self.data.replace_global_nodes(self.replacements)
         
 class SpellOptimizeAnimation(pyffi.spells.nif.NifSpell):
     """Optimizes animations by removing duplicate keys"""
@@ -0,0 +1,200 @@
+"""Pipelined reading and writing of files for the toaster.
+
+With the ``--pipeline`` option, a toaster running a single job reads,
+toasts, and writes files in three stages that overlap in time:
+
+* a :class:`FilePrefetcher` reads the next files into memory with a
+  pool of threads, for at most ``--read-ahead`` files and
+  ``--read-ahead-mb`` megabytes at once,
+* the toaster parses and toasts each file from memory, and
+* an :class:`AsyncWriter` writes the results to disk in a separate
+  thread, with at most ``--write-behind`` files waiting to be written.
+
+This hides the latency of the disk, which matters in particular for
+files on a network share.
+"""
+
+# --------------------------------------------------------------------------
+# ***** BEGIN LICENSE BLOCK *****
+#
+# Copyright (c) 2007-2012, Python File Format Interface
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#
+#    * Redistributions in binary form must reproduce the above
+#      copyright notice, this list of conditions and the following
+#      disclaimer in the documentation and/or other materials provided
+#      with the distribution.
+#
+#    * Neither the name of the Python File Format Interface
+#      project nor the names of its contributors may be used to endorse
+#      or promote products derived from this software without specific
+#      prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+# ***** END LICENSE BLOCK *****
+# --------------------------------------------------------------------------
+
+from collections import deque
+import concurrent.futures
+import queue
+import sys
+import threading
+
+
+def _read_file(filename):
+    """Return the contents of *filename*."""
+    with open(filename, "rb") as stream:
+        return stream.read()
+
+
+class FilePrefetcher(object):
+    """Read files into memory ahead of when they are needed. Iterating
+    over the prefetcher gives ``(filename, future)`` pairs, in the
+    order of *file_sizes*, where the result of the future is the
+    contents of the file, as ``bytes``.
+
+    :param file_sizes: The names and sizes of the files.
+    :type file_sizes: iterable of ``(str, int)``
+    :param max_files: Maximal number of files read ahead.
+    :type max_files: ``int``
+    :param max_bytes: Maximal number of bytes read ahead; a larger file
+        is read only when no other files are read ahead.
+    :type max_bytes: ``int``
+    :param threads: Number of threads which read the files.
+    :type threads: ``int``
+
+    >>> import os.path, tempfile
+    >>> folder = tempfile.mkdtemp()
+    >>> file_sizes = []
+    >>> for i in range(5):
+    ...     filename = os.path.join(folder, "file%i" % i)
+    ...     with open(filename, "wb") as stream:
+    ...         size = stream.write(b"x" * i)
+    ...     file_sizes.append((filename, size))
+    >>> for filename, future in FilePrefetcher(file_sizes, 2, 5):
+    ...     print(os.path.basename(filename), future.result())
+    file0 b''
+    file1 b'x'
+    file2 b'xx'
+    file3 b'xxx'
+    file4 b'xxxx'
+    >>> import shutil
+    >>> shutil.rmtree(folder)
+    """
+
+    def __init__(self, file_sizes, max_files=16, max_bytes=256 << 20,
+                 threads=4):
+        self.file_sizes = file_sizes
+        self.max_files = max(max_files, 1)
+        self.max_bytes = max_bytes
+        self.threads = max(threads, 1)
+
+    def __iter__(self):
+        file_sizes = iter(self.file_sizes)
+        next_file = next(file_sizes, None)
+        pending = deque()
+        pending_bytes = 0
+        executor = concurrent.futures.ThreadPoolExecutor(self.threads)
+        try:
+            while pending or next_file:
+                # read ahead as far as the budget allows
+                while next_file and (
+                        not pending
+                        or (len(pending) < self.max_files
+                            and pending_bytes + next_file[1]
+                            <= self.max_bytes)):
+                    filename, size = next_file
+                    pending.append(
+                        (filename, size,
+                         executor.submit(_read_file, filename)))
+                    pending_bytes += size
+                    next_file = next(file_sizes, None)
+                filename, size, future = pending.popleft()
+                pending_bytes -= size
+                yield filename, future
+        finally:
+            for filename, size, future in pending:
+                future.cancel()
+            executor.shutdown()
+
+
+class AsyncWriter(object):
+    """Run write jobs in a separate thread, in the order in which they
+    are put. Exceptions raised by jobs are kept, along with the name of
+    the file, until they are retrieved with :meth:`get_errors`.
+
+    :param max_jobs: Maximal number of jobs waiting; :meth:`put` blocks
+        until there is room.
+    :type max_jobs: ``int``
+
+    >>> writer = AsyncWriter(2)
+    >>> written = []
+    >>> writer.put("a", lambda: written.append("a"))
+    >>> writer.put("b", lambda: 1 / 0)
+    >>> writer.close()
+    >>> written
+    ['a']
+    >>> [(filename, exc_info[0].__name__)
+    ...  for filename, exc_info in writer.get_errors()]
+    [('b', 'ZeroDivisionError')]
+    """
+
+    def __init__(self, max_jobs=16):
+        self.jobs = queue.Queue(max(max_jobs, 1))
+        self.errors = []
+        self.errors_lock = threading.Lock()
+        self.thread = threading.Thread(target=self._run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def _run(self):
+        while True:
+            item = self.jobs.get()
+            if item is None:
+                break
+            filename, job = item
+            try:
+                job()
+            except BaseException:
+                with self.errors_lock:
+                    self.errors.append((filename, sys.exc_info()))
+
+    def put(self, filename, job):
+        """Schedule *job*, a function without arguments which writes
+        *filename*.
+        """
+        self.jobs.put((filename, job))
+
+    def close(self):
+        """Wait until all jobs are done, and stop the thread."""
+        self.jobs.put(None)
+        self.thread.join()
+
+    def get_errors(self):
+        """Return, and forget, the file names and exception info of all
+        jobs which failed so far.
+
+        :rtype: ``list`` of ``(str, tuple)``
+        """
+        with self.errors_lock:
+            errors, self.errors = self.errors, []
+        return errors
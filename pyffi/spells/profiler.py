@@ -0,0 +1,281 @@
+"""Profiling of toaster runs.
+
+With the ``--profile FILE`` option, the toaster records for every file
+how much time it took to inspect, read, and write the file, and how
+much time each spell spent in :meth:`~pyffi.spells.Spell.recurse` and
+in :meth:`~pyffi.spells.Spell.branchentry`. For every spell, the time
+spent in :meth:`~pyffi.spells.Spell.branchentry` is also accumulated
+per branch class. When toasting with more than one job, the profiles of
+all worker processes are merged. At the end, the profile is saved as
+JSON to FILE, and a summary is logged.
+
+Spells are only instrumented when profiling, so without ``--profile``
+there is no overhead at all.
+
+>>> profiler = ToasterProfiler()
+>>> with profiler.timed("a.nif", "read"):
+...     pass
+>>> other = ToasterProfiler()
+>>> with other.timed("b.nif", "read"):
+...     pass
+>>> profiler.merge(other.pop_result())
+>>> sorted(profiler.files)
+['a.nif', 'b.nif']
+"""
+
+# --------------------------------------------------------------------------
+# ***** BEGIN LICENSE BLOCK *****
+#
+# Copyright (c) 2007-2012, Python File Format Interface
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#
+#    * Redistributions in binary form must reproduce the above
+#      copyright notice, this list of conditions and the following
+#      disclaimer in the documentation and/or other materials provided
+#      with the distribution.
+#
+#    * Neither the name of the Python File Format Interface
+#      project nor the names of its contributors may be used to endorse
+#      or promote products derived from this software without specific
+#      prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+# ***** END LICENSE BLOCK *****
+# --------------------------------------------------------------------------
+
+from contextlib import contextmanager
+import json
+import threading
+import time
+
+
+class ToasterProfiler(object):
+    """Collect the timings of a toaster."""
+
+    num_files = 20
+    """Number of files listed in the summary."""
+    num_branch_classes = 10
+    """Number of branch classes listed per spell in the summary."""
+
+    def __init__(self):
+        self.files = {}
+        """Maps file name to a ``dict`` which maps stage (``"inspect"``,
+        ``"read"``, ``"write"``) to seconds, and ``"spells"`` to a
+        ``dict`` which maps spell name to a ``dict`` which maps
+        ``"recurse"`` and ``"branchentry"`` to seconds."""
+        self.spells = {}
+        """Maps spell name to a ``dict`` which maps branch class name to
+        the number of calls of branchentry, and the seconds spent in
+        it."""
+        self.groups = {}
+        """Maps the name of every group of spells to the names of its
+        spells. The recurse time of a group includes the recurse times
+        of its spells."""
+        # stages can be timed from the writer thread of the toaster
+        self._lock = threading.Lock()
+
+    def _get_file(self, filename):
+        try:
+            return self.files[filename]
+        except KeyError:
+            stats = self.files[filename] = {"spells": {}}
+            return stats
+
+    def _get_file_spell(self, filename, spellname):
+        spells = self._get_file(filename)["spells"]
+        try:
+            return spells[spellname]
+        except KeyError:
+            stats = spells[spellname] = {"recurse": 0.0, "branchentry": 0.0}
+            return stats
+
+    @contextmanager
+    def timed(self, filename, stage):
+        """Context manager which adds the time spent in its body to
+        *stage* of *filename*.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                stats = self._get_file(filename)
+                stats[stage] = stats.get(stage, 0.0) + elapsed
+
+    def instrument(self, spell, filename):
+        """Time the :meth:`~pyffi.spells.Spell.recurse` and
+        :meth:`~pyffi.spells.Spell.branchentry` calls of *spell*, and of
+        the spells in it if it is a group, for *filename*. Only this
+        instance is changed, not its class.
+        """
+        file_stats = self._get_file_spell(filename, spell.SPELLNAME)
+        recurse = spell.recurse
+        depth = [0]
+
+        def timed_recurse(branch=None):
+            # recurse calls itself: only time the outer call
+            if depth[0]:
+                return recurse(branch)
+            depth[0] += 1
+            start = time.perf_counter()
+            try:
+                return recurse(branch)
+            finally:
+                depth[0] -= 1
+                file_stats["recurse"] += time.perf_counter() - start
+
+        spell.recurse = timed_recurse
+        subspells = getattr(spell, "spells", None)
+        if subspells is not None:
+            # group of spells
+            self.groups[spell.SPELLNAME] = [
+                subspell.SPELLNAME for subspell in subspells]
+            for subspell in subspells:
+                self.instrument(subspell, filename)
+            return
+        branchentry = spell.branchentry
+        branch_stats = self.spells.setdefault(spell.SPELLNAME, {})
+
+        def timed_branchentry(branch):
+            start = time.perf_counter()
+            try:
+                return branchentry(branch)
+            finally:
+                elapsed = time.perf_counter() - start
+                file_stats["branchentry"] += elapsed
+                stats = branch_stats.get(branch.__class__.__name__)
+                if stats is None:
+                    stats = branch_stats[branch.__class__.__name__] = [0, 0.0]
+                stats[0] += 1
+                stats[1] += elapsed
+
+        spell.branchentry = timed_branchentry
+
+    def pop_result(self):
+        """Return, and reset, everything collected so far, to be merged
+        into the profiler of another process with :meth:`merge`.
+        """
+        result = self.files, self.spells, self.groups
+        self.files = {}
+        self.spells = {}
+        self.groups = {}
+        return result
+
+    def merge(self, result):
+        """Merge the result of :meth:`pop_result` of another profiler."""
+        files, spells, groups = result
+        self.groups.update(groups)
+        for filename, stats in files.items():
+            file_stats = self._get_file(filename)
+            for stage, value in stats.items():
+                if stage != "spells":
+                    file_stats[stage] = file_stats.get(stage, 0.0) + value
+            for spellname, spell_stats in stats["spells"].items():
+                file_spell_stats = self._get_file_spell(filename, spellname)
+                for key, value in spell_stats.items():
+                    file_spell_stats[key] += value
+        for spellname, branch_stats in spells.items():
+            all_branch_stats = self.spells.setdefault(spellname, {})
+            for branch_class, (calls, seconds) in branch_stats.items():
+                stats = all_branch_stats.setdefault(branch_class, [0, 0.0])
+                stats[0] += calls
+                stats[1] += seconds
+
+    def _get_group_spells(self):
+        """Names of the spells which are part of a group."""
+        return set(spellname for spellnames in self.groups.values()
+                   for spellname in spellnames)
+
+    def get_file_total(self, stats):
+        """Total time spent on a file: inspect, read, spells, and write.
+        Only the spells which are not part of a group are counted, as
+        the time of a group includes the time of its spells.
+        """
+        group_spells = self._get_group_spells()
+        return (sum(value for stage, value in stats.items()
+                    if stage != "spells")
+                + sum(spell_stats["recurse"]
+                      for spellname, spell_stats in stats["spells"].items()
+                      if spellname not in group_spells))
+
+    def save(self, filename):
+        """Save the profile as JSON."""
+        with open(filename, "w", encoding="utf-8") as stream:
+            json.dump({"files": self.files, "spells": self.spells,
+                       "groups": self.groups},
+                      stream, indent=1, sort_keys=True)
+
+    def get_summary(self):
+        """Summary of the profile as text: the time per stage, the
+        slowest files, and for each spell the slowest branch classes,
+        all sorted by time.
+
+        :rtype: ``str``
+        """
+        lines = []
+        stages = {}
+        spells = {}
+        for stats in self.files.values():
+            for stage, value in stats.items():
+                if stage != "spells":
+                    stages[stage] = stages.get(stage, 0.0) + value
+            for spellname, spell_stats in stats["spells"].items():
+                spells[spellname] = (
+                    spells.get(spellname, 0.0) + spell_stats["recurse"])
+        group_spells = self._get_group_spells()
+
+        def add_spell_lines(spellname, indent):
+            if spellname in self.groups:
+                lines.append("%s%10.3fs spell group %s"
+                             % (indent, spells.get(spellname, 0.0), spellname))
+                # the time of the group includes these
+                for subspellname in self.groups[spellname]:
+                    add_spell_lines(subspellname, indent + "  ")
+            else:
+                lines.append("%s%10.3fs spell %s"
+                             % (indent, spells.get(spellname, 0.0), spellname))
+
+        lines.append("profile of %i files" % len(self.files))
+        lines.append("time per stage:")
+        for stage, value in sorted(
+                stages.items(), key=lambda item: item[1], reverse=True):
+            lines.append("  %10.3fs %s" % (value, stage))
+        for spellname, value in sorted(
+                spells.items(), key=lambda item: item[1], reverse=True):
+            if spellname not in group_spells:
+                add_spell_lines(spellname, "  ")
+        lines.append("slowest files:")
+        for filename, stats in sorted(
+                self.files.items(),
+                key=lambda item: self.get_file_total(item[1]),
+                reverse=True)[:self.num_files]:
+            lines.append("  %10.3fs %s"
+                         % (self.get_file_total(stats), filename))
+        for spellname, branch_stats in sorted(self.spells.items()):
+            lines.append("branchentry of %s:" % spellname)
+            for branch_class, (calls, seconds) in sorted(
+                    branch_stats.items(), key=lambda item: item[1][1],
+                    reverse=True)[:self.num_branch_classes]:
+                lines.append("  %10.3fs %8i calls %s"
+                             % (seconds, calls, branch_class))
+        return "\n".join(lines)
@@ -99,6 +99,48 @@ def walk(top, topdown=True, onerror=None, re_filename=None):
                     yield os.path.join(dirpath, filename)
 
 
+def walk_sizes(top, onerror=None, re_filename=None):
+    """Like :func:`walk`, but generates ``(filename, size)`` pairs. Sizes
+    come from the directory scan itself (see ``os.scandir``), so on
+    most platforms no separate call to ``os.path.getsize`` is needed.
+
+    :param top: The top directory or file.
+    :type top: str
+    :param onerror: Which function to call when an error occurs.
+    :type onerror: function
+    :param re_filename: Regular expression to match file names.
+    :type re_filename: compiled regular expression (see re module)
+    """
+    if os.path.isfile(top):
+        if (not re_filename) or re_filename.match(os.path.basename(top)):
+            yield top, os.path.getsize(top)
+        return
+    try:
+        entries = sorted(os.scandir(top), key=lambda entry: entry.name)
+    except OSError as err:
+        if onerror is not None:
+            onerror(err)
+        return
+    dirpaths = []
+    for entry in entries:
+        if entry.is_dir():
+            # like os.walk, do not follow symbolic links to folders
+            if not entry.is_symlink():
+                dirpaths.append(entry.path)
+        elif (not re_filename) or re_filename.match(entry.name):
+            try:
+                size = entry.stat().st_size
+            except OSError as err:
+                # for instance, a dangling symbolic link
+                if onerror is not None:
+                    onerror(err)
+                continue
+            yield entry.path, size
+    for dirpath in dirpaths:
+        yield from walk_sizes(dirpath, onerror=onerror,
+                              re_filename=re_filename)
+
+
 # table = "."*32
 # for c in [chr(i) for i in range(32,128)]:
 #     table += c
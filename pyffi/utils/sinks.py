@@ -0,0 +1,185 @@
+"""Sinks which write records, that is, dictionaries with the same
+keys, to a file as they come in, so huge numbers of records can be
+written without keeping them in memory.
+
+Values which are not numbers, strings, or ``None``, such as lists and
+dictionaries, are written as json.
+
+>>> import io
+>>> stream = io.StringIO()
+>>> sink = JsonlSink(stream)
+>>> sink.write({"name": "a.nif", "blocks": {"NiNode": 2}})
+>>> print(stream.getvalue().strip())
+{"name": "a.nif", "blocks": {"NiNode": 2}}
+>>> stream = io.StringIO()
+>>> sink = CsvSink(stream)
+>>> sink.write({"name": "a.nif", "blocks": {"NiNode": 2}})
+>>> print(stream.getvalue().strip())
+name,blocks
+a.nif,"{""NiNode"": 2}"
+"""
+
+# ***** BEGIN LICENSE BLOCK *****
+#
+# Copyright (c) 2007-2012, Python File Format Interface
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#
+#    * Redistributions in binary form must reproduce the above
+#      copyright notice, this list of conditions and the following
+#      disclaimer in the documentation and/or other materials provided
+#      with the distribution.
+#
+#    * Neither the name of the Python File Format Interface
+#      project nor the names of its contributors may be used to endorse
+#      or promote products derived from this software without specific
+#      prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+# ***** END LICENSE BLOCK *****
+
+import csv
+import json
+import os.path
+import sqlite3
+
+
+def _flatten(value):
+    """Encode *value* as json, unless it is a number, a string, or
+    ``None``."""
+    if value is None or isinstance(value, (int, float, str)):
+        return value
+    return json.dumps(value, sort_keys=True)
+
+
+class Sink(object):
+    """Base class for sinks. Sinks can be used as context managers,
+    which close them on exit.
+
+    :param stream: The stream to write to.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def write(self, record):
+        """Write a record.
+
+        :param record: The record.
+        :type record: ``dict``
+        """
+        raise NotImplementedError
+
+    def close(self):
+        """Flush all records, and close the stream."""
+        self.stream.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class JsonlSink(Sink):
+    """Write every record as json, on a line of its own."""
+
+    def write(self, record):
+        self.stream.write(json.dumps(record))
+        self.stream.write("\n")
+
+
+class CsvSink(Sink):
+    """Write records as rows of a csv file, with the keys of the
+    first record as header.
+    """
+
+    def __init__(self, stream):
+        Sink.__init__(self, stream)
+        self.writer = None
+
+    def write(self, record):
+        if self.writer is None:
+            self.writer = csv.DictWriter(
+                self.stream, fieldnames=list(record), lineterminator="\n")
+            self.writer.writeheader()
+        self.writer.writerow(
+            dict((key, _flatten(value)) for key, value in record.items()))
+
+
+class SqliteSink(Sink):
+    """Insert records as rows of a table in an sqlite database, with
+    the keys of the first record as columns. The table is created if
+    it does not exist yet.
+
+    :param filename: The file name of the database.
+    :type filename: ``str``
+    :param table: The name of the table.
+    :type table: ``str``
+    :param commit_every: Number of records to insert per transaction.
+    :type commit_every: ``int``
+    """
+
+    def __init__(self, filename, table="records", commit_every=1000):
+        Sink.__init__(self, sqlite3.connect(filename))
+        self.table = table
+        self.commit_every = commit_every
+        self.query = None
+        self.num_pending = 0
+
+    def write(self, record):
+        if self.query is None:
+            columns = ", ".join('"%s"' % key for key in record)
+            self.stream.execute('CREATE TABLE IF NOT EXISTS "%s" (%s)'
+                                % (self.table, columns))
+            self.query = 'INSERT INTO "%s" (%s) VALUES (%s)' % (
+                self.table, columns, ", ".join("?" for key in record))
+        self.stream.execute(
+            self.query, [_flatten(value) for value in record.values()])
+        self.num_pending += 1
+        if self.num_pending >= self.commit_every:
+            self.stream.commit()
+            self.num_pending = 0
+
+    def close(self):
+        self.stream.commit()
+        self.stream.close()
+
+
+def open_sink(filename):
+    """Open a sink for writing records to *filename*, whose type
+    depends on its extension: ``.csv``, ``.jsonl``, or ``.sqlite``
+    (or ``.db``).
+
+    :param filename: The file name.
+    :type filename: ``str``
+    :return: The sink.
+    :rtype: :class:`Sink`
+    """
+    ext = os.path.splitext(filename)[1].lower()
+    if ext == ".csv":
+        return CsvSink(open(filename, "w", newline="", encoding="utf-8"))
+    elif ext in (".jsonl", ".json"):
+        return JsonlSink(open(filename, "w", encoding="utf-8"))
+    elif ext in (".sqlite", ".db"):
+        return SqliteSink(filename)
+    else:
+        raise ValueError("Unknown sink file type '%s'." % ext)
@@ -0,0 +1,87 @@
+#!/usr/bin/python3
+
+"""Build the cache of the parsed xml file of every file format, so the
+formats import faster (see :mod:`pyffi.object_models.xml.cache`).
+
+By default, the cache files are saved next to the xml files, which is
+useful after installing pyffi. Use --user to save them in the user
+cache directory instead.
+"""
+
+# ***** BEGIN LICENSE BLOCK *****
+#
+# Copyright (c) 2007-2012, Python File Format Interface
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#
+#    * Redistributions in binary form must reproduce the above
+#      copyright notice, this list of conditions and the following
+#      disclaimer in the documentation and/or other materials provided
+#      with the distribution.
+#
+#    * Neither the name of the Python File Format Interface
+#      project nor the names of its contributors may be used to endorse
+#      or promote products derived from this software without specific
+#      prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+# ***** END LICENSE BLOCK *****
+
+import argparse
+import importlib
+import logging
+
+from pyffi.object_models.xml.cache import SchemaCache
+
+FORMATS = ["bsa", "cgf", "dds", "egm", "egt", "esp", "kfm", "nif",
+           "psk", "rockstar.dir_", "tga", "tri"]
+
+# configuration options
+
+parser = argparse.ArgumentParser(description=__doc__)
+parser.add_argument(
+    'formats', metavar="FORMAT", type=str, nargs="*",
+    help="only build the cache of these formats (default: all formats)")
+group = parser.add_mutually_exclusive_group()
+group.add_argument(
+    '--user', action="store_true",
+    help="save cache files in the user cache directory")
+group.add_argument(
+    '--dir', type=str,
+    help="save cache files in this directory")
+args = parser.parse_args()
+
+# actual script
+
+# report which cache files are saved
+logger = logging.getLogger("pyffi.object_models.xml.cache")
+logger.setLevel(logging.DEBUG)
+logger.addHandler(logging.StreamHandler())
+
+SchemaCache.refresh = True
+SchemaCache.autosave = True
+if args.dir:
+    SchemaCache.directory = args.dir
+else:
+    SchemaCache.directory = None
+    SchemaCache.save_next_to_xml = not args.user
+for name in (args.formats or FORMATS):
+    importlib.import_module("pyffi.formats." + name)
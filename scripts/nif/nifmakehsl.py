@@ -223,6 +223,8 @@ def write_struct(cls, ver, hsl_types, f, template):
     f.write('};\n\n')
 
 if __name__ == '__main__':
+    # all types are needed
+    NifFormat.create_all_classes()
     # list all types used as a template
     templates = find_templates()
     # write out hex structure library for each nif version
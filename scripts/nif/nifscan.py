@@ -0,0 +1,82 @@
+#!/usr/bin/python3
+
+"""Scan the headers of all nif files in one or more folders, and write
+version, block types, block sizes, and strings of each file to a csv,
+jsonl, or sqlite file. This is much faster than reading the files, and
+helps to decide which spells to run on which files.
+"""
+
+# ***** BEGIN LICENSE BLOCK *****
+#
+# Copyright (c) 2007-2012, NIF File Format Library and Tools
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#
+#    * Redistributions in binary form must reproduce the above
+#      copyright notice, this list of conditions and the following
+#      disclaimer in the documentation and/or other materials provided
+#      with the distribution.
+#
+#    * Neither the name of the NIF File Format Library and Tools
+#      project nor the names of its contributors may be used to endorse
+#      or promote products derived from this software without specific
+#      prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS
+# FOR A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE
+# COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING,
+# BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER
+# CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+# ***** END LICENSE BLOCK *****
+
+import argparse
+import sys
+
+from pyffi.formats.nif import NifFormat
+import pyffi.utils
+from pyffi.utils.sinks import JsonlSink, open_sink
+
+# configuration options
+
+parser = argparse.ArgumentParser(description=__doc__)
+parser.add_argument(
+    'folders', metavar="FOLDER", type=str, nargs="+",
+    help="folders (or files) to scan")
+parser.add_argument(
+    '-o', '--output', type=str,
+    help="file to write the records to, with extension .csv, .jsonl,"
+    " or .sqlite (default: jsonl to standard output)")
+parser.add_argument(
+    '-j', '--jobs', type=int, default=1,
+    help="number of processes")
+args = parser.parse_args()
+
+# actual script
+
+def walk():
+    for top in args.folders:
+        for filename in pyffi.utils.walk(
+                top, re_filename=NifFormat.RE_FILENAME):
+            yield filename
+
+sink = open_sink(args.output) if args.output else JsonlSink(sys.stdout)
+try:
+    for record in NifFormat.scan_headers(walk(), jobs=args.jobs):
+        sink.write(record)
+finally:
+    if args.output:
+        sink.close()
@@ -59,6 +59,7 @@ PACKAGE_DATA = {'': ['*.xml', '*.xsd', '*.dll', '*.exe'],
                 'pyffi': ['VERSION'],
                 }
 SCRIPTS = ['scripts/nif/nifmakehsl.py',
+           'scripts/nif/nifscan.py',
            'scripts/nif/niftoaster.py',
            'scripts/cgf/cgftoaster.py',
            'scripts/kfm/kfmtoaster.py',
@@ -66,7 +67,8 @@ SCRIPTS = ['scripts/nif/nifmakehsl.py',
            'scripts/rockstar_unpack_dir_img.py',
            'scripts/patch_recursive_make.py',
            'scripts/patch_recursive_apply.py',
-           'scripts/qskope.py']
+           'scripts/qskope.py',
+           'scripts/build_xml_cache.py']
 AUTHOR = "Niftools Developers"
 AUTHOR_EMAIL = "info@niftools.org"
 LICENSE = "BSD"
@@ -0,0 +1,44 @@
+import unittest
+
+from nose.tools import assert_equals, assert_not_equal, assert_true
+
+from pyffi.formats.nif import NifFormat
+
+
+class TestFingerprint(unittest.TestCase):
+    """Regression tests for NifFormat.NiObject.get_fingerprint"""
+
+    def test_material(self):
+        mat1 = NifFormat.NiMaterialProperty()
+        mat1.name = b"Red"
+        mat2 = NifFormat.NiMaterialProperty()
+        mat2.name = b"Other Red"
+        assert_true(mat1.is_interchangeable(mat2))
+        assert_equals(mat1.get_fingerprint(), mat2.get_fingerprint())
+        mat2.glossiness = 2.0
+        assert_not_equal(mat1.get_fingerprint(), mat2.get_fingerprint())
+        # names of special materials are not ignored
+        mat2.glossiness = mat1.glossiness
+        mat2.name = b"skin"
+        assert_not_equal(mat1.get_fingerprint(), mat2.get_fingerprint())
+
+    def test_geometry(self):
+        data1 = NifFormat.NiTriShapeData()
+        data1.num_vertices = 3
+        data1.has_vertices = True
+        data1.vertices.update_size()
+        for i, vertex in enumerate(data1.vertices):
+            vertex.x = i
+        data1.set_triangles([(0, 1, 2)])
+        data2 = NifFormat.NiTriShapeData()
+        data2.num_vertices = 3
+        data2.has_vertices = True
+        data2.vertices.update_size()
+        for i, vertex in enumerate(reversed(data2.vertices)):
+            vertex.x = i
+        data2.set_triangles([(2, 1, 0)])
+        assert_true(data1.is_interchangeable(data2))
+        assert_equals(data1.get_fingerprint(), data2.get_fingerprint())
+
+    def test_no_fingerprint(self):
+        assert_true(NifFormat.NiNode().get_fingerprint() is None)
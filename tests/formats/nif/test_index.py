@@ -0,0 +1,56 @@
+import io
+import unittest
+
+from nose.tools import assert_equals, assert_true
+
+from pyffi.formats.nif import NifFormat
+
+from tests.utils import create_nif_data, write_nif
+
+
+class TestIndex(unittest.TestCase):
+    """Regression tests for the block indices of NifFormat.Data"""
+
+    def setUp(self):
+        shape = NifFormat.NiTriShape()
+        shape.data = NifFormat.NiTriShapeData()
+        self.data = NifFormat.Data()
+        self.data.read(io.BytesIO(write_nif(create_nif_data(shape))))
+
+    def test_blocks_of_type(self):
+        root, = self.data.roots
+        assert_equals(len(self.data.blocks_of_type(NifFormat.NiNode)), 4)
+        assert_equals(
+            self.data.blocks_of_type(NifFormat.NiAVObject),
+            [block for block in self.data.blocks
+             if isinstance(block, NifFormat.NiAVObject)])
+        assert_equals(self.data.blocks_of_type(NifFormat.NiTriStrips), [])
+        # changes are only seen after updating the blocks
+        root.children[0].add_child(NifFormat.NiTriStrips())
+        assert_equals(self.data.blocks_of_type(NifFormat.NiTriStrips), [])
+        self.data.update_blocks()
+        assert_equals(len(self.data.blocks_of_type(NifFormat.NiTriStrips)), 1)
+
+    def test_parents_of(self):
+        root, = self.data.roots
+        shape = root.children[0].children[0]
+        assert_equals(self.data.parents_of(shape), list(root.children))
+        assert_equals(self.data.parents_of(shape.data), [shape])
+        assert_equals(self.data.parents_of(root), [])
+
+    def test_tree_unique(self):
+        root, = self.data.roots
+        assert_equals(len(list(root.tree())), 10)
+        assert_equals(list(root.tree(unique=True)), self.data.blocks)
+        assert_equals(
+            list(root.tree(block_type=NifFormat.NiTriShape, unique=True)),
+            [root.children[0].children[0]])
+
+    def test_find(self):
+        root, = self.data.roots
+        shape = root.children[0].children[0]
+        assert_true(root.find(block_type=NifFormat.NiTriShapeData)
+                    is shape.data)
+        assert_equals(root.find_chain(shape.data),
+                      [root, root.children[0], shape, shape.data])
+        assert_equals(root.children[1].find_chain(root), [])
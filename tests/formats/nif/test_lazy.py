@@ -0,0 +1,64 @@
+import io
+import unittest
+
+from nose.tools import assert_equals, assert_true, assert_false
+
+from pyffi.formats.nif import NifFormat
+
+from tests.utils import get_nif_file, write_nif
+
+
+class TestLazy(unittest.TestCase):
+    """Regression tests for reading NifFormat.Data with lazy set"""
+
+    def setUp(self):
+        with open(get_nif_file("test_check_tangentspace2.nif"), "rb") as stream:
+            self.raw = stream.read()
+        self.data = NifFormat.Data()
+        self.data.read(io.BytesIO(self.raw))
+
+    def test_roots_only(self):
+        data = NifFormat.Data()
+        data.read(io.BytesIO(self.raw), lazy=True)
+        assert_equals(len(data.roots), 1)
+        assert_equals(len(data.blocks), len(self.data.blocks))
+        assert_equals(list(data._block_dct), [0])
+
+    def test_blocks(self):
+        data = NifFormat.Data()
+        data.read(io.BytesIO(self.raw), lazy=True)
+        assert_equals([block.__class__ for block in data.blocks],
+                      [block.__class__ for block in self.data.blocks])
+        assert_true(data.get_block(1) is data.roots[0].children[0])
+        assert_true(data.blocks[-1] is data.get_block(5))
+
+    def test_blocks_of_type(self):
+        data = NifFormat.Data()
+        data.read(io.BytesIO(self.raw), lazy=True)
+        geomdata, = data.blocks_of_type(NifFormat.NiGeometryData)
+        assert_true(isinstance(geomdata, NifFormat.NiTriStripsData))
+        assert_equals(sorted(data._block_dct), [0, 5])
+        assert_equals(geomdata.num_vertices,
+                      self.data.blocks[5].num_vertices)
+        assert_equals(self.data.blocks_of_type(NifFormat.NiGeometryData),
+                      [self.data.blocks[5]])
+
+    def test_links(self):
+        data = NifFormat.Data()
+        data.read(io.BytesIO(self.raw), lazy=True)
+        geom = data.roots[0].children[0]
+        assert_false(5 in data._block_dct)
+        assert_true(geom.data is data.get_block(5))
+
+    def test_write(self):
+        data = NifFormat.Data()
+        data.read(io.BytesIO(self.raw), lazy=True)
+        assert_equals(write_nif(data), write_nif(self.data))
+
+    def test_old_version(self):
+        # no block sizes, so blocks are read immediately
+        with open(get_nif_file("test_fix_tangentspace.nif"), "rb") as stream:
+            data = NifFormat.Data()
+            data.read(stream, lazy=True)
+        assert_true(data._lazy is None)
+        assert_true(isinstance(data.blocks, list))
@@ -0,0 +1,42 @@
+import io
+import unittest
+
+from nose.tools import assert_equals, assert_true
+
+from pyffi.formats.nif import NifFormat
+
+from tests.utils import create_nif_data, write_nif
+
+
+class TestLinks(unittest.TestCase):
+    """Regression tests for fixing links in NifFormat.Data.read"""
+
+    def setUp(self):
+        data = create_nif_data()
+        root, = data.roots
+        for child in root.children:
+            child.add_child(NifFormat.NiNode())
+        # shared child
+        root.children[0].add_child(root.children[1].children[0])
+        self.raw = write_nif(data)
+
+    def test_links(self):
+        for kwargs in ({}, {"lazy": True}):
+            data = NifFormat.Data()
+            data.read(io.BytesIO(self.raw), **kwargs)
+            root, = data.roots
+            assert_equals(len(root.children), 3)
+            assert_equals(len(root.children[0].children), 2)
+            assert_true(root.children[0].children[1]
+                        is root.children[1].children[0])
+            assert_equals(data._link_stack, [])
+
+    def test_dangling_link(self):
+        # the footer ends with the index of the root block
+        raw = self.raw[:-4] + b"\x20\x00\x00\x00"
+        for kwargs in ({}, {"lazy": True}):
+            data = NifFormat.Data()
+            with self.assertRaises(KeyError) as context:
+                data.read(io.BytesIO(raw), **kwargs)
+            assert_equals(context.exception.args,
+                          ("dangling link to block 32 in Footer",))
@@ -0,0 +1,23 @@
+import pickle
+import unittest
+
+from nose.tools import assert_equals, assert_true
+
+from pyffi.formats.nif import NifFormat
+
+from tests.utils import get_nif_file, read_write_nif, write_nif
+
+
+class TestPickle(unittest.TestCase):
+    """Regression tests for pickling NifFormat.Data and its blocks"""
+
+    def setUp(self):
+        self.data, self.raw = read_write_nif(
+            get_nif_file("test_check_tangentspace2.nif"))
+
+    def test_pickle(self):
+        data = pickle.loads(pickle.dumps(self.data))
+        assert_equals(write_nif(data), self.raw)
+        block = pickle.loads(pickle.dumps(self.data.blocks[5]))
+        assert_true(block.__class__ is NifFormat.NiTriStripsData)
+        assert_equals(list(block.vertices), list(self.data.blocks[5].vertices))
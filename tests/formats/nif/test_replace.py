@@ -0,0 +1,89 @@
+import unittest
+
+from nose.tools import assert_equals, assert_true
+
+from pyffi.formats.nif import NifFormat
+
+from tests.utils import create_nif_data
+
+
+class TestReplace(unittest.TestCase):
+    """Regression tests for replacing blocks in NifFormat.Data"""
+
+    def setUp(self):
+        self.shape = NifFormat.NiTriShape()
+        self.shape.data = NifFormat.NiTriShapeData()
+        self.prop = NifFormat.NiMaterialProperty()
+        self.shape.add_property(self.prop)
+        self.data = create_nif_data(self.shape)
+        self.root, = self.data.roots
+        for child in self.root.children:
+            child.add_property(self.prop)
+
+    def test_replace_global_node(self):
+        shape = NifFormat.NiTriShape()
+        self.data.replace_global_node(self.shape, shape)
+        for child in self.root.children:
+            assert_true(child.children[0] is shape)
+        # the old block keeps its links
+        assert_true(self.shape.properties[0] is self.prop)
+
+    def test_replace_global_nodes(self):
+        shape = NifFormat.NiTriShape()
+        prop = NifFormat.NiMaterialProperty()
+        root = NifFormat.NiNode()
+        self.data.replace_global_nodes(
+            {self.shape: shape, self.prop: prop, self.root: root})
+        assert_equals(self.data.roots, [root])
+        for child in self.root.children:
+            assert_true(child.children[0] is shape)
+            assert_true(child.properties[0] is prop)
+        assert_true(self.shape.properties[0] is prop)
+
+    def test_replace_by_none(self):
+        self.data.replace_global_node(self.prop, None)
+        for child in self.root.children:
+            assert_true(child.properties[0] is None)
+        assert_true(self.shape.properties[0] is None)
+
+    def test_replacement_not_searched(self):
+        # the tree of the replacement is left alone
+        node = NifFormat.NiNode()
+        node.add_child(self.shape)
+        self.data.replace_global_node(self.shape, node)
+        assert_true(node.children[0] is self.shape)
+        assert_true(self.root.children[0].children[0] is node)
+
+    def test_index_updated(self):
+        # the index follows replacements, and indexes new blocks
+        node = NifFormat.NiNode()
+        node.add_child(self.shape)
+        self.data.replace_global_node(self.shape, node)
+        assert_equals(self.data.parents_of(node), list(self.root.children))
+        assert_equals(self.data.parents_of(self.shape), [node])
+        prop = NifFormat.NiMaterialProperty()
+        self.data.replace_global_node(self.prop, prop)
+        assert_true(self.shape.properties[0] is prop)
+        assert_equals(self.data.parents_of(self.prop), [])
+
+    def test_direct_edits(self):
+        # links changed directly after a replacement are still replaced
+        self.data.replace_global_node(self.prop, NifFormat.NiMaterialProperty())
+        node = NifFormat.NiNode()
+        self.shape.add_property(self.prop)
+        self.root.add_child(node)
+        other = NifFormat.NiNode()
+        self.data.replace_global_node(node, other)
+        assert_true(self.root.children[-1] is other)
+        self.data.replace_global_node(self.prop, None)
+        assert_true(self.shape.properties[-1] is None)
+
+    def test_struct_replace_global_node(self):
+        # links are still replaced throughout the tree of a link
+        interpolator = NifFormat.NiTransformInterpolator()
+        interpolator.data = NifFormat.NiTransformData()
+        controlled_block = NifFormat.ControllerLink()
+        controlled_block.interpolator = interpolator
+        controlled_block.replace_global_node(interpolator.data, None)
+        assert_true(controlled_block.interpolator is interpolator)
+        assert_true(interpolator.data is None)
@@ -0,0 +1,84 @@
+import glob
+import os.path
+import sqlite3
+import tempfile
+import unittest
+
+from nose.tools import assert_equals, assert_true
+
+from pyffi.formats.nif import NifFormat
+from pyffi.utils.sinks import open_sink
+
+from tests.utils import get_nif_file
+
+
+class TestScanHeaders(unittest.TestCase):
+    """Regression tests for NifFormat.scan_headers"""
+
+    def setUp(self):
+        self.files = sorted(glob.glob(get_nif_file("*.nif")))
+
+    def test_same_as_inspect(self):
+        assert_true(self.files)
+        for record in NifFormat.scan_headers(self.files):
+            data = NifFormat.Data()
+            try:
+                with open(record["filename"], "rb") as stream:
+                    data.inspect(stream)
+            except ValueError:
+                assert_true(record["error"])
+                continue
+            assert_equals(record["error"], None)
+            assert_equals(record["version"], data.version)
+            assert_equals(record["user_version"], data.user_version)
+            assert_equals(record["modification"], data.modification)
+            header = data.header
+            if data.version >= 0x0A000100:
+                assert_equals(record["num_blocks"], header.num_blocks)
+                assert_equals(sum(record["block_types"].values()),
+                              header.num_blocks)
+            if data.version >= 0x14020007:
+                assert_equals(record["block_sizes"], list(header.block_size))
+            if data.version >= 0x14010003:
+                assert_equals(
+                    record["strings"],
+                    [s.decode("latin-1") for s in header.strings])
+
+    def test_scan_version(self):
+        for filename in self.files:
+            data = NifFormat.Data()
+            with open(filename, "rb") as stream:
+                try:
+                    data.inspect_version_only(stream)
+                except ValueError:
+                    continue
+                assert_equals(stream.tell(), 0)
+                assert_equals(
+                    NifFormat.scan_version(stream),
+                    (data.version, data.user_version, data.user_version_2,
+                     data.modification, data._byte_order))
+                assert_equals(stream.tell(), 0)
+
+    def test_jobs(self):
+        assert_equals(list(NifFormat.scan_headers(self.files, jobs=2)),
+                      list(NifFormat.scan_headers(self.files)))
+
+    def test_error(self):
+        record, = NifFormat.scan_headers([__file__])
+        assert_equals(record["filename"], __file__)
+        assert_equals(record["error"], "Not a NIF file.")
+
+    def test_sqlite(self):
+        directory = tempfile.mkdtemp()
+        filename = os.path.join(directory, "headers.sqlite")
+        try:
+            with open_sink(filename) as sink:
+                for record in NifFormat.scan_headers(self.files):
+                    sink.write(record)
+            db = sqlite3.connect(filename)
+            count, = db.execute("SELECT COUNT(*) FROM records").fetchone()
+            db.close()
+            assert_equals(count, len(self.files))
+        finally:
+            os.remove(filename)
+            os.rmdir(directory)
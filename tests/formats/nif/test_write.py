@@ -0,0 +1,125 @@
+import io
+import unittest
+
+from nose.tools import assert_equals, assert_true
+
+from pyffi.formats.nif import NifFormat
+
+from tests.utils import create_nif_data, write_nif
+
+
+class TestWrite(unittest.TestCase):
+    """Regression tests for NifFormat.Data.write"""
+
+    def setUp(self):
+        shared = NifFormat.NiNode()
+        shared.name = b"Shared"
+        self.data = create_nif_data(shared)
+        root, = self.data.roots
+        root.name = b"Scene Root"
+        for i, child in enumerate(root.children):
+            child.name = ("Child %i" % (2 - i)).encode("ascii")
+
+    def test_block_list(self):
+        stream = io.BytesIO()
+        self.data.write(stream)
+        assert_equals(len(self.data.blocks), 5)
+        assert_equals(len(set(self.data.blocks)), 5)
+        assert_equals(list(self.data.header.block_types), [b"NiNode"])
+        data = NifFormat.Data()
+        stream.seek(0)
+        data.read(stream)
+        root, = data.roots
+        assert_true(root.children[0].children[0]
+                    is root.children[2].children[0])
+
+    def test_string_order(self):
+        stream = io.BytesIO()
+        self.data.write(stream)
+        # each string once, in the order in which the blocks are written
+        assert_equals(
+            list(self.data.header.strings),
+            [b"Scene Root", b"Child 2", b"Shared", b"Child 1", b"Child 0"])
+        # writing again gives exactly the same file
+        assert_equals(write_nif(self.data), stream.getvalue())
+
+    def test_block_sizes(self):
+        stream = io.BytesIO()
+        self.data.write(stream)
+        assert_equals(
+            list(self.data.header.block_size),
+            [block.get_size(self.data) for block in self.data.blocks])
+        # the header in the file has the final block sizes
+        data = NifFormat.Data()
+        stream.seek(0)
+        data.inspect(stream)
+        assert_equals(list(data.header.block_size),
+                      list(self.data.header.block_size))
+
+    def test_write_changes(self):
+        for kwargs in ({}, {"lazy": True}):
+            raw = bytearray(write_nif(self.data))
+            instream = io.BytesIO(raw)
+            data = NifFormat.Data()
+            data.read(instream, **kwargs)
+            node = data.roots[0].children[1]
+            node.translation.x = 2.0
+            node.name = b"Shared"
+            data.mark_dirty(node)
+            assert_true(data.write_changes(instream))
+            assert_equals(len(instream.getvalue()), len(raw))
+            instream.seek(0)
+            data = NifFormat.Data()
+            data.read(instream)
+            node = data.roots[0].children[1]
+            assert_equals(node.translation.x, 2.0)
+            assert_equals(node.name, b"Shared")
+            assert_true(node.children[0] is data.roots[0].children[0].children[0])
+
+    def test_write_changes_unmarked(self):
+        raw = write_nif(self.data)
+        data = NifFormat.Data()
+        data.read(io.BytesIO(raw))
+        data.roots[0].children[1].translation.x = 2.0
+        assert_true(not data.is_dirty())
+        instream = io.BytesIO(raw)
+        assert_true(not data.write_changes(instream))
+        assert_equals(instream.getvalue(), raw)
+
+    def test_write_changes_size(self):
+        raw = write_nif(self.data)
+        data = NifFormat.Data()
+        data.read(io.BytesIO(raw))
+        # a new string is not in the header
+        data.roots[0].name = b"New Root"
+        data.mark_dirty(data.roots[0])
+        instream = io.BytesIO(raw)
+        assert_true(not data.write_changes(instream))
+        assert_equals(instream.getvalue(), raw)
+        # more children: the block size changes
+        data.roots[0].name = b"Scene Root"
+        data.roots[0].add_child(NifFormat.NiNode())
+        assert_true(not data.write_changes(instream))
+        assert_equals(instream.getvalue(), raw)
+
+    def test_write_changes_failed(self):
+        raw = write_nif(self.data)
+        data = NifFormat.Data()
+        data.read(io.BytesIO(raw))
+        for node in data.roots[0].children:
+            node.translation.x = 2.0
+            data.mark_dirty(node)
+
+        class FailingStream(io.BytesIO):
+            """Fails on the second write."""
+            writes = 0
+
+            def write(self, buf):
+                FailingStream.writes += 1
+                if FailingStream.writes == 2:
+                    raise IOError("disk full")
+                return io.BytesIO.write(self, buf)
+
+        instream = FailingStream(raw)
+        self.assertRaises(IOError, data.write_changes, instream)
+        assert_equals(instream.getvalue(), raw)
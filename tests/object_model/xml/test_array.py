@@ -0,0 +1,191 @@
+import glob
+import io
+import struct
+import unittest
+
+from nose.tools import assert_equals, assert_true
+
+from pyffi.formats.nif import NifFormat
+from pyffi.object_models import FileFormat
+from pyffi.object_models.common import Float, UShort, ULittle32
+from pyffi.object_models.xml.array import Array, _get_packed_layout
+from pyffi.object_models.xml.expression import Expression
+
+from tests.utils import get_nif_file, read_write_nif
+
+
+class Parent(object):
+    num = 3
+    nums = [2, 0, 1]
+
+
+class TestBulkArray(unittest.TestCase):
+
+    def setUp(self):
+        self.data = FileFormat.Data()
+        self.parent = Parent()
+
+    def make_array(self, element_type, count2=None):
+        return Array(element_type=element_type,
+                     count1=Expression('num'),
+                     count2=Expression(count2) if count2 else None,
+                     parent=self.parent)
+
+    def test_read_write(self):
+        for element_type in (UShort, Float, ULittle32):
+            arr = self.make_array(element_type)
+            values = [1, 2, 3]
+            stream = io.BytesIO(struct.pack(
+                "<3" + ("f" if element_type is Float else element_type._struct),
+                *values))
+            arr.read(stream, self.data)
+            assert_equals(list(arr), values)
+            assert_true(all(type(elem) is element_type
+                            for elem in list.__iter__(arr)))
+            arr[1] = 7
+            out = io.BytesIO()
+            arr.write(out, self.data)
+            stream.seek(0)
+            arr.read(io.BytesIO(out.getvalue()), self.data)
+            assert_equals(list(arr), [1, 7, 3])
+
+    def test_read_write_2d(self):
+        arr = self.make_array(UShort, count2='nums')
+        stream = io.BytesIO(struct.pack("<3H", 4, 5, 6))
+        arr.read(stream, self.data)
+        assert_equals([list(row) for row in arr], [[4, 5], [], [6]])
+        out = io.BytesIO()
+        arr.write(out, self.data)
+        assert_equals(out.getvalue(), stream.getvalue())
+
+    def test_write_float_overflow(self):
+        arr = self.make_array(Float)
+        arr.update_size()
+        arr[0] = 1e300
+        out = io.BytesIO()
+        arr.write(out, self.data)
+        assert_equals(out.getvalue(),
+                      struct.pack("<Iff", 0x7fc00000, 0, 0))
+
+
+class TestPackedArray(unittest.TestCase):
+
+    def setUp(self):
+        Array.use_packed = True
+        self.data = FileFormat.Data()
+        self.parent = Parent()
+        self.values = [1.5, 2, 3, 4, 5, 6.25, 7, 8, 9]
+        self.stream = io.BytesIO(struct.pack("<9f", *self.values))
+
+    def tearDown(self):
+        Array.use_packed = False
+
+    def make_array(self, count2=None):
+        return Array(element_type=NifFormat.Vector3,
+                     count1=Expression('num'),
+                     count2=Expression(count2) if count2 else None,
+                     parent=self.parent)
+
+    def test_layout(self):
+        assert_equals(_get_packed_layout(NifFormat.Vector3).typecode, 'f')
+        assert_equals(_get_packed_layout(NifFormat.Triangle).typecode, 'H')
+        assert_equals(_get_packed_layout(NifFormat.SkinPartition), None)
+
+    def test_read_write(self):
+        arr = self.make_array()
+        arr.read(self.stream, self.data)
+        assert_true(arr._buffer is not None)
+        assert_equals(list.__getitem__(arr, 1), None)
+        assert_equals(arr[1].as_list(), [4, 5, 6.25])
+        assert_equals(arr[-1].z, 9)
+        assert_equals(len(list(arr)), 3)
+        assert_equals(arr.get_size(self.data), 36)
+        arr[0].x = 10
+        out = io.BytesIO()
+        arr.write(out, self.data)
+        assert_equals(out.getvalue(),
+                      struct.pack("<9f", 10, *self.values[1:]))
+
+    def test_read_write_2d(self):
+        arr = self.make_array(count2='nums')
+        arr.read(self.stream, self.data)
+        assert_equals([[vec.as_list() for vec in row] for row in arr],
+                      [[[1.5, 2, 3], [4, 5, 6.25]], [], [[7, 8, 9]]])
+        arr[2][0].y = -1
+        out = io.BytesIO()
+        arr.write(out, self.data)
+        assert_equals(out.getvalue(),
+                      struct.pack("<9f", *(self.values[:7] + [-1, 9])))
+
+    def test_big_endian(self):
+        self.data._byte_order = '>'
+        arr = self.make_array()
+        stream = io.BytesIO(struct.pack(">9f", *self.values))
+        arr.read(stream, self.data)
+        assert_equals(arr[0].x, 1.5)
+        out = io.BytesIO()
+        arr.write(out, self.data)
+        assert_equals(out.getvalue(), stream.getvalue())
+
+    def test_as_array(self):
+        arr = self.make_array()
+        arr.read(self.stream, self.data)
+        vec = arr[1]
+        vec.x = 0
+        values = arr.as_array()
+        if hasattr(values, "shape"):
+            assert_equals(values.shape, (3, 3))
+            values[1, 1] = 20
+        else:
+            values[4] = 20
+        assert_equals(arr[1].as_list(), [0, 20, 6.25])
+        # the element which was accessed before is kept
+        assert_true(arr[1] is vec)
+        vec.z = 30
+        out = io.BytesIO()
+        arr.write(out, self.data)
+        assert_equals(struct.unpack("<9f", out.getvalue())[3:6],
+                      (0, 20, 30))
+
+    def test_change_elements(self):
+        arr = self.make_array()
+        arr.read(self.stream, self.data)
+        vec = arr[0]
+        arr.append(NifFormat.Vector3())
+        assert_true(arr._buffer is None)
+        assert_true(arr[0] is vec)
+        del arr[1]
+        assert_equals([vec.as_list() for vec in arr],
+                      [[1.5, 2, 3], [7, 8, 9], [0, 0, 0]])
+
+    def test_update_size(self):
+        arr = self.make_array()
+        arr.read(self.stream, self.data)
+        arr.update_size()
+        assert_true(arr._buffer is not None)
+        self.parent.num = 4
+        try:
+            arr.update_size()
+        finally:
+            del self.parent.num
+        assert_true(arr._buffer is None)
+        assert_equals([vec.as_list() for vec in arr][2:],
+                      [[7, 8, 9], [0, 0, 0]])
+
+    def test_nif_files(self):
+        filenames = glob.glob(get_nif_file("test_opt_*.nif"))
+        assert_true(filenames)
+        for filename in filenames:
+            results = []
+            for use_packed in (False, True):
+                Array.use_packed = use_packed
+                try:
+                    data, result = read_write_nif(filename)
+                except struct.error:
+                    # some test files cannot be read at all
+                    if not use_packed:
+                        break
+                    raise
+                results.append(result)
+            else:
+                assert_equals(results[0], results[1])
@@ -0,0 +1,129 @@
+import os.path
+import shutil
+import tempfile
+import unittest
+
+from nose.tools import assert_equals, assert_true
+
+import pyffi.object_models.common
+import pyffi.object_models.xml
+from pyffi.object_models.xml.cache import SchemaCache
+
+XML = b"""<?xml version="1.0" encoding="UTF-8"?>
+<fileformat version="1.0">
+    <version num="1.0">Some Game</version>
+    <basic name="Int">A signed 32-bit integer.</basic>
+    <enum name="Kind" storage="Int">
+        <option value="0" name="Zero" />
+        <option value="2" name="Two" />
+    </enum>
+    <struct name="Example">
+        <add name="Kind" type="Kind" />
+        <add name="Num Integers" type="Int" />
+        <add name="Integers" type="Int" arr1="Num Integers" />
+        <add name="Other" type="Other" cond="Kind == 2" />
+    </struct>
+    <struct name="Other">
+        <add name="Value" type="Int" default="5" />
+    </struct>
+</fileformat>
+"""
+
+
+class TestSchemaCache(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        with open(os.path.join(self.folder, "simple.xml"), "wb") as stream:
+            stream.write(XML)
+        SchemaCache.directory = self.folder
+        SchemaCache.autosave = True
+
+    def tearDown(self):
+        SchemaCache.directory = os.getenv("PYFFI_XML_CACHE_DIR")
+        SchemaCache.autosave = bool(os.getenv("PYFFI_XML_CACHE_SAVE"))
+        shutil.rmtree(self.folder)
+
+    def create_format(self, lazy=False, no_dict=()):
+        class SimpleFormat(pyffi.object_models.xml.FileFormat):
+            xml_file_name = "simple.xml"
+            xml_file_path = [self.folder]
+            xml_lazy = lazy
+            xml_no_dict_classes = frozenset(no_dict)
+            Int = pyffi.object_models.common.Int
+
+            class Example:
+                def get_double(self):
+                    return 2 * self.other.value
+        return SimpleFormat
+
+    def check_format(self, fmt):
+        assert_equals(fmt.games, {"Some Game": [0]})
+        assert_equals(fmt.Kind._enumkeys, ["Zero", "Two"])
+        example = fmt.Example()
+        example.kind = 2
+        assert_equals(example.other.value, 5)
+        assert_equals(example.get_double(), 10)
+        assert_true(fmt.Example._attrs[-1].type_ is fmt.Other)
+        assert_equals(fmt.Example._attrs[-1].cond.eval(example), True)
+
+    def test_cache(self):
+        self.check_format(self.create_format())
+        cache_file = os.path.join(
+            self.folder, "simple.xml.SimpleFormat.pickle")
+        assert_true(os.path.exists(cache_file))
+        # the xml file is no longer parsed
+        load_root = pyffi.object_models.xml.XmlParser.load_root
+        def fail(*args):
+            raise AssertionError("xml parsed")
+        pyffi.object_models.xml.XmlParser.load_root = fail
+        try:
+            self.check_format(self.create_format())
+        finally:
+            pyffi.object_models.xml.XmlParser.load_root = load_root
+
+    def test_no_autosave(self):
+        SchemaCache.autosave = False
+        self.check_format(self.create_format())
+        assert_equals(os.listdir(self.folder), ["simple.xml"])
+
+    def test_load_from_cache(self):
+        self.create_format()
+        cache = SchemaCache(
+            self.create_format(), os.path.join(self.folder, "simple.xml"), XML)
+        assert_true(cache.load() is not None)
+        cache = SchemaCache(
+            self.create_format(), os.path.join(self.folder, "simple.xml"),
+            XML + b" ")
+        assert_true(cache.load() is None)
+        # the module of the format changed
+        fmt = self.create_format()
+        get_source = SchemaCache.get_source
+        SchemaCache.get_source = staticmethod(
+            lambda cls: get_source(cls) + b" ")
+        try:
+            cache = SchemaCache(
+                fmt, os.path.join(self.folder, "simple.xml"), XML)
+            assert_true(cache.load() is None)
+        finally:
+            SchemaCache.get_source = staticmethod(get_source)
+
+    def test_lazy(self):
+        self.create_format()
+        fmt = self.create_format(lazy=True)
+        assert_equals(fmt.xml_struct, [])
+        assert_true("Example" not in vars(fmt))
+        self.check_format(fmt)
+        # forward declaration was created when it was needed
+        assert_equals([klass.__name__ for klass in fmt.xml_struct],
+                      ["Example", "Other"])
+        fmt.create_all_classes()
+        assert_equals([klass.__name__ for klass in fmt.xml_enum], ["Kind"])
+
+    def test_no_dict_classes(self):
+        assert_true(hasattr(self.create_format().Other(), "__dict__"))
+        # also when the classes are created from the cache
+        for i in range(2):
+            fmt = self.create_format(no_dict=["Other"])
+            assert_true(not hasattr(fmt.Other(), "__dict__"))
+            assert_true(hasattr(fmt.Example(), "__dict__"))
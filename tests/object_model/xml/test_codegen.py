@@ -0,0 +1,54 @@
+import glob
+import io
+import unittest
+
+from nose.tools import assert_equals, assert_true
+
+from pyffi.formats.nif import NifFormat
+from pyffi.object_models.xml.struct_ import StructBase
+from pyffi.object_models.xml.codegen import make_struct_function
+
+from tests import test_logger
+from tests.utils import get_nif_file, read_write_nif
+
+
+class TestCodegen(unittest.TestCase):
+
+    def setUp(self):
+        # PYFFI_NO_CODEGEN=1 switches the generated functions off
+        StructBase.use_codegen = True
+        self.files = sorted(glob.glob(get_nif_file("test_fix_*.nif")))
+
+    def tearDown(self):
+        StructBase.use_codegen = True
+
+    def test_same_as_generic(self):
+        assert_true(self.files)
+        for filename in self.files:
+            test_logger.debug(filename)
+            StructBase.use_codegen = False
+            data, expected = read_write_nif(filename)
+            StructBase.use_codegen = True
+            data, result = read_write_nif(filename)
+            assert_equals(result, expected)
+
+    def test_cached_per_version(self):
+        data = NifFormat.Data(version=0x14000005, user_version=11)
+        header = NifFormat.Header()
+        stream = io.BytesIO()
+        header.write(stream, data)
+        key = (0x14000005, 11, 0)
+        assert_true(key in NifFormat.Header._writers)
+        assert_true(NifFormat.Header._writers[key]
+                    is header._get_struct_function("write", data))
+
+    def test_duplicate_names(self):
+        # Header has conditional duplicates, e.g. for the version
+        for version in (0x04000002, 0x0A000100, 0x14020007):
+            data = NifFormat.Data(version=version, user_version=0)
+            for method in ("read", "write"):
+                assert_true(callable(make_struct_function(
+                    NifFormat.Header, method, data)))
+        for method in ("read", "write"):
+            assert_true(callable(make_struct_function(
+                NifFormat.Header, method, None)))
@@ -1,3 +1,4 @@
+import pickle
 import unittest
 
 from pyffi.object_models.xml.expression import Expression
@@ -54,6 +55,24 @@ class TestExpression(unittest.TestCase):
         self.a.x = B()
         assert_equals(Expression('x * 10').eval(self.a), 70)
 
+    def test_dotted_name(self):
+        self.a.x = A()
+        assert_true(Expression('x.y && 1').eval(self.a))
+
+    def test_map_recompiles(self):
+        e = Expression('x && 1')
+        assert_false(e.eval(self.a))
+        e.map_(lambda x: A if x == 'x' else x)
+        assert_true(e.eval(self.a))
+        assert_false(e.eval(B()))
+
+    def test_pickle(self):
+        e = Expression('(x == 2) || y')
+        e.compile()
+        e2 = pickle.loads(pickle.dumps(e))
+        assert_equals(str(e2), str(e))
+        assert_true(e2.eval(self.a))
+
 class TestPartition:
 
     def test_partition_empty(self):
@@ -0,0 +1,153 @@
+import glob
+import unittest
+
+from nose.tools import assert_equals, assert_true
+
+from pyffi.object_models.common import UInt
+from pyffi.object_models.xml import StructAttribute as Attr
+from pyffi.object_models.xml.struct_ import StructBase
+
+from tests.utils import get_nif_file, read_write_nif
+
+
+class SimpleFormat(object):
+    UInt = UInt
+
+    @staticmethod
+    def name_attribute(name):
+        return name
+
+    @staticmethod
+    def version_number(version_str):
+        return int(version_str)
+
+
+class Data(object):
+    def __init__(self, version, user_version, user_version_2=None):
+        self.version = version
+        self.user_version = user_version
+        self.user_version_2 = user_version_2
+
+
+class X(StructBase):
+    _attrs = [
+        Attr(SimpleFormat, dict(name='a', type='UInt')),
+        Attr(SimpleFormat, dict(name='b', type='UInt', ver1='2')),
+        Attr(SimpleFormat, dict(name='c', type='UInt', cond='a == 3')),
+        Attr(SimpleFormat, dict(name='c', type='UInt', ver2='4')),
+        Attr(SimpleFormat, dict(name='d', type='UInt',
+                                vercond='user_version_2 == 1')),
+    ]
+
+SimpleFormat.X = X
+
+
+class TestStaticAttributeList(unittest.TestCase):
+
+    def setUp(self):
+        self.x = X()
+
+    def names(self, data):
+        return [attr.name for attr in self.x._get_filtered_attribute_list(data)]
+
+    def test_static(self):
+        attrs, checks = X._get_static_attribute_list(Data(5, 0, 1))
+        assert_equals([attr.name for attr in attrs], ['a', 'b', 'c', 'd'])
+        assert_equals([check[0] is not None for check in checks],
+                      [False, False, True, False])
+        assert_true(X._get_static_attribute_list(Data(5, 0, 1))
+                    is X._get_static_attribute_list(Data(5, 0, 1)))
+
+    def test_unconditional(self):
+        self.x.a = 3
+        assert_equals(self.names(Data(1, 0, 0)), ['a', 'c'])
+        checks = X._get_static_attribute_list(Data(1, 0, 0))[1]
+        assert_equals([check[2] for check in checks], [False, True, True])
+
+    def test_duplicate_names(self):
+        self.x.a = 3
+        assert_equals(self.names(Data(3, 0, 1)), ['a', 'b', 'c', 'd'])
+        self.x.a = 2
+        assert_equals(self.names(Data(3, 0, 1)), ['a', 'b', 'c', 'd'])
+        assert_equals(self.names(Data(5, 0, 1)), ['a', 'b', 'd'])
+
+    def test_runtime_vercond(self):
+        # user_version_2 unknown, so vercond is checked on the data
+        attrs, checks = X._get_static_attribute_list(Data(5, 0))
+        assert_true(checks[-1][1] is not None)
+        assert_equals(self.names(Data(5, 0)), ['a', 'b'])
+
+    def test_no_data(self):
+        assert_equals(self.names(None), ['a', 'b', 'c', 'd'])
+
+    def test_invalidate(self):
+        class Y(X):
+            _attrs = [Attr(SimpleFormat, dict(name='e', type='UInt'))]
+        y = Y()
+        assert_equals([attr.name for attr in y._get_filtered_attribute_list(
+            Data(1, 0, 0))], ['a', 'c', 'e'])
+        X._attrs = X._attrs[:1]
+        try:
+            assert_equals(
+                [attr.name for attr in y._get_filtered_attribute_list(
+                    Data(1, 0, 0))], ['a', 'e'])
+            assert_equals(Y._names, ['a', 'e'])
+        finally:
+            X._attrs = TestStaticAttributeList.x_attrs
+
+TestStaticAttributeList.x_attrs = X._attrs
+
+
+class TestSlots(unittest.TestCase):
+
+    def test_basic(self):
+        assert_true(not hasattr(UInt(), "__dict__"))
+
+    def test_struct(self):
+        from pyffi.formats.nif import NifFormat
+        vec = NifFormat.Vector3()
+        assert_true("_x_value_" in NifFormat.Vector3.__slots__)
+        assert_true(not vec.__dict__)
+        vec.x = 1.0
+        assert_equals(vec.x, 1.0)
+        assert_true(not vec.__dict__)
+
+
+class TestLazy(unittest.TestCase):
+
+    def setUp(self):
+        StructBase.use_lazy = True
+
+    def tearDown(self):
+        StructBase.use_lazy = False
+
+    def test_create_on_access(self):
+        x = X()
+        assert_true("_a_value_" not in vars(x))
+        assert_equals(x.a, 0)
+        assert_true("_a_value_" in vars(x))
+        assert_true("_b_value_" not in vars(x))
+        assert_equals(list(x.get_detail_child_names()), ['a', 'b', 'c', 'd'])
+        assert_equals(len(list(x.get_detail_child_nodes())), 4)
+
+    def test_nif_files(self):
+        files = sorted(glob.glob(get_nif_file("test_fix_*.nif")))
+        assert_true(files)
+        for filename in files:
+            results = []
+            for lazy in (False, True):
+                StructBase.use_lazy = lazy
+                data, result = read_write_nif(filename)
+                results.append(result)
+            assert_equals(results[0], results[1])
+
+    def test_struct_dict(self):
+        from pyffi.formats.nif import NifFormat
+        # attribute values are stored in slots
+        motor = NifFormat.MotorDescriptor()
+        assert_equals(motor.__dict__, {})
+        # other attributes can still be set
+        shape = NifFormat.OblivionSubShape()
+        shape.layer = 1
+        assert_equals(shape.layer, 1)
+        assert_equals(shape.__dict__, {"layer": 1})
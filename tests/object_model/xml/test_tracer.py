@@ -0,0 +1,53 @@
+import unittest
+
+from nose.tools import assert_equals, assert_true
+
+from pyffi.object_models.xml.struct_ import StructBase
+from pyffi.object_models.xml.tracer import RecordingTracer
+
+from tests.utils import get_nif_file, read_write_nif
+
+
+class TestTracer(unittest.TestCase):
+
+    def setUp(self):
+        self.file = get_nif_file("test_fix_tangentspace.nif")
+        self.tracer = RecordingTracer()
+
+    def tearDown(self):
+        StructBase._tracer = None
+
+    def test_disabled(self):
+        assert_true(StructBase._tracer is None)
+
+    def test_same_output(self):
+        data, expected = read_write_nif(self.file)
+        StructBase._tracer = self.tracer
+        data, result = read_write_nif(self.file)
+        assert_equals(result, expected)
+        assert_true(self.tracer.events)
+        assert_equals(self.tracer.depth, 0)
+
+    def test_blocks(self):
+        StructBase._tracer = self.tracer
+        data, result = read_write_nif(self.file)
+        for method in ("read", "write"):
+            events = [event for event in self.tracer.events
+                      if event.method == method and event.attribute is None]
+            assert_equals([event.value for event in events], data.blocks)
+            for event in events:
+                assert_equals(event.depth, 0)
+                assert_equals(event.size, event.value.get_size(data))
+
+    def test_nested(self):
+        StructBase._tracer = self.tracer
+        read_write_nif(self.file)
+        # nested events come first, and lie within their parent
+        stack = []
+        for event in self.tracer.events:
+            while stack and stack[-1].depth > event.depth:
+                child = stack.pop()
+                assert_true(event.offset <= child.offset)
+                assert_true(child.offset + child.size
+                            <= event.offset + event.size)
+            stack.append(event)
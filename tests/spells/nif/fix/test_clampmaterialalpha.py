@@ -1,4 +1,5 @@
 """Tests for the fix_texturepath spell"""
+from tests import test_logger
 from tests.scripts.nif import call_niftoaster
 from tests.utils import BaseNifFileTestCase
 
@@ -50,3 +51,20 @@ class TestFixTexturePathToasterNif(BaseNifFileTestCase):
         pyffi.toaster:INFO:  writing to temporary file
         pyffi.toaster:INFO:Finished.
         """
+
+    def test_write_changes_in_place(self):
+        """only the material blocks are written back to the file"""
+        with open(self.dest_file, "rb") as stream:
+            raw = stream.read()
+        with self.assertLogs(test_logger, level="INFO") as logs:
+            call_niftoaster("--raise", "fix_clampmaterialalpha", "--noninteractive", self.dest_file)
+        assert_true(any("writing changes in place" in line for line in logs.output))
+        super(TestFixTexturePathToasterNif, self).readNifData()
+        assert_equals(self.data.roots[0].children[0].children[0].properties[0].alpha, 1.0)
+        assert_equals(self.data.roots[0].children[0].children[1].properties[0].alpha, 0.0)
+        with open(self.dest_file, "rb") as stream:
+            result = stream.read()
+        assert_equals(len(result), len(raw))
+        # only bytes of the two alpha values changed
+        changed = sum(1 for old, new in zip(raw, result) if old != new)
+        assert_true(0 < changed <= 8)
@@ -2,8 +2,9 @@
 import tempfile
 import os
 import shutil
+import unittest
 
-from nose.tools import assert_true, assert_false
+from nose.tools import assert_true, assert_false, assert_equal
 
 from pyffi.formats.nif import NifFormat
 from pyffi.spells import Toaster
@@ -164,3 +165,236 @@ class TestIniParser:
 
 
 
+
+
+class TestToasterJobs:
+    """Test toasting with more than one job."""
+
+    input_files = TestIniParser.input_files
+
+    def test_jobs(self):
+        """Results of the worker processes are merged"""
+        from tests.scripts.nif import call_niftoaster
+        args = ("check_version", "check_nodenamesbyflag", "--noninteractive",
+                "--verbose=0", self.input_files)
+        toaster = call_niftoaster(*args)
+        # recycle the worker processes after every two files
+        toaster_jobs = call_niftoaster("--jobs=2", "--refresh=2", *args)
+        assert_true(toaster.files_done)
+        assert_equal(sorted(toaster_jobs.files_done), sorted(toaster.files_done))
+        assert_equal(toaster_jobs.files_failed, toaster.files_failed)
+        assert_equal(toaster_jobs.versions, toaster.versions)
+        for version, user_versions in toaster.user_versions.items():
+            assert_equal(sorted(toaster_jobs.user_versions[version]),
+                         sorted(user_versions))
+        assert_equal(
+            dict((flag, set(names))
+                 for flag, names in toaster_jobs.flagdict.items()),
+            dict((flag, set(names))
+                 for flag, names in toaster.flagdict.items()))
+
+    def test_warm_up(self):
+        """All classes of lazily loaded formats are created up front"""
+        class LazyFormat:
+            created = False
+
+            @classmethod
+            def create_all_classes(cls):
+                cls.created = True
+
+        class LazyToaster(Toaster):
+            FILEFORMAT = LazyFormat
+
+        LazyToaster.warm_up()
+        assert_true(LazyFormat.created)
+        # formats without lazily created classes
+        Toaster.warm_up()
+        MyToaster.warm_up()
+
+
+class TestToasterManifest(unittest.TestCase):
+    """Test skipping unchanged files with a manifest."""
+
+    input_files = TestIniParser.input_files
+
+    def setUp(self):
+        self.out = tempfile.mkdtemp()
+        for name in ("test_vertexcolor.nif", "test_dump_tex.nif"):
+            shutil.copy(os.path.join(self.input_files, name), self.out)
+        self.manifest = os.path.join(self.out, "manifest.json")
+
+    def tearDown(self):
+        shutil.rmtree(self.out)
+
+    def toast(self, *args):
+        from tests.scripts.nif import call_niftoaster
+        return call_niftoaster(
+            "--manifest=%s" % self.manifest, "--noninteractive",
+            "--verbose=0", *(args + (self.out,)))
+
+    def test_manifest(self):
+        """Only changed files are toasted again"""
+        vertexcolor = os.path.join(self.out, "test_vertexcolor.nif")
+        toaster = self.toast("check_version")
+        assert_equal(len(toaster.files_done), 2)
+        assert_true(os.path.exists(self.manifest))
+        assert_equal(self.toast("check_version").files_done, {})
+        # touching the file does not change it
+        stat = os.stat(vertexcolor)
+        os.utime(vertexcolor, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        assert_equal(self.toast("check_version").files_done, {})
+        # other spells or options
+        assert_equal(len(self.toast("check_nodenamesbyflag").files_done), 2)
+        assert_equal(len(self.toast("check_version", "--exclude=NiNode").files_done), 2)
+        assert_equal(len(self.toast("check_version").files_done), 2)
+        # changed contents
+        with open(vertexcolor, "ab") as stream:
+            stream.write(b"\x00")
+        toaster = self.toast("check_version", "--jobs=2")
+        assert_equal(list(toaster.files_done), [vertexcolor])
+        assert_equal(self.toast("check_version", "--jobs=2").files_done, {})
+
+    def test_manifest_output(self):
+        """Files are toasted again if their output changed"""
+        from tests.scripts.nif import call_niftoaster
+        source = os.path.join(self.out, "source")
+        dest = os.path.join(self.out, "dest")
+        os.mkdir(source)
+        shutil.copy(os.path.join(self.input_files,
+                                 "test_fix_clampmaterialalpha.nif"), source)
+        output = os.path.join(dest, "test_fix_clampmaterialalpha.nif")
+
+        def toast(*args):
+            return call_niftoaster(
+                "--manifest=%s" % self.manifest, "--noninteractive",
+                "--verbose=0", "--source-dir=%s" % source,
+                "--dest-dir=%s" % dest, *(args + ("fix_clampmaterialalpha",
+                                                  source)))
+
+        assert_equal(len(toast().files_done), 1)
+        assert_true(os.path.exists(output))
+        assert_equal(toast().files_done, {})
+        # removed output
+        os.remove(output)
+        assert_equal(len(toast().files_done), 1)
+        assert_equal(toast("--jobs=2").files_done, {})
+        # changed output
+        with open(output, "ab") as stream:
+            stream.write(b"\x00")
+        assert_equal(len(toast("--jobs=2").files_done), 1)
+        assert_equal(toast().files_done, {})
+
+
+class TestToasterPipeline(unittest.TestCase):
+    """Test toasting with the pipeline."""
+
+    input_files = TestIniParser.input_files
+    names = ("test_fix_clampmaterialalpha.nif", "test_opt_mergeduplicates.nif",
+             "test_vertexcolor.nif")
+
+    def setUp(self):
+        self.out = tempfile.mkdtemp()
+        for folder in ("plain", "pipeline"):
+            os.mkdir(os.path.join(self.out, folder))
+            for name in self.names:
+                shutil.copy(os.path.join(self.input_files, name),
+                            os.path.join(self.out, folder))
+
+    def tearDown(self):
+        shutil.rmtree(self.out)
+
+    def check_spell(self, *args):
+        from tests.scripts.nif import call_niftoaster
+        for folder, options in (("plain", ()),
+                                ("pipeline", ("--pipeline", "--read-ahead=2",
+                                              "--write-behind=1"))):
+            toaster = call_niftoaster(
+                "--raise", "--noninteractive", "--verbose=0",
+                *(options + args + (os.path.join(self.out, folder),)))
+            assert_equal(len(toaster.files_done), len(self.names))
+        for name in self.names:
+            with open(os.path.join(self.out, "plain", name), "rb") as stream:
+                plain = stream.read()
+            with open(os.path.join(self.out, "pipeline", name), "rb") as stream:
+                assert_equal(stream.read(), plain)
+
+    def test_pipeline_in_place(self):
+        """Files with changed blocks are overwritten in full"""
+        self.check_spell("fix_clampmaterialalpha")
+
+    def test_pipeline(self):
+        """Files are written in full"""
+        self.check_spell("opt_mergeduplicates")
+
+    def test_pipeline_dry_run(self):
+        """Nothing is overwritten on a dry run"""
+        self.check_spell("--dry-run", "opt_mergeduplicates")
+        for name in self.names:
+            with open(os.path.join(self.input_files, name), "rb") as stream:
+                original = stream.read()
+            with open(os.path.join(self.out, "pipeline", name), "rb") as stream:
+                assert_equal(stream.read(), original)
+
+
+class TestToasterProfile(unittest.TestCase):
+    """Test profiling the toaster."""
+
+    input_files = TestIniParser.input_files
+
+    def setUp(self):
+        self.out = tempfile.mkdtemp()
+        self.profile = os.path.join(self.out, "profile.json")
+
+    def tearDown(self):
+        shutil.rmtree(self.out)
+
+    def check_profile(self, *args, stages=("inspect", "read", "write")):
+        import json
+        from tests.scripts.nif import call_niftoaster
+        src_file = os.path.join(self.input_files, "test_opt_mergeduplicates.nif")
+        call_niftoaster(
+            "--profile=%s" % self.profile, "--noninteractive", "--verbose=0",
+            "--dry-run", "check_nodenamesbyflag", "opt_mergeduplicates",
+            *(args + (src_file,)))
+        with open(self.profile) as stream:
+            profile = json.load(stream)
+        stats = profile["files"][src_file]
+        for stage in stages:
+            assert_true(stats[stage] > 0)
+        spells = stats["spells"]
+        assert_equal(
+            sorted(spells),
+            ["check_nodenamesbyflag", "check_nodenamesbyflag & opt_mergeduplicates",
+             "opt_mergeduplicates"])
+        assert_true(spells["opt_mergeduplicates"]["branchentry"] > 0)
+        branch_stats = profile["spells"]["check_nodenamesbyflag"]
+        assert_equal(branch_stats["NiNode"][0], 2)
+        assert_equal(branch_stats["NiTriStrips"][0], 4)
+        assert_equal(
+            profile["groups"],
+            {"check_nodenamesbyflag & opt_mergeduplicates":
+             ["check_nodenamesbyflag", "opt_mergeduplicates"]})
+
+    def test_profile(self):
+        """Profile with one job"""
+        self.check_profile()
+
+    def test_profile_jobs(self):
+        """Profiles of the worker processes are merged"""
+        self.check_profile("--jobs=2")
+
+    def test_profile_pipeline(self):
+        """The writer thread times the write"""
+        self.check_profile(
+            "--pipeline", stages=("inspect", "read", "serialize", "write"))
+
+    def test_file_total(self):
+        """The time of a group includes the time of its spells"""
+        from pyffi.spells.profiler import ToasterProfiler
+        profiler = ToasterProfiler()
+        profiler.groups["a & b"] = ["a", "b"]
+        stats = {"read": 1.0, "spells": {
+            "a & b": {"recurse": 5.0, "branchentry": 0.0},
+            "a": {"recurse": 2.0, "branchentry": 1.0},
+            "b": {"recurse": 3.0, "branchentry": 1.0}}}
+        assert_equal(profiler.get_file_total(stats), 6.0)
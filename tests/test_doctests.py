@@ -19,6 +19,7 @@ import pyffi.object_models.xml.bit_struct
 import pyffi.object_models.xml.enum
 import pyffi.object_models.xml.expression
 import pyffi.object_models.xml.struct_
+import pyffi.object_models.xml.tracer
 import pyffi.utils
 import pyffi.utils.tristrip
 import pyffi.utils.vertex_cache
@@ -27,6 +28,7 @@ import pyffi.utils.quickhull
 import pyffi.utils.inertia
 import pyffi.utils.tangentspace
 import pyffi.utils.mopp
+import pyffi.utils.sinks
 import pyffi.formats.nif
 import pyffi.formats.cgf
 import pyffi.formats.kfm
@@ -1,5 +1,6 @@
 """Tests for utility classes"""
 
+import io
 import nose
 import nose.tools
 import tempfile
@@ -17,11 +18,43 @@ def assert_tuple_values(a, b):
     for elem, j in zip(a, b):
         nose.tools.assert_almost_equal(elem, j, places=3)
 
+def read_write_nif(filename):
+    """Read a nif file, write it back to memory, and return the data
+    and the bytes written."""
+    data = NifFormat.Data()
+    with open(filename, "rb") as stream:
+        data.read(stream)
+    return data, write_nif(data)
+
+def write_nif(data):
+    """Write nif data to memory, and return the bytes written."""
+    stream = io.BytesIO()
+    data.write(stream)
+    return stream.getvalue()
+
+def create_nif_data(shared=None):
+    """Create nif data whose root node has three child nodes, which
+    all have *shared* as child, if given."""
+    data = NifFormat.Data(version=0x14020007, user_version=11)
+    root = NifFormat.NiNode()
+    for i in range(3):
+        child = NifFormat.NiNode()
+        if shared is not None:
+            child.add_child(shared)
+        root.add_child(child)
+    data.roots = [root]
+    return data
+
 dir_path = __file__
 for i in range(2):  # recurse up to root repo dir
     dir_path = dirname(dir_path)
 test_root = dir_path
 
+def get_nif_file(name):
+    """The path of a nif file in the test files of the nif spells; may
+    be a glob pattern."""
+    return os.path.join(test_root, "spells", "nif", "files", name)
+
 
 class BaseFileTestCase(unittest.TestCase):
     FORMAT = ""
@@ -1,6 +1,9 @@
 """Tests for pyffi.utils module."""
 
-from pyffi.utils import unique_map, hex_dump
+import os.path
+import re
+
+from pyffi.utils import unique_map, hex_dump, walk, walk_sizes
 import nose.tools
 
 
@@ -25,3 +28,43 @@ def test_unique_map():
     nose.tools.assert_equals(unique_map([3, 2, 6, None, 1]), ([0, 1, 2, None, 3], [0, 1, 2, 4]))
     nose.tools.assert_equals(unique_map([3, 1, 6, 1]), ([0, 1, 2, 1], [0, 1, 2]))
     nose.tools.assert_equals(unique_map([3, 1, 6, 1, 2, 2, 9, 3, 2]), ([0, 1, 2, 1, 3, 3, 4, 0, 3], [0, 1, 2, 4, 6]))
+
+
+def test_walk_sizes():
+    """Test walk_sizes gives the same files as walk, with their sizes"""
+    top = os.path.join(os.path.dirname(os.path.dirname(__file__)), "spells")
+    re_filename = re.compile(r"^.*\.nif$")
+    file_sizes = list(walk_sizes(top, re_filename=re_filename))
+    nose.tools.assert_true(file_sizes)
+    nose.tools.assert_equals(
+        sorted(filename for filename, size in file_sizes),
+        sorted(walk(top, re_filename=re_filename)))
+    for filename, size in file_sizes:
+        nose.tools.assert_equals(size, os.path.getsize(filename))
+    # a single file
+    filename, size = file_sizes[0]
+    nose.tools.assert_equals(list(walk_sizes(filename)), [(filename, size)])
+
+
+def test_walk_sizes_dangling_link():
+    """Test walk_sizes passes errors on files to onerror"""
+    import shutil
+    import tempfile
+    import unittest
+    top = tempfile.mkdtemp()
+    try:
+        with open(os.path.join(top, "a.nif"), "wb") as stream:
+            stream.write(b"abc")
+        try:
+            os.symlink(os.path.join(top, "missing.nif"),
+                       os.path.join(top, "b.nif"))
+        except (OSError, NotImplementedError):
+            raise unittest.SkipTest("symbolic links not supported")
+        errors = []
+        nose.tools.assert_equals(
+            list(walk_sizes(top, onerror=errors.append)),
+            [(os.path.join(top, "a.nif"), 3)])
+        nose.tools.assert_equals(len(errors), 1)
+        nose.tools.assert_true(isinstance(errors[0], OSError))
+    finally:
+        shutil.rmtree(top)